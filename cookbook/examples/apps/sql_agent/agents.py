@@ -21,133 +21,219 @@ Examples with table joins:
 View the README for instructions on how to run the application.
 """
 
+import asyncio
 import json
-from pathlib import Path
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib import import_module
 from textwrap import dedent
-from typing import Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
 
 from agno.agent import Agent
-from agno.knowledge.combined import CombinedKnowledgeBase
-from agno.knowledge.json import JSONKnowledgeBase
-from agno.knowledge.text import TextKnowledgeBase
-from agno.models.google import Gemini
-from agno.storage.agent.postgres import PostgresAgentStorage
-from agno.tools.file import FileTools
-from agno.tools.reasoning import ReasoningTools
+from agno.memory.agent import AgentMemory, AgentRun
+from agno.models.message import Message
+from agno.run.response import RunResponse
 from agno.tools.sql import SQLTools
-from agno.vectordb.pgvector import PgVector
-from agno.embedder.google import GeminiEmbedder
-from agno.models.groq import Groq
-from agno.document.chunking.fixed import FixedSizeChunking
-from agno.tools.knowledge import KnowledgeTools
-from plot_tool import PlotTools
-from tools.format_sql_result import FormatSQLTool
-# ************* Database Connection *************
-db_url = "postgresql+psycopg://ai:ai@localhost:5532/ai"
-# *******************************
+from agno.utils.log import log_debug
+from answer_cache import AnswerCache, CachedAnswer
+from batch import cached_sql, get_batch_caches
+from config import db_url, get_output_dir, knowledge_dir, model_fixtures_dir
+from data_version import get_data_version
+from history_compaction import DEFAULT_KEEP_TURNS, compact_history
+from instrumentation import RunTrace, TraceExporter, add_message_spans, set_current_trace, trace_span
+from question_classifier import QuestionClass, classify_question
+from replay_model import REPLAY_MODES
+from schema_context import DEFAULT_TOKEN_BUDGET, PromptStats, estimate_tokens, select_schema_context
 
-# ************* Paths *************
-cwd = Path(__file__).parent
-knowledge_dir = cwd.joinpath("knowledge")
-output_dir = cwd.joinpath("output")
+if TYPE_CHECKING:
+    from agno.knowledge.combined import CombinedKnowledgeBase
+    from agno.models.base import Model
+    from blob_storage import BlobOffloadingStorage, BlobStore
+    from entity_resolver import EntityResolver
+    from prefetch import PrefetchJob, PriceSliceCache
+    from sqlalchemy import Engine
+    from trading_calendar import TradingCalendar
 
-# Create the output directory if it does not exist
-output_dir.mkdir(parents=True, exist_ok=True)
+# ************* Model Providers *************
+# Provider SDKs are imported only when a model of that provider is first requested
+MODEL_PROVIDERS: Dict[str, Tuple[str, str]] = {
+    "google": ("agno.models.google", "Gemini"),
+    "groq": ("agno.models.groq", "Groq"),
+    "openai": ("agno.models.openai", "OpenAIChat"),
+    "anthropic": ("agno.models.anthropic", "Claude"),
+}
 # *******************************
 
 # ************* Storage & Knowledge *************
-agent_storage = PostgresAgentStorage(
-    db_url=db_url,
-    # Store agent sessions in the ai.sql_agent_sessions table
-    table_name="sql_agent_sessions",
-    schema="ai",
-)
-agent_knowledge = CombinedKnowledgeBase(
-    sources=[
-        # Reads text files, SQL files, and markdown files
-        TextKnowledgeBase(
-            path=knowledge_dir,
-            formats=[".txt", ".sql", ".md"],
-            chunking_strategy=FixedSizeChunking(chunk_size=2000, overlap=100),
-        ),
-        # Reads JSON files
-        JSONKnowledgeBase(path=knowledge_dir),
-    ],
-    # Store agent knowledge in the ai.sql_agent_knowledge table
-    vector_db=PgVector(
-        db_url=db_url,
-        table_name="sql_agent_knowledge",
+@lru_cache(maxsize=1)
+def get_blob_store() -> "BlobStore":
+    """Compressed, content-addressed storage for large tool results."""
+    from blob_storage import BlobStore
+
+    # Store large tool results in the ai.sql_agent_blobs table
+    return BlobStore(db_engine=get_db_engine(), table_name="sql_agent_blobs", schema="ai")
+
+
+@lru_cache(maxsize=1)
+def get_agent_storage() -> "BlobOffloadingStorage":
+    """Agent session storage, created on first use.
+
+    Large tool results are kept out of the session rows, see blob_storage.py.
+    """
+    from blob_storage import BlobOffloadingStorage
+
+    return BlobOffloadingStorage(
+        db_engine=get_db_engine(),
+        # Store agent sessions in the ai.sql_agent_sessions table
+        table_name="sql_agent_sessions",
         schema="ai",
-        # Use OpenAI embeddings
-        embedder=GeminiEmbedder(),
-    ),
-    # 5 references are added to the prompt
-    num_documents=4,    
-)
-# *******************************
+        blob_store=get_blob_store(),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_agent_knowledge() -> "CombinedKnowledgeBase":
+    """Agent knowledge base, created on first use."""
+    from agno.document.chunking.fixed import FixedSizeChunking
+    from agno.embedder.google import GeminiEmbedder
+    from agno.knowledge.combined import CombinedKnowledgeBase
+    from agno.knowledge.json import JSONKnowledgeBase
+    from agno.knowledge.text import TextKnowledgeBase
+    from agno.vectordb.pgvector import PgVector
+
+    return CombinedKnowledgeBase(
+        sources=[
+            # Reads text files, SQL files, and markdown files
+            TextKnowledgeBase(
+                path=knowledge_dir,
+                formats=[".txt", ".sql", ".md"],
+                chunking_strategy=FixedSizeChunking(chunk_size=2000, overlap=100),
+            ),
+            # Reads JSON files
+            JSONKnowledgeBase(path=knowledge_dir),
+        ],
+        # Store agent knowledge in the ai.sql_agent_knowledge table
+        vector_db=PgVector(
+            db_url=db_url,
+            table_name="sql_agent_knowledge",
+            schema="ai",
+            # Use OpenAI embeddings
+            embedder=GeminiEmbedder(),
+        ),
+        # 5 references are added to the prompt
+        num_documents=4,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    """Answer cache shared by every agent, using the knowledge base embedder and the entity resolver."""
+    return AnswerCache(
+        embedder=lambda: get_agent_knowledge().vector_db.embedder, entity_resolver=get_entity_resolver
+    )
+
 
-# ************* Semantic Model *************
-# Load semantic model from JSON file
-semantic_model_path = knowledge_dir / "semantic_model.json"
-with open(semantic_model_path, 'r') as f:
-    semantic_model = json.load(f)
-semantic_model_str = json.dumps(semantic_model, indent=2)
+@lru_cache(maxsize=1)
+def get_trace_exporter() -> TraceExporter:
+    """Run trace exporter shared by every agent; Chrome traces go to the artifact store."""
+    from artifact_store import get_artifact_store
+
+    return TraceExporter.from_env(get_output_dir().joinpath("traces"), artifacts=get_artifact_store())
+
+
+# Lazy module attributes kept for backwards compatibility (`from agents import agent_knowledge`)
+_LAZY_ATTRIBUTES = {
+    "agent_storage": get_agent_storage,
+    "agent_knowledge": get_agent_knowledge,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 # *******************************
 
-class UnlimitedSQLTools(SQLTools):
-    def run_sql_query(self, query: str) -> str:
-        """Override run_sql_query to return all results"""
-        return super().run_sql_query(query, limit=None)
+# ************* Shared Resources *************
+# Heavyweight parts are created once per process (per model id for model clients)
+# and shared by every session; get_sql_agent only binds the session-specific state.
+@lru_cache(maxsize=1)
+def get_db_engine() -> "Engine":
+    """SQLAlchemy engine shared by the SQL toolkit of every agent."""
+    from sqlalchemy import create_engine
 
-def get_sql_agent(
-    name: str = "SQL Agent",
-    user_id: Optional[str] = None,
-    model_id: str = "google:gemini-2.0-flash",
-    session_id: Optional[str] = None,
-    debug_mode: bool = True,
-) -> Agent:
-    """Returns an instance of the SQL Agent.
+    return create_engine(db_url)
 
-    Args:
-        user_id: Optional user identifier
-        debug_mode: Enable debug logging
-        model_id: Model identifier in format 'provider:model_name'
-    """
+
+@lru_cache(maxsize=1)
+def get_entity_resolver() -> "EntityResolver":
+    """Company name -> symbol index, built from `companies` and knowledge/stock_symbols.md."""
+    from entity_resolver import EntityResolver
+
+    return EntityResolver(db_engine=get_db_engine(), symbols_path=knowledge_dir.joinpath("stock_symbols.md"))
+
+
+@lru_cache(maxsize=1)
+def get_price_slices() -> "PriceSliceCache":
+    """In-memory daily price slices, prefetched from the companies and dates named in questions."""
+    from prefetch import PriceSliceCache
+
+    return PriceSliceCache(db_engine=get_db_engine(), resolver=get_entity_resolver())
+
+
+@lru_cache(maxsize=1)
+def get_trading_calendar() -> "TradingCalendar":
+    """Sorted trading days per ticker, for nearest-trading-day lookups without SQL."""
+    from trading_calendar import TradingCalendar
+
+    return TradingCalendar(db_engine=get_db_engine())
+
+
+def _new_model(model_id: str) -> "Model":
     # Parse model provider and name
-    provider, model_name = model_id.split(":")
+    provider, model_name = model_id.split(":", 1)
 
     # Select appropriate model class based on provider
-    if provider == "google":
-        model = Gemini(id=model_name)
-    elif provider == "groq":
-        model = Groq(id=model_name)
-    else:
+    if provider not in MODEL_PROVIDERS:
         raise ValueError(f"Unsupported model provider: {provider}")
+    module_name, class_name = MODEL_PROVIDERS[provider]
+    model_class = getattr(import_module(module_name), class_name)
+    return model_class(id=model_name)
 
-    return Agent(
-        name=name,
-        model=model,
-        user_id=user_id,
-        session_id=session_id,
-        storage=agent_storage,
-        knowledge=agent_knowledge,
-        # Enable Agentic RAG i.e. the ability to search the knowledge base on-demand
-        search_knowledge=True,
-        # Enable the ability to read the chat history
-        read_chat_history=True,
-        # Enable the ability to read the tool call history
-        read_tool_call_history=True,
-        # Add references from knowledge base to user prompt
-        # add_references=True,
-        # Add tools to the agent
-        tools=[
-            UnlimitedSQLTools(db_url=db_url, list_tables=False),
-            FileTools(base_dir=output_dir),
-            ReasoningTools(add_instructions=True, add_few_shot=True, think=True),
-            # FormatSQLTool(),
-        ],
-        debug_mode=debug_mode,
-        description=dedent("""\
+
+@lru_cache(maxsize=None)
+def get_model_client(model_id: str) -> Any:
+    """Provider client for `model_id`, created once and reused across sessions."""
+    return _new_model(model_id).get_client()
+
+
+def get_model(model_id: str) -> "Model":
+    """Returns a Model for `model_id` bound to the shared provider client.
+
+    Model instances hold per-agent tool state, so only the client is shared.
+    A `record:`, `replay:` or `auto:` prefix wraps the model in a ReplayModel.
+    """
+    mode, _, inner_model_id = model_id.partition(":")
+    if mode in REPLAY_MODES:
+        from replay_model import ReplayModel
+
+        return ReplayModel(
+            # Replaying never calls the provider, so it needs no client or API key
+            inner=_new_model(inner_model_id) if mode == "replay" else get_model(inner_model_id),
+            mode=mode,
+            fixture_dir=model_fixtures_dir,
+            simulate_latency=os.getenv("REPLAY_SIMULATE_LATENCY", "").lower() in ("1", "true"),
+        )
+    model = _new_model(model_id)
+    model.client = get_model_client(model_id)
+    return model
+# *******************************
+
+# ************* Prompts *************
+# Built once and shared by every agent instance
+SQL_AGENT_DESCRIPTION = dedent("""\
         You are SQrL, an elite Text2SQL Engine specializing in:
 
         - Stock market analysis
@@ -157,8 +243,8 @@ def get_sql_agent(
         - Price trend analysis
         - Financial metrics evaluation
 
-        You combine deep market knowledge with advanced SQL expertise to uncover insights from stock market data."""),
-        instructions=dedent(f"""\
+        You combine deep market knowledge with advanced SQL expertise to uncover insights from stock market data.""")
+SQL_AGENT_INSTRUCTIONS = dedent("""\
         You are SQrL, a Text2SQL Engine specialized in stock market analysis. Your role is to help users query the database by converting their questions into SQL queries.
 
         When a user messages you, determine if you need to query the database or can respond directly.
@@ -215,7 +301,7 @@ def get_sql_agent(
            - If example query found:
              * Use the query as a template
              * Replace parameters with actual values:
-               - :ticker -> stock symbol (e.g. 'MSFT') find stock symbol if needed
+               - :ticker -> stock symbol (e.g. 'MSFT'){symbol_lookup}
                - :date -> date in YYYY-MM-DD format
                - :company_name -> company name
                - :year -> year number
@@ -230,8 +316,9 @@ def get_sql_agent(
            - Check returned results carefully:
              * Verify all fields are present
              * Ensure data matches query parameters
+           {stock_prices_step}
            - If no data found:
-             * First try to find nearest past date
+             * First find the nearest past trading date{trading_day_lookup}
            - For plotting, query the data and use PlotTools to visualize
 
         6. FORMAT RESPONSE:
@@ -258,15 +345,520 @@ def get_sql_agent(
         - ALWAYS use example queries as templates when available
         - **NEVER, EVER RUN CODE TO DELETE DATA OR ABUSE THE LOCAL SYSTEM**
         </rules>
-        """),
-        additional_context=dedent("""\n
-        The `semantic_model` contains information about tables and the relationships between them.
-        If the users asks about the tables you have access to, simply share the table names from the `semantic_model`.
-        <semantic_model>
         """)
-        + semantic_model_str
-        + dedent("""
-        </semantic_model>\
-        """),
-    )
+# Used for simple lookups (one value, one date), see question_classifier.py
+SQL_AGENT_LIGHT_INSTRUCTIONS = dedent("""\
+        You are SQrL, a Text2SQL Engine specialized in stock market analysis. The user's question is a simple lookup.
+
+        1. Identify the company symbols{symbol_lookup_light}, the date and the value asked for.
+        2. If unsure of the query shape, use search_knowledge_base once to find a matching template.
+        3. {stock_prices_lookup} If no data is found for the date, use the nearest past trading date{trading_day_lookup} and say so.
+        4. Answer briefly and ALWAYS show the EXACT SQL query that was executed in a code block:
+           ```sql
+           SELECT ... FROM ... WHERE ...
+           ```
+
+        <rules>
+        - ALWAYS use double quotes for column names and single quotes for string values
+        - ALWAYS format numbers and dates properly
+        - **NEVER, EVER RUN CODE TO DELETE DATA OR ABUSE THE LOCAL SYSTEM**
+        </rules>
+        """)
 
+# Instruction parts that name a tool, keyed by their {placeholder} in the prompts above:
+# (toolkit name, text when the toolkit is registered, text otherwise)
+TOOL_INSTRUCTIONS: Dict[str, Tuple[str, str, str]] = {
+    "symbol_lookup": ("entity_tools", ", use resolve_companies to find it if needed", " find stock symbol if needed"),
+    "symbol_lookup_light": ("entity_tools", " (use resolve_companies, not SQL)", ""),
+    "trading_day_lookup": ("calendar_tools", " with snap_to_trading_day (no SQL needed)", ""),
+    "stock_prices_step": (
+        "price_tools",
+        "- For daily prices of one stock over given dates, get_stock_prices is faster than run_sql_query."
+        " It runs no SQL: show its equivalent_sql as the equivalent query, not as the executed one",
+        "",
+    ),
+    "stock_prices_lookup": (
+        "price_tools",
+        "Use get_stock_prices for daily prices of one stock (show its equivalent_sql as the equivalent query,"
+        " it was not executed), otherwise run_sql_query.",
+        "Use run_sql_query.",
+    ),
+}
+
+
+def build_instructions(template: str, tools: List[Any]) -> str:
+    """Fill the tool-specific parts of `template` for the toolkits in `tools`.
+
+    Lines that only hold the part of a missing toolkit are dropped.
+    """
+    names = {getattr(tool, "name", None) for tool in tools}
+    values = {
+        key: text if toolkit in names else fallback for key, (toolkit, text, fallback) in TOOL_INSTRUCTIONS.items()
+    }
+    lines = []
+    for line in template.split("\n"):
+        rendered = line.format(**values)
+        if rendered.strip() or not line.strip():
+            lines.append(rendered)
+    return "\n".join(lines)
+# *******************************
+
+# ************* Agent Profiles *************
+@dataclass(frozen=True)
+class AgentProfile:
+    name: str
+    # Template filled by build_instructions for the agent's toolkits
+    instructions: str
+    # Include the think/analyze reasoning tools
+    reasoning: bool = True
+    # Knowledge documents returned per search (None: knowledge base default)
+    num_documents: Optional[int] = None
+
+
+FULL_PROFILE = AgentProfile(name="full", instructions=SQL_AGENT_INSTRUCTIONS)
+LIGHT_PROFILE = AgentProfile(name="light", instructions=SQL_AGENT_LIGHT_INSTRUCTIONS, reasoning=False, num_documents=2)
+
+# Toolkit names dropped when a profile has reasoning disabled
+REASONING_TOOLKITS = ("reasoning_tools",)
+
+
+def select_profile(question_class: Optional[QuestionClass]) -> AgentProfile:
+    """Light profile for simple lookups, full profile for everything else."""
+    if question_class is not None and question_class.is_simple_lookup:
+        return LIGHT_PROFILE
+    return FULL_PROFILE
+# *******************************
+
+class UnlimitedSQLTools(SQLTools):
+    def run_sql_query(self, query: str) -> str:
+        """Override run_sql_query to return all results"""
+        with trace_span("sql query", "sql", attrs={"query": query}) as span:
+            executed = []
+
+            def run() -> str:
+                executed.append(query)
+                return super(UnlimitedSQLTools, self).run_sql_query(query, limit=None)
+
+            # Shared with the other questions of a batch, see batch.py
+            result = cached_sql(query, run)
+            if span is not None:
+                span.bytes = len(result.encode())
+                span.cache_hit = not executed
+        return result
+
+
+class SQLAgent(Agent):
+    """Agent that selects the semantic model context relevant to each question,
+    runs simple lookups with a lighter profile and answers repeated questions
+    from the answer cache."""
+
+    def __init__(
+        self,
+        *args: Any,
+        schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        answer_cache: Optional[AnswerCache] = None,
+        adaptive_profile: bool = True,
+        trace_exporter: Optional[TraceExporter] = None,
+        history_keep_turns: Optional[int] = DEFAULT_KEEP_TURNS,
+        price_slices: Optional["PriceSliceCache"] = None,
+        entity_resolver: Optional["EntityResolver"] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.schema_token_budget = schema_token_budget
+        self.answer_cache = answer_cache
+        self.adaptive_profile = adaptive_profile
+        # Tool set of the full profile; lighter profiles use a subset
+        self.all_tools = list(self.tools or [])
+        self.profile: AgentProfile = FULL_PROFILE
+        # Classification of the last question
+        self.question_class: Optional[QuestionClass] = None
+        # Prompt-size statistics of the last run
+        self.prompt_stats: Optional[PromptStats] = None
+        # Cache entry that answered the last run, if any
+        self.cached_answer: Optional[CachedAnswer] = None
+        # Data version when the last run started; its answer is cached under it
+        self.run_data_version: Optional[str] = None
+        # Span breakdown of the last run
+        self.run_trace: Optional[RunTrace] = None
+        self.trace_exporter = trace_exporter
+        # Tool results of older runs are compacted (None: keep everything)
+        self.history_keep_turns = history_keep_turns
+        # Prices named in a question are loaded while the model works (None: no prefetch)
+        self.price_slices = price_slices
+        self.prefetch_job: Optional["PrefetchJob"] = None
+        # Symbols of the companies named in a question are added to the prompt (None: disabled)
+        self.entity_resolver = entity_resolver
+
+    def update_schema_context(self, question: str) -> PromptStats:
+        """Replace `additional_context` with the schema context for `question`."""
+        self.additional_context, stats = select_schema_context(question, token_budget=self.schema_token_budget)
+        if self.entity_resolver is not None:
+            # Saves a resolve_companies call (or a LIKE query on companies) for the names in the question
+            symbols = self.entity_resolver.find_symbols(question)
+            if symbols:
+                lines = "\n".join(f"- {self.entity_resolver.companies[s].name}: {s}" for s in symbols)
+                self.additional_context += f"\n<companies_in_question>\n{lines}\n</companies_in_question>"
+        stats.instructions_tokens = estimate_tokens(str(self.instructions or ""))
+        stats.description_tokens = estimate_tokens(self.description)
+        self.prompt_stats = stats
+        log_debug(f"Prompt stats: {stats.to_dict()}")
+        return stats
+
+    def apply_profile(self, profile: AgentProfile) -> None:
+        """Switch tools and instructions to `profile` for the next run."""
+        if profile == self.profile:
+            return
+        self.tools = [
+            tool for tool in self.all_tools if profile.reasoning or getattr(tool, "name", None) not in REASONING_TOOLKITS
+        ]
+        self.instructions = build_instructions(profile.instructions, self.all_tools)
+        # Tool definitions are cached on the agent after the first run; rebuild them
+        self._tools_for_model = None
+        self._functions_for_model = None
+        self._tool_instructions = None
+        self.profile = profile
+        log_debug(f"Using the {profile.name} agent profile")
+
+    def get_relevant_docs_from_knowledge(
+        self, query: str, num_documents: Optional[int] = None, **kwargs: Any
+    ) -> Optional[List[Dict[str, Any]]]:
+        if num_documents is None:
+            num_documents = self.profile.num_documents
+        with trace_span("knowledge search", "knowledge", attrs={"query": query}) as span:
+            caches = get_batch_caches()
+            if caches is None or kwargs:
+                docs = super().get_relevant_docs_from_knowledge(query, num_documents=num_documents, **kwargs)
+            else:
+                searched = []
+
+                def search() -> Optional[List[Dict[str, Any]]]:
+                    searched.append(query)
+                    return super(SQLAgent, self).get_relevant_docs_from_knowledge(query, num_documents=num_documents)
+
+                docs = caches.get_or_compute("knowledge", (query, num_documents), search)
+                if span is not None:
+                    span.cache_hit = not searched
+            _record_docs(span, docs)
+        return docs
+
+    async def aget_relevant_docs_from_knowledge(
+        self, query: str, num_documents: Optional[int] = None, **kwargs: Any
+    ) -> Optional[List[Dict[str, Any]]]:
+        # Used by arun (the playground); batches share their searches through the sync path
+        if num_documents is None:
+            num_documents = self.profile.num_documents
+        with trace_span("knowledge search", "knowledge", attrs={"query": query}) as span:
+            docs = await super().aget_relevant_docs_from_knowledge(query, num_documents=num_documents, **kwargs)
+            _record_docs(span, docs)
+        return docs
+
+    def _start_run(self, message: Optional[Any]) -> bool:
+        """Reset the state of the last run; starts a trace for text questions (False otherwise)."""
+        self.cached_answer = None
+        self.question_class = None
+        self.run_data_version = None
+        self.run_trace = None
+        self.prefetch_job = None
+        if not isinstance(message, str):
+            self.apply_profile(FULL_PROFILE)
+            return False
+        self.run_trace = RunTrace(question=message)
+        set_current_trace(self.run_trace)
+        return True
+
+    def _uses_answer_cache(self, kwargs: Dict[str, Any]) -> bool:
+        return self.answer_cache is not None and not kwargs.get("messages")
+
+    def _has_history(self, kwargs: Dict[str, Any]) -> bool:
+        """Whether the session of this run already has runs; its answers may depend on them."""
+        session_id = kwargs.get("session_id") or self.session_id
+        if session_id == self.session_id and isinstance(self.memory, AgentMemory) and self.memory.runs:
+            return True
+        # The session is read from storage at the start of the run, i.e. after the cache lookup
+        if self.storage is None or not session_id:
+            return False
+        session = self.storage.read(session_id=session_id)
+        return bool(session is not None and session.memory and session.memory.get("runs"))
+
+    def _prepare_run(self, question: str, kwargs: Dict[str, Any]) -> Optional[CachedAnswer]:
+        """Everything before the model is called: prefetch, profile, schema context, history
+        compaction and the answer cache lookup. Returns the cached answer on a hit."""
+        trace = self.run_trace
+        self.run_data_version = get_data_version()
+        if self.price_slices is not None:
+            with trace.span("start prefetch", "cache"):
+                self.prefetch_job = self.price_slices.prefetch(question)
+        with trace.span("classify question", "prompt"):
+            if self.adaptive_profile:
+                self.question_class = classify_question(question)
+                log_debug(f"Question class: {self.question_class.label} {self.question_class.reasons}")
+            self.apply_profile(select_profile(self.question_class))
+        trace.profile = self.profile.name
+        with trace.span("schema context", "prompt") as span:
+            stats = self.update_schema_context(question)
+            span.tokens_out = stats.static_tokens
+        if self.history_keep_turns is not None:
+            # Before the run, so that the run's storage write persists the compacted history
+            with trace.span("history compaction", "prompt") as span:
+                compacted, span.bytes = compact_history(self.memory, keep_turns=self.history_keep_turns)
+                span.attrs["compacted"] = compacted
+        if not self._uses_answer_cache(kwargs):
+            return None
+        with trace.span("answer cache lookup", "cache") as span:
+            cached = None if self._has_history(kwargs) else self.answer_cache.lookup(question)
+            span.cache_hit = cached is not None
+            if cached is not None:
+                span.bytes = len(cached.answer.encode())
+        if cached is not None:
+            log_debug(f"Answer cache hit ({cached.match}, similarity {cached.similarity:.3f})")
+        return cached
+
+    def _is_stream(self, kwargs: Dict[str, Any]) -> bool:
+        stream = kwargs.get("stream")
+        return bool(self.stream) if stream is None else stream
+
+    def run(self, message: Optional[Any] = None, **kwargs: Any) -> Any:
+        if not self._start_run(message):
+            return super().run(message, **kwargs)
+        cached = self._prepare_run(message, kwargs)
+        if cached is not None:
+            self.cached_answer = cached
+            run_response = self._respond_from_cache(message, cached)
+            self._finish_trace()
+            return iter([run_response]) if self._is_stream(kwargs) else run_response
+        return self._finish_run(message, super().run(message, **kwargs), store=self._uses_answer_cache(kwargs))
+
+    async def arun(self, message: Optional[Any] = None, **kwargs: Any) -> Any:
+        """Async run (used by the playground), with the same steps as `run`. The steps that
+        block (embeddings, database, files) run in a worker thread."""
+        if not self._start_run(message):
+            return await super().arun(message, **kwargs)
+        # The worker thread gets a copy of the context, so tools still see the run trace
+        cached = await asyncio.to_thread(self._prepare_run, message, kwargs)
+        if cached is not None:
+            self.cached_answer = cached
+            run_response = await asyncio.to_thread(self._respond_from_cache, message, cached)
+            await self._aafter_run(message, store=False)
+            return _aiter([run_response]) if self._is_stream(kwargs) else run_response
+        response = await super().arun(message, **kwargs)
+        return await self._afinish_run(message, response, store=self._uses_answer_cache(kwargs))
+
+    def _finish_run(self, question: str, response: Any, store: bool = True) -> Any:
+        if isinstance(response, RunResponse):
+            self._after_run(question, store)
+            return response
+        return self._after_stream(question, response, store)
+
+    def _after_stream(self, question: str, stream: Iterator[RunResponse], store: bool) -> Iterator[RunResponse]:
+        yield from stream
+        self._after_run(question, store)
+
+    async def _afinish_run(self, question: str, response: Any, store: bool = True) -> Any:
+        if isinstance(response, RunResponse):
+            await self._aafter_run(question, store)
+            return response
+        return self._after_astream(question, response, store)
+
+    async def _after_astream(
+        self, question: str, stream: AsyncIterator[RunResponse], store: bool
+    ) -> AsyncIterator[RunResponse]:
+        async for chunk in stream:
+            yield chunk
+        await self._aafter_run(question, store)
+
+    def _after_run(self, question: str, store: bool) -> None:
+        if store:
+            with trace_span("answer cache store", "cache"):
+                self._store_answer(question)
+        self._finish_trace()
+
+    async def _aafter_run(self, question: str, store: bool) -> None:
+        await asyncio.to_thread(self._after_run, question, store)
+        # The worker thread unset the trace in its copy of the context only
+        set_current_trace(None)
+
+    def _finish_trace(self) -> None:
+        trace = self.run_trace
+        if trace is None:
+            return
+        set_current_trace(None)
+        if self.run_response is not None:
+            trace.run_id = self.run_response.run_id
+            if self.cached_answer is None and self.run_response.messages:
+                add_message_spans(trace, self.run_response.messages, self.run_response.tools)
+        job = self.prefetch_job
+        if job is not None and job.finished is not None:
+            trace.add_span(
+                "speculative prefetch",
+                "cache",
+                job.started,
+                job.finished,
+                attrs={"tickers": job.entities.tickers, "years": sorted(job.entities.years), "rows": job.rows()},
+            )
+        trace.session_id = self.session_id
+        trace.finish()
+        log_debug(f"Run breakdown: {trace.breakdown()}")
+        if self.trace_exporter is not None:
+            self.trace_exporter.export(trace)
+
+    def executed_sql(self) -> List[str]:
+        """SQL queries executed successfully during the last run."""
+        return [
+            (tool.get("tool_args") or {})["query"]
+            for tool in self._successful_tools("run_sql_query")
+            if (tool.get("tool_args") or {}).get("query")
+        ]
+
+    def equivalent_sql(self) -> List[str]:
+        """SQL equivalent to the in-memory price lookups of the last run; these queries were not executed."""
+        return [
+            json.loads(tool["content"])["equivalent_sql"]
+            for tool in self._successful_tools("get_stock_prices")
+            if str(tool.get("content", "")).startswith("{")
+        ]
+
+    def _successful_tools(self, tool_name: str) -> List[Dict[str, Any]]:
+        if self.run_response is None or not self.run_response.tools:
+            return []
+        return [
+            tool
+            for tool in self.run_response.tools
+            if tool.get("tool_name") == tool_name and not tool.get("tool_call_error")
+        ]
+
+    def _store_answer(self, question: str) -> None:
+        sql = self.executed_sql()
+        # Only answers backed by the database (queried, or served from its in-memory prices) are reused
+        if (sql or self.equivalent_sql()) and self.run_response is not None and isinstance(self.run_response.content, str):
+            self.answer_cache.store(question, self.run_response.content, sql, data_version=self.run_data_version)
+
+    def _respond_from_cache(self, question: str, cached: CachedAnswer) -> RunResponse:
+        """Build the run response for a cache hit and record it in the session."""
+        self.initialize_agent()
+        if not self.session_id:
+            self.session_id = str(uuid4())
+        run_response = RunResponse(
+            run_id=str(uuid4()),
+            agent_id=self.agent_id,
+            session_id=self.session_id,
+            content=cached.answer,
+            model="answer-cache",
+            tools=[{"tool_name": "run_sql_query", "tool_args": {"query": sql}, "cached": True} for sql in cached.sql],
+            metrics={"answer_cache": {"match": cached.match, "similarity": cached.similarity}},
+        )
+        self.run_response = run_response
+
+        # Keep the exchange in the session history like a normal run
+        user_message = Message(role="user", content=question)
+        if isinstance(self.memory, AgentMemory):
+            self.memory.add_messages(messages=[user_message, Message(role="assistant", content=cached.answer)])
+            self.memory.add_run(AgentRun(message=user_message, response=run_response))
+        else:
+            self.memory.add_run(session_id=self.session_id, run=run_response)
+        self.write_to_storage(session_id=self.session_id, user_id=self.user_id)
+        return run_response
+
+
+def _record_docs(span: Optional[Any], docs: Optional[List[Dict[str, Any]]]) -> None:
+    if span is not None and docs:
+        span.bytes = len(json.dumps(docs, default=str).encode())
+        span.attrs["documents"] = len(docs)
+
+
+async def _aiter(items: List[RunResponse]) -> AsyncIterator[RunResponse]:
+    for item in items:
+        yield item
+
+
+def get_sql_agent(
+    name: str = "SQL Agent",
+    user_id: Optional[str] = None,
+    model_id: str = "google:gemini-2.0-flash",
+    session_id: Optional[str] = None,
+    debug_mode: bool = True,
+    schema_token_budget: int = DEFAULT_TOKEN_BUDGET,
+    use_answer_cache: bool = True,
+    adaptive_profile: bool = True,
+    trace_runs: Optional[bool] = None,
+    history_keep_turns: Optional[int] = DEFAULT_KEEP_TURNS,
+    speculative_prefetch: bool = True,
+    resolve_entities: bool = True,
+    use_trading_calendar: bool = True,
+) -> SQLAgent:
+    """Returns an instance of the SQL Agent.
+
+    Args:
+        user_id: Optional user identifier
+        debug_mode: Enable debug logging
+        model_id: Model identifier in format 'provider:model_name'
+        schema_token_budget: Token budget for the per-question semantic model context
+        use_answer_cache: Answer repeated questions from the shared answer cache
+        adaptive_profile: Run simple lookups without reasoning tools and with fewer knowledge documents
+        trace_runs: Export a span breakdown of each run to output/traces (None: only when the
+            EXPORT_RUN_TRACES environment variable is set)
+        history_keep_turns: Runs whose tool results are kept verbatim; older large results
+            are replaced by their SQL and a short summary (None disables compaction)
+        speculative_prefetch: Load the prices of the companies and dates named in a question in the
+            background, served by the get_stock_prices tool
+        resolve_entities: Resolve company names to symbols in memory (resolve_companies tool, and the
+            symbols of the companies named in the question added to the prompt)
+        use_trading_calendar: Resolve weekends, holidays and dates outside the data to trading days
+            in memory (snap_to_trading_day tool)
+    """
+    from agno.tools.file import FileTools
+    from agno.tools.reasoning import ReasoningTools
+    from artifact_store import get_artifact_store
+    from entity_resolver import EntityTools
+    from prefetch import PriceTools
+    from trading_calendar import CalendarTools
+
+    if trace_runs is None:
+        trace_runs = os.getenv("EXPORT_RUN_TRACES", "").lower() in ("1", "true")
+    calendar = get_trading_calendar() if use_trading_calendar else None
+    # Files written by the agent go to the size-bounded artifact store
+    artifacts = get_artifact_store()
+    artifacts.root.mkdir(parents=True, exist_ok=True)
+    artifacts.start_janitor()
+    entity_resolver = get_entity_resolver() if resolve_entities else None
+    price_slices = get_price_slices() if speculative_prefetch else None
+    tools = [
+        UnlimitedSQLTools(db_engine=get_db_engine(), list_tables=False),
+        *([PriceTools(price_slices, calendar)] if price_slices is not None else []),
+        *([EntityTools(entity_resolver)] if entity_resolver is not None else []),
+        *([CalendarTools(calendar)] if calendar is not None else []),
+        FileTools(base_dir=artifacts.root),
+        ReasoningTools(add_instructions=True, add_few_shot=True, think=True),
+        # FormatSQLTool(),
+    ]
+    return SQLAgent(
+        name=name,
+        model=get_model(model_id),
+        user_id=user_id,
+        session_id=session_id,
+        storage=get_agent_storage(),
+        knowledge=get_agent_knowledge(),
+        # Enable Agentic RAG i.e. the ability to search the knowledge base on-demand
+        search_knowledge=True,
+        # Enable the ability to read the chat history
+        read_chat_history=True,
+        # Enable the ability to read the tool call history
+        read_tool_call_history=True,
+        # Add references from knowledge base to user prompt
+        # add_references=True,
+        # Add tools to the agent
+        tools=tools,
+        debug_mode=debug_mode,
+        description=SQL_AGENT_DESCRIPTION,
+        # Only mention the tools this agent has
+        instructions=build_instructions(SQL_AGENT_INSTRUCTIONS, tools),
+        # Refreshed for every question by SQLAgent.run
+        additional_context=select_schema_context("", token_budget=schema_token_budget)[0],
+        schema_token_budget=schema_token_budget,
+        answer_cache=get_answer_cache() if use_answer_cache else None,
+        adaptive_profile=adaptive_profile,
+        trace_exporter=get_trace_exporter() if trace_runs else None,
+        history_keep_turns=history_keep_turns,
+        price_slices=price_slices,
+        entity_resolver=entity_resolver,
+    )
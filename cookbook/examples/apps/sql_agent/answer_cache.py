@@ -0,0 +1,298 @@
+"""Semantic answer cache for the SQL Agent.
+
+Questions are matched against previously answered ones, first by normalized
+text and then by embedding similarity with a strict threshold. A similarity
+match is only accepted when both questions name the same companies, metrics,
+directions, operations, comparisons, dates and numbers, so "Apple on March 10"
+never returns the answer for "Apple on March 11", "highest close" never the one
+for "lowest close" and "average close" never the one for "median close".
+Questions that refer back to the conversation ("its closing price") are never
+cached. Entries are keyed by data version: reloading the data invalidates them.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from agno.utils.log import log_debug, logger
+from data_version import get_data_version
+
+if TYPE_CHECKING:
+    from entity_resolver import EntityResolver
+
+# Minimum cosine similarity for an embedding match
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+# Maximum number of cached answers (least recently used are evicted first)
+DEFAULT_MAX_ENTRIES = 1000
+
+# Questions starting like this depend on the chat history and are never cached
+FOLLOW_UP_PREFIXES = ("and ", "what about", "how about", "also ", "same ", "then ", "now ")
+
+# Pronouns and determiners that refer back to the chat history ("its closing price")
+ANAPHORS = frozenset({"it", "its", "they", "them", "their", "that", "this", "these", "those", "same"})
+
+# Metric and direction words, mapped to one form, that must match for a similarity match
+METRICS = {
+    "open": "open", "opening": "open",
+    "close": "close", "closing": "close",
+    "high": "high", "low": "low",
+    "volume": "volume",
+    "return": "return", "returns": "return",
+}
+DIRECTIONS = {
+    "highest": "highest", "lowest": "lowest",
+    "most": "most", "least": "least",
+    "max": "max", "maximum": "max",
+    "min": "min", "minimum": "min",
+}
+# Words that set the operation or the comparison of a question
+OPERATORS = {
+    "average": "average", "avg": "average", "mean": "average",
+    "median": "median",
+    "sum": "sum", "total": "sum",
+    "count": "count",
+    "change": "change",
+    "percent": "percent", "percentage": "percent",
+    "gain": "gain", "gains": "gain",
+    "loss": "loss", "losses": "loss",
+    "increase": "increase", "increased": "increase", "rise": "increase", "rose": "increase",
+    "decrease": "decrease", "decreased": "decrease", "decline": "decrease", "declined": "decrease",
+    "drop": "decrease", "dropped": "decrease", "fall": "decrease", "fell": "decrease",
+}
+COMPARATORS = {
+    "above": "above", "over": "above", "exceed": "above", "exceeded": "above", "greater": "above",
+    "below": "below", "under": "below", "less": "below", "fewer": "below",
+    "higher": "higher", "lower": "lower",
+    "before": "before", "after": "after",
+    "between": "between",
+}
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+)
+
+QUOTES = {"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, unify quotes and drop punctuation and extra whitespace."""
+    text = unicodedata.normalize("NFKC", question)
+    for src, dst in QUOTES.items():
+        text = text.replace(src, dst)
+    text = text.lower()
+    text = re.sub(r"[^\w\s'$%&.-]", " ", text)
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    return " ".join(text.split())
+
+
+def question_signature(question: str, resolver: Optional["EntityResolver"] = None) -> FrozenSet[str]:
+    """Companies, metrics, directions, operations, comparisons, dates and numbers that must be
+    identical for a similarity match.
+
+    With a `resolver`, companies are matched by symbol whatever their case
+    ("apple's" and "Apple" both give AAPL); other capitalized words are kept as they are.
+    """
+    text = unicodedata.normalize("NFKC", question)
+    for src, dst in QUOTES.items():
+        text = text.replace(src, dst)
+    signature = set()
+    company_words = set()
+    if resolver is not None:
+        symbols = resolver.find_symbols(text)
+        signature.update(symbols)
+        # Words of the matched names are covered by the symbols
+        company_words = {s.lower() for s in symbols} | {
+            word for alias, symbol in resolver.aliases.items() if symbol in symbols for word in alias.split()
+        }
+    tokens = re.findall(r"[A-Za-z][A-Za-z&'.-]*|\d[\d,.]*", text)
+    for i, token in enumerate(tokens):
+        lower = re.sub(r"'s$", "", token.lower().rstrip("."))
+        if token[0].isdigit():
+            signature.add(token.replace(",", "").rstrip("."))
+        elif lower in MONTHS or re.fullmatch(r"q[1-4]", lower):
+            signature.add(lower)
+        elif lower in METRICS:
+            signature.add(METRICS[lower])
+        elif lower in DIRECTIONS:
+            signature.add(DIRECTIONS[lower])
+        elif lower in OPERATORS:
+            signature.add(OPERATORS[lower])
+        elif lower in COMPARATORS:
+            signature.add(COMPARATORS[lower])
+        elif i > 0 and token[0].isupper() and lower not in company_words:
+            signature.add(lower)
+    return frozenset(signature)
+
+
+def is_follow_up(question: str) -> bool:
+    """Whether `question` depends on the chat history (follow-up prefix or a word like "its")."""
+    text = normalize_question(question)
+    if text.startswith(FOLLOW_UP_PREFIXES):
+        return True
+    return any(re.sub(r"'s$", "", word) in ANAPHORS for word in text.split())
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sql: List[str]
+    data_version: str
+    signature: FrozenSet[str]
+    embedding: Optional[List[float]] = None
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+    # How a lookup matched the entry: "exact" or "similar"
+    match: Optional[str] = None
+    similarity: Optional[float] = None
+
+
+class AnswerCache:
+    """Process-wide cache of answered questions."""
+
+    def __init__(
+        self,
+        embedder: Optional[Callable[[], Any]] = None,
+        entity_resolver: Optional[Callable[[], "EntityResolver"]] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            embedder: Callable returning an agno Embedder, resolved on first use.
+                Without it only normalized-text matches are served.
+            entity_resolver: Callable returning the EntityResolver used to match company
+                names in question signatures, resolved on first use
+            similarity_threshold: Minimum cosine similarity for an embedding match
+            max_entries: Maximum number of cached answers
+        """
+        self._embedder_factory = embedder
+        self._embedder: Optional[Any] = None
+        self._resolver_factory = entity_resolver
+        self._resolver: Optional["EntityResolver"] = None
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if self._embedder_factory is None:
+            return None
+        try:
+            if self._embedder is None:
+                self._embedder = self._embedder_factory()
+            return self._embedder.get_embedding(text)
+        except Exception as e:
+            logger.warning(f"Answer cache embedding failed: {e}")
+            return None
+
+    def _signature(self, question: str) -> FrozenSet[str]:
+        if self._resolver_factory is not None and self._resolver is None:
+            self._resolver = self._resolver_factory()
+        return question_signature(question, self._resolver)
+
+    def _check_version(self) -> str:
+        version = get_data_version()
+        if version != self._data_version:
+            if self._entries:
+                log_debug(f"Data version changed to {version}, dropping {len(self._entries)} cached answers")
+            self._entries.clear()
+            self._data_version = version
+        return version
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Returns the cached answer for `question`, or None."""
+        if is_follow_up(question):
+            return None
+        key = normalize_question(question)
+        # Outside the lock: the resolver may load the companies table
+        signature = self._signature(question)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(key, entry, "exact", 1.0)
+            candidates = [(k, e) for k, e in self._entries.items() if e.signature == signature and e.embedding]
+
+        # Embed outside the lock: it is a network call
+        embedding = self._embed(key) if candidates else None
+        best: Optional[Tuple[str, CachedAnswer]] = None
+        best_score = 0.0
+        if embedding is not None:
+            for candidate in candidates:
+                score = _cosine(embedding, candidate[1].embedding)
+                if score > best_score:
+                    best, best_score = candidate, score
+        with self._lock:
+            if best is not None and best_score >= self.similarity_threshold and best[0] in self._entries:
+                return self._hit(best[0], best[1], "similar", best_score)
+            self.misses += 1
+            return None
+
+    def _hit(self, key: str, entry: CachedAnswer, match: str, similarity: float) -> CachedAnswer:
+        entry.hits += 1
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return replace(entry, match=match, similarity=similarity)
+
+    def store(
+        self, question: str, answer: str, sql: List[str], data_version: Optional[str] = None
+    ) -> Optional[CachedAnswer]:
+        """Cache the answer to `question` with the SQL it executed.
+
+        `data_version` is the version the answer was computed against (default: the
+        current one); answers computed before a reload are not cached.
+        """
+        if not answer or is_follow_up(question):
+            return None
+        key = normalize_question(question)
+        embedding = self._embed(key)
+        signature = self._signature(question)
+        with self._lock:
+            version = self._check_version()
+            if data_version is not None and data_version != version:
+                log_debug(f"Not caching an answer computed with data version {data_version}")
+                return None
+            entry = CachedAnswer(
+                question=question,
+                answer=answer,
+                sql=sql,
+                data_version=version,
+                signature=signature,
+                embedding=embedding,
+            )
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "data_version": self._data_version,
+        }
@@ -4,7 +4,6 @@ from agents import get_sql_agent
 from agno.agent import Agent
 from agno.utils.log import logger
 from dotenv import load_dotenv
-from PIL import Image
 import os
 import re
 from utils import (
@@ -13,6 +12,7 @@ from utils import (
     add_message,
     display_tool_calls,
     rename_session_widget,
+    run_breakdown_widget,
     session_selector_widget,
     sidebar_widget,
 )
@@ -156,6 +156,8 @@ def main() -> None:
                                 image_name = image_match.group(1)
                                 image_path = os.path.join(IMAGE_DIR, image_name)
                                 if os.path.exists(image_path):
+                                    from PIL import Image
+
                                     image = Image.open(image_path)
                                     resp_container.image(image, caption="Kết quả biểu đồ", use_container_width=True)
                                 else:
@@ -163,6 +165,23 @@ def main() -> None:
                             else:
                                 resp_container.markdown(response)
                     add_message("assistant", response, sql_agent.run_response.tools)
+                    if sql_agent.cached_answer is not None:
+                        st.caption(
+                            f"⚡ Answered from cache ({sql_agent.cached_answer.match} match, "
+                            f"similarity {sql_agent.cached_answer.similarity:.2f})"
+                        )
+                    if sql_agent.question_class is not None:
+                        st.caption(
+                            f"🧭 {sql_agent.question_class.label} question, {sql_agent.profile.name} profile"
+                        )
+                    if sql_agent.prompt_stats is not None:
+                        stats = sql_agent.prompt_stats
+                        st.caption(
+                            f"📏 Prompt: ~{stats.static_tokens} static tokens "
+                            f"(schema {stats.schema_tokens}/{stats.token_budget}, tables: {', '.join(stats.tables)}, "
+                            f"saved ~{stats.saved_tokens})"
+                        )
+                    run_breakdown_widget(sql_agent.run_trace)
                 except Exception as e:
                     logger.exception(e)
                     error_message = f"Sorry, I encountered an error: {str(e)}"
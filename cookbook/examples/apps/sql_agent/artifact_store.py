@@ -0,0 +1,278 @@
+"""Size-bounded store for generated files (plots and agent output).
+
+Plots of `plot_api`, images of `PlotTools` and files written by the agent's
+`FileTools` used to accumulate in `output/` (or the working directory) forever.
+`ArtifactStore` keeps them under `output/artifacts/`, sharded into 256
+subdirectories by a hash of the file name so that no directory grows large,
+and bounds them:
+
+- a byte budget: when it is exceeded the least recently used files are deleted
+  until the store is back under `LOW_WATERMARK` of the budget,
+- a TTL: files not written or read for `ttl_s` are deleted.
+
+Writers in other processes (the plot workers) only compute paths with
+`path_for`; the server process records new files with `add`, reads with
+`touch`, and a background janitor thread rescans the directory every
+`interval_s` to pick up files it did not see and apply both limits.
+
+`/plots/{filename}` validates cached copies with `etag`, a hash of the file's
+content computed once per file.
+
+Settings (environment variables): `ARTIFACT_MAX_MB` (default: 512),
+`ARTIFACT_TTL_HOURS` (default: 168, 0 disables the TTL) and
+`ARTIFACT_JANITOR_S` (default: 300).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.utils.log import log_debug, logger
+from config import artifacts_dir
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_S = 7 * 24 * 3600.0
+DEFAULT_JANITOR_INTERVAL_S = 300.0
+
+# Eviction for the byte budget stops at this fraction of it, so it does not run on every new file
+LOW_WATERMARK = 0.9
+
+# Temporary files (".name.pid.png") older than this were left by a crashed writer
+STALE_TMP_S = 3600.0
+
+
+def content_etag(data: bytes) -> str:
+    """Strong HTTP ETag of `data`."""
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+@dataclass
+class Artifact:
+    path: Path
+    size: int
+    # Last write or read, as a time.time() timestamp
+    last_access: float
+
+
+class ArtifactStore:
+    """Generated files under a byte budget and a TTL, evicted least recently used first."""
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_s: Optional[float] = DEFAULT_TTL_S,
+        interval_s: float = DEFAULT_JANITOR_INTERVAL_S,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.interval_s = interval_s
+        self._artifacts: Dict[str, Artifact] = {}
+        # ETag of each served artifact, with the (mtime_ns, size) of the file it was computed from
+        self._etags: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._janitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.evicted_bytes = 0
+        self.last_sweep: Optional[float] = None
+        self.last_sweep_ms: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, root: Path) -> "ArtifactStore":
+        return cls(
+            root,
+            max_bytes=int(float(os.getenv("ARTIFACT_MAX_MB", DEFAULT_MAX_BYTES / 2**20)) * 2**20),
+            ttl_s=float(os.getenv("ARTIFACT_TTL_HOURS", DEFAULT_TTL_S / 3600)) * 3600 or None,
+            interval_s=float(os.getenv("ARTIFACT_JANITOR_S", DEFAULT_JANITOR_INTERVAL_S)),
+        )
+
+    # ************* Paths *************
+    def _sharded(self, name: str) -> Path:
+        return self.root / hashlib.sha1(name.encode()).hexdigest()[:2] / name
+
+    def path_for(self, name: str) -> Path:
+        """Where the artifact `name` is written; creates its shard directory."""
+        path = self._sharded(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def find(self, name: str) -> Optional[Path]:
+        """Path of an existing artifact (sharded, or written directly to the root), or None."""
+        if not name or name.startswith(".") or "/" in name or "\\" in name:
+            return None
+        for path in (self._sharded(name), self.root / name):
+            if path.is_file():
+                return path
+        return None
+
+    def write(self, name: str, data: bytes) -> Path:
+        """Write the artifact `name` atomically: readers see the whole file or none."""
+        path = self.path_for(name)
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}{path.suffix}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return path
+
+    def etag(self, path: Path) -> str:
+        """Strong ETag of an existing artifact; the file is read only when it changed."""
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._etags.get(path.name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        etag = content_etag(path.read_bytes())
+        with self._lock:
+            self._etags[path.name] = (version, etag)
+        return etag
+
+    # ************* Index *************
+    def _set(self, name: str, artifact: Optional[Artifact]) -> None:
+        old = self._artifacts.pop(name, None)
+        if old is not None:
+            self._bytes -= old.size
+        if artifact is None:
+            self._etags.pop(name, None)
+        else:
+            self._artifacts[name] = artifact
+            self._bytes += artifact.size
+
+    def add(self, path: Path) -> None:
+        """Record a newly written artifact and enforce the byte budget."""
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            self._set(path.name, Artifact(path, size, time.time()))
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def touch(self, name: str) -> None:
+        """Mark an artifact as just used, so that it is evicted last."""
+        with self._lock:
+            artifact = self._artifacts.get(name)
+            if artifact is not None:
+                artifact.last_access = time.time()
+
+    def _scan(self) -> Dict[str, Artifact]:
+        """Artifacts on disk; deletes temporary files left by crashed writers."""
+        found: Dict[str, Artifact] = {}
+        if not self.root.exists():
+            return found
+        now = time.time()
+        directories = [self.root] + [d for d in self.root.iterdir() if d.is_dir()]
+        for directory in directories:
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.startswith("."):
+                    if now - stat.st_mtime > STALE_TMP_S:
+                        Path(entry.path).unlink(missing_ok=True)
+                    continue
+                found[entry.name] = Artifact(Path(entry.path), stat.st_size, stat.st_mtime)
+        return found
+
+    def sweep(self) -> None:
+        """Rescan the directory, then evict expired and least recently used artifacts."""
+        start = time.perf_counter()
+        found = self._scan()
+        with self._lock:
+            for name in list(self._artifacts):
+                if name not in found:
+                    self._set(name, None)
+            for name, artifact in found.items():
+                known = self._artifacts.get(name)
+                if known is not None:
+                    artifact.last_access = max(artifact.last_access, known.last_access)
+                self._set(name, artifact)
+        self.evict()
+        self.last_sweep = time.time()
+        self.last_sweep_ms = (time.perf_counter() - start) * 1000
+
+    # ************* Eviction *************
+    def evict(self) -> int:
+        """Delete expired artifacts, then the least recently used ones over the budget."""
+        now = time.time()
+        victims: List[Artifact] = []
+        with self._lock:
+            if self.ttl_s:
+                for name, artifact in list(self._artifacts.items()):
+                    if now - artifact.last_access > self.ttl_s:
+                        victims.append(artifact)
+                        self._set(name, None)
+                        self.evicted_ttl += 1
+            if self._bytes > self.max_bytes:
+                target = self.max_bytes * LOW_WATERMARK
+                for name, artifact in sorted(self._artifacts.items(), key=lambda item: item[1].last_access):
+                    if self._bytes <= target:
+                        break
+                    victims.append(artifact)
+                    self._set(name, None)
+                    self.evicted_lru += 1
+            self.evicted_bytes += sum(a.size for a in victims)
+        for artifact in victims:
+            try:
+                artifact.path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not delete artifact {artifact.path}: {e}")
+        if victims:
+            log_debug(f"Evicted {len(victims)} artifacts")
+        return len(victims)
+
+    # ************* Janitor *************
+    def start_janitor(self) -> None:
+        """Sweep now and then every `interval_s` in a daemon thread (once per store)."""
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._stop.clear()
+            self._janitor = threading.Thread(target=self._run_janitor, name="artifact-janitor", daemon=True)
+        self._janitor.start()
+
+    def stop_janitor(self) -> None:
+        self._stop.set()
+        with self._lock:
+            janitor, self._janitor = self._janitor, None
+        if janitor is not None:
+            janitor.join(timeout=5)
+
+    def _run_janitor(self) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"Artifact janitor failed: {e}")
+            if self._stop.wait(self.interval_s):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "evicted_lru": self.evicted_lru,
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_bytes": self.evicted_bytes,
+                "last_sweep": self.last_sweep,
+                "last_sweep_ms": round(self.last_sweep_ms, 1) if self.last_sweep_ms is not None else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_artifact_store() -> ArtifactStore:
+    """The process-wide store of `output/artifacts`; the janitor is started by the servers."""
+    return ArtifactStore.from_env(artifacts_dir)
@@ -0,0 +1,248 @@
+"""Batch question answering with caches shared across the batch.
+
+`run_batch` answers a list of questions on a pool of worker threads, one
+fresh agent and session per question, and yields each result as soon as it
+finishes. While a batch runs, its `BatchCaches` are visible to the agents
+through a context variable (like the current run trace), so that questions of
+the same report pack share:
+
+- knowledge searches (same query and document count),
+- SQL results of read-only queries,
+- entity resolution: company name -> symbol lookups on `companies`.
+
+Identical lookups issued at the same time by two workers run once; the second
+worker waits for the first one's result.
+
+CLI (one question per line, or a JSON list of questions):
+    python batch.py questions.txt --concurrency 8 > answers.jsonl
+    python batch.py -q "Closing price of Apple on 2024-03-15?" -q "Best performing stock in 2024?"
+
+HTTP: `POST /batch` on the playground app, see `batch_api.py`.
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agno.utils.log import log_debug
+
+DEFAULT_CONCURRENCY = 4
+
+CACHE_KINDS = ("knowledge", "sql", "entity")
+
+# Only these statements are cached; anything else may change data
+READ_ONLY_SQL = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+# Keywords that write or lock rows, also inside a CTE (`WITH d AS (DELETE ... RETURNING *) SELECT ...`)
+# or a second statement; `SELECT ... INTO` creates a table
+DATA_MODIFYING_SQL = re.compile(
+    r"\b(insert|update|delete|merge|upsert|truncate|drop|alter|create|grant|revoke|copy|into|call|do|lock|vacuum)\b"
+    r"|;\s*\S",
+    re.IGNORECASE,
+)
+
+# Quoted strings and identifiers, so that a value such as 'Delete' is not read as a keyword
+QUOTED_SQL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# Symbol lookups by company name ("Get stock symbol from company name" in djia_queries.sql)
+ENTITY_SQL = re.compile(r"\bfrom\s+companies\b.*\b(like|ilike)\b", re.IGNORECASE | re.DOTALL)
+
+
+def normalize_sql(query: str) -> str:
+    return " ".join(query.split()).rstrip(";").strip()
+
+
+def is_read_only(query: str) -> bool:
+    """A single SELECT/WITH statement that writes nothing, not even in a CTE."""
+    return bool(READ_ONLY_SQL.match(query)) and not DATA_MODIFYING_SQL.search(QUOTED_SQL.sub("''", query))
+
+
+@dataclass
+class _Pending:
+    done: threading.Event = field(default_factory=threading.Event)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class BatchCaches:
+    """Knowledge, SQL and entity caches shared by the questions of one batch."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Any], Any] = {}
+        self._pending: Dict[Tuple[str, Any], _Pending] = {}
+        self._lock = threading.Lock()
+        self.hits = {kind: 0 for kind in CACHE_KINDS}
+        self.misses = {kind: 0 for kind in CACHE_KINDS}
+
+    def get_or_compute(self, kind: str, key: Any, compute: Callable[[], Any], cache_if: Callable[[Any], bool] = bool):
+        """Cached value of (`kind`, `key`), computed once with `compute()`.
+
+        Values for which `cache_if(value)` is false (errors, empty results) are
+        returned but not kept.
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            if cache_key in self._entries:
+                self.hits[kind] += 1
+                return self._entries[cache_key]
+            pending = self._pending.get(cache_key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[cache_key] = _Pending()
+                self.misses[kind] += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is None and cache_if(pending.value):
+                with self._lock:
+                    self.hits[kind] += 1
+                return pending.value
+            # The first attempt failed; try again
+            return compute()
+
+        try:
+            pending.value = compute()
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if pending.error is None and cache_if(pending.value):
+                    self._entries[cache_key] = pending.value
+                del self._pending[cache_key]
+            pending.done.set()
+        return pending.value
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            entries = {kind: sum(1 for k in self._entries if k[0] == kind) for kind in CACHE_KINDS}
+        return {
+            kind: {"entries": entries[kind], "hits": self.hits[kind], "misses": self.misses[kind]}
+            for kind in CACHE_KINDS
+        }
+
+
+_current_caches: ContextVar[Optional[BatchCaches]] = ContextVar("sql_agent_batch_caches", default=None)
+
+
+def get_batch_caches() -> Optional[BatchCaches]:
+    return _current_caches.get()
+
+
+@contextmanager
+def use_batch_caches(caches: BatchCaches) -> Iterator[BatchCaches]:
+    token = _current_caches.set(caches)
+    try:
+        yield caches
+    finally:
+        _current_caches.reset(token)
+
+
+def cached_sql(query: str, run: Callable[[], str]) -> str:
+    """Result of `run()` for `query`, shared within the current batch."""
+    caches = get_batch_caches()
+    if caches is None or not is_read_only(query):
+        return run()
+    kind = "entity" if ENTITY_SQL.search(query) else "sql"
+    return caches.get_or_compute(kind, normalize_sql(query), run, cache_if=lambda r: not r.startswith("Error"))
+
+
+@dataclass
+class BatchResult:
+    index: int
+    question: str
+    answer: Optional[str] = None
+    error: Optional[str] = None
+    latency_s: float = 0.0
+    profile: Optional[str] = None
+    tool_calls: int = 0
+    sql: List[str] = field(default_factory=list)
+    # Queries equivalent to in-memory price lookups, not executed
+    equivalent_sql: List[str] = field(default_factory=list)
+    session_id: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def answer_question(index: int, question: str, model_id: str, user_id: Optional[str] = None) -> BatchResult:
+    from agents import get_sql_agent
+
+    # A fresh session per question: questions of a pack do not depend on each other
+    agent = get_sql_agent(model_id=model_id, user_id=user_id, debug_mode=False)
+    result = BatchResult(index=index, question=question)
+    start = time.perf_counter()
+    try:
+        response = agent.run(question)
+        result.answer = response.content if isinstance(response.content, str) else str(response.content)
+        result.sql = agent.executed_sql()
+        result.equivalent_sql = agent.equivalent_sql()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency_s = time.perf_counter() - start
+    result.profile = agent.profile.name
+    result.tool_calls = len(agent.run_response.tools or []) if agent.run_response else 0
+    result.session_id = agent.session_id
+    return result
+
+
+def run_batch(
+    questions: List[str],
+    model_id: str = "google:gemini-2.0-flash",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    user_id: Optional[str] = None,
+    caches: Optional[BatchCaches] = None,
+) -> Iterator[BatchResult]:
+    """Answer `questions` in parallel and yield the results in completion order."""
+    caches = caches or BatchCaches()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="sql-batch") as pool:
+        futures = []
+        for index, question in enumerate(questions):
+            # Each task runs in its own copy of the context, with the batch caches set
+            context = copy_context()
+            context.run(_current_caches.set, caches)
+            futures.append(pool.submit(context.run, answer_question, index, question, model_id, user_id))
+        for future in as_completed(futures):
+            yield future.result()
+    log_debug(f"Batch caches: {caches.stats()}")
+
+
+def read_questions(path: Path) -> List[str]:
+    text = path.read_text() if str(path) != "-" else sys.stdin.read()
+    if text.lstrip().startswith("["):
+        return [q if isinstance(q, str) else q["question"] for q in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", type=Path, help="Questions, one per line or a JSON list ('-' for stdin)")
+    parser.add_argument("-q", "--question", action="append", default=[], help="A question (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--model-id", default="google:gemini-2.0-flash")
+    args = parser.parse_args()
+
+    questions = (read_questions(args.file) if args.file else []) + args.question
+    if not questions:
+        parser.error("no questions given")
+    caches = BatchCaches()
+    start = time.perf_counter()
+    for result in run_batch(questions, model_id=args.model_id, concurrency=args.concurrency, caches=caches):
+        print(json.dumps(result.to_dict(), default=str), flush=True)
+    print(
+        f"{len(questions)} questions in {time.perf_counter() - start:.1f} s, caches: {caches.stats()}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""HTTP endpoint for batch questions, mounted on the playground app.
+
+`POST /batch` with `{"questions": [...], "concurrency": 4}` streams one JSON
+object per line (NDJSON) as each question finishes, then a final summary line
+with the batch cache statistics. See `batch.py`.
+"""
+
+import json
+import os
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from agents import MODEL_PROVIDERS
+from batch import DEFAULT_CONCURRENCY, BatchCaches, run_batch
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Upper bounds for one request
+MAX_QUESTIONS = 200
+MAX_CONCURRENCY = 16
+
+# Models a client may ask for. Requests are paid with the server's API keys, and
+# replay model ids (`record:`, `auto:`) write fixtures on the server, so only
+# these are accepted; override with BATCH_MODEL_IDS (comma-separated).
+DEFAULT_MODEL_ID = "google:gemini-2.0-flash"
+ALLOWED_MODEL_IDS = (DEFAULT_MODEL_ID, "openai:o4-mini", "anthropic:claude-3-7-sonnet-latest")
+
+router = APIRouter()
+
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    model_id: str = DEFAULT_MODEL_ID
+    concurrency: int = DEFAULT_CONCURRENCY
+    user_id: Optional[str] = None
+
+
+def allowed_model_ids() -> Tuple[str, ...]:
+    configured = os.getenv("BATCH_MODEL_IDS")
+    model_ids = [m.strip() for m in configured.split(",")] if configured else ALLOWED_MODEL_IDS
+    # Plain provider:model ids only; replay prefixes are not providers
+    return tuple(m for m in model_ids if m.partition(":")[0] in MODEL_PROVIDERS)
+
+
+def _stream_results(request: BatchRequest) -> Iterator[str]:
+    caches = BatchCaches()
+    start = time.perf_counter()
+    for result in run_batch(
+        request.questions,
+        model_id=request.model_id,
+        concurrency=request.concurrency,
+        user_id=request.user_id,
+        caches=caches,
+    ):
+        yield json.dumps(result.to_dict(), default=str) + "\n"
+    summary = {"done": True, "questions": len(request.questions), "elapsed_s": time.perf_counter() - start}
+    yield json.dumps(dict(summary, caches=caches.stats())) + "\n"
+
+
+@router.post("/batch")
+def answer_batch(request: BatchRequest):
+    questions = [q.strip() for q in request.questions if q.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(questions) > MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUESTIONS} questions per batch")
+    if not 1 <= request.concurrency <= MAX_CONCURRENCY:
+        raise HTTPException(status_code=400, detail=f"concurrency must be between 1 and {MAX_CONCURRENCY}")
+    allowed = allowed_model_ids()
+    if request.model_id not in allowed:
+        raise HTTPException(status_code=400, detail=f"model_id must be one of: {', '.join(allowed)}")
+    request.questions = questions
+    return StreamingResponse(_stream_results(request), media_type="application/x-ndjson")
@@ -0,0 +1,189 @@
+"""Accuracy, latency, tool calls and tokens of the agent on `test/djia_qna.json`.
+
+Runs the labeled questions through `get_sql_agent` on `--concurrency` worker
+threads (one fresh agent and session per question, answer cache off), scores
+each answer against the expected one with a numeric tolerance (`qna.py`), and
+reports per category (type/complexity): accuracy, p50/p95 latency, tool calls
+and model tokens. Save a run with `--save` and compare a later run against it
+with `--compare`.
+
+Needs the database and the knowledge base. With a `replay:` model id (see
+`replay_model.py`) the model responses come from recorded fixtures, so runs are
+deterministic and need no API key; record them once with `record:`.
+
+Usage:
+    python benchmarks/djia_eval.py --concurrency 8 --save eval_before.json
+    python benchmarks/djia_eval.py --concurrency 8 --compare eval_before.json
+    python benchmarks/djia_eval.py --model-id replay:google:gemini-2.0-flash --type factual --limit 20
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from qna import answer_matches, load_questions  # noqa: E402
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def run_question(item: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    from agents import get_sql_agent
+
+    # A fresh session per question so that chat history does not help
+    agent = get_sql_agent(
+        model_id=args.model_id,
+        debug_mode=False,
+        use_answer_cache=False,
+        adaptive_profile=not args.full_profile,
+        trace_runs=args.export_traces,
+    )
+    start = time.perf_counter()
+    try:
+        response = agent.run(item["question"])
+        content = response.content if isinstance(response.content, str) else str(response.content)
+        error = None
+    except Exception as e:
+        content, error = "", f"{type(e).__name__}: {e}"
+    latency_s = time.perf_counter() - start
+
+    spans = agent.run_trace.spans if agent.run_trace else []
+    return {
+        "number": item["number"],
+        "category": f"{item['type']}/{item['complexity']}",
+        "question": item["question"],
+        "expected": item["answer"],
+        "answer": content,
+        "correct": not error and answer_matches(item["answer"], content, args.rel_tol, args.approx_tol),
+        "profile": agent.profile.name if agent.profile else None,
+        "latency_s": latency_s,
+        "tool_calls": len(agent.run_response.tools or []) if agent.run_response else 0,
+        "tokens_in": sum(s.tokens_in for s in spans if s.category == "llm"),
+        "tokens_out": sum(s.tokens_out for s in spans if s.category == "llm"),
+        "error": error,
+    }
+
+
+def run_all(questions: List[Dict[str, Any]], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from agents import get_sql_agent
+
+    # Build the shared engine, storage and knowledge base before the workers start
+    get_sql_agent(model_id=args.model_id, debug_mode=False)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_question, item, args) for item in questions]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            status = "error" if result["error"] else ("ok" if result["correct"] else "wrong")
+            print(f"[{done:>3}/{len(questions)}] #{result['number']:<4}{status:<7}{result['latency_s']:>7.1f} s")
+    return sorted(results, key=lambda r: r["number"])
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [r["latency_s"] for r in results]
+    return {
+        "questions": len(results),
+        "accuracy": sum(r["correct"] for r in results) / len(results),
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "tool_calls": statistics.fmean(r["tool_calls"] for r in results),
+        "tokens_in": statistics.fmean(r["tokens_in"] for r in results),
+        "tokens_out": statistics.fmean(r["tokens_out"] for r in results),
+        "errors": sum(1 for r in results if r["error"]),
+    }
+
+
+def summarize_by_category(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in results:
+        groups[r["category"]].append(r)
+        groups[r["category"].split("/")[0]].append(r)
+    summary = {name: summarize(group) for name, group in sorted(groups.items())}
+    summary["all"] = summarize(results)
+    return summary
+
+
+COLUMNS = [
+    ("questions", "n", "{:>5}"),
+    ("accuracy", "acc", "{:>7.0%}"),
+    ("p50_s", "p50 s", "{:>8.1f}"),
+    ("p95_s", "p95 s", "{:>8.1f}"),
+    ("tool_calls", "tools", "{:>7.1f}"),
+    ("tokens_in", "tok in", "{:>9,.0f}"),
+    ("tokens_out", "tok out", "{:>9,.0f}"),
+    ("errors", "err", "{:>5}"),
+]
+
+
+def print_report(summary: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]) -> None:
+    header = f"{'category':<24}" + "".join(f"{title:>{len(fmt.format(0))}}" for _, title, fmt in COLUMNS)
+    print(header)
+    for name, row in summary.items():
+        print(f"{name:<24}" + "".join(fmt.format(row[key]) for key, _, fmt in COLUMNS))
+        before = (baseline or {}).get(name)
+        if before:
+            print(f"{'  before':<24}" + "".join(fmt.format(before[key]) for key, _, fmt in COLUMNS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions run in parallel")
+    parser.add_argument("--model-id", default="google:gemini-2.0-flash")
+    parser.add_argument("--type", choices=["factual", "comparative", "analytical"], help="Only this question type")
+    parser.add_argument("--numbers", type=int, nargs="+", help="Only these question numbers")
+    parser.add_argument("--limit", type=int, help="Maximum number of questions")
+    parser.add_argument("--rel-tol", type=float, default=0.01, help="Relative tolerance for exact numeric answers")
+    parser.add_argument("--approx-tol", type=float, default=0.1, help="Relative tolerance for approximate answers")
+    parser.add_argument("--full-profile", action="store_true", help="Disable adaptive profiles")
+    parser.add_argument("--export-traces", action="store_true", help="Also export run traces to output/traces")
+    parser.add_argument("--save", type=Path, help="Save summary and per-question results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    questions = load_questions()
+    if args.type:
+        questions = [q for q in questions if q["type"] == args.type]
+    if args.numbers:
+        questions = [q for q in questions if q["number"] in args.numbers]
+    questions = questions[: args.limit]
+
+    start = time.perf_counter()
+    results = run_all(questions, args)
+    wall_s = time.perf_counter() - start
+    summary = summarize_by_category(results)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print()
+    print_report(summary, baseline["summary"] if baseline else None)
+    print(f"\nWall time: {wall_s:.1f} s at concurrency {args.concurrency}")
+    if baseline:
+        print(f"Before:    {baseline['wall_s']:.1f} s at concurrency {baseline['args']['concurrency']}")
+    for r in results:
+        if not r["correct"]:
+            got = (r["error"] or r["answer"])[:120]
+            print(f"  #{r['number']} {r['category']}: expected {r['expected']!r}, got {got!r}")
+
+    if args.save:
+        report = {"args": vars(args), "wall_s": wall_s, "summary": summary, "results": results}
+        args.save.write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Company name -> symbol resolution: in-memory resolver versus the SQL templates.
+
+Offline (default): builds the resolver from `data/djia_companies_20250426.csv`
+and `knowledge/stock_symbols.md`, and reports the latency of `resolve` for
+every company name and alias and of `find_symbols` on the questions of
+`test/djia_qna.json`, plus how many questions name a company it finds.
+
+With `--db`, also times the "Get stock symbol from company name" query of
+`knowledge/djia_queries.sql` for the same names against the database.
+
+Usage:
+    python benchmarks/entity_resolver.py
+    python benchmarks/entity_resolver.py --db --save resolver.json
+"""
+
+import argparse
+import csv
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from config import data_dir, knowledge_dir  # noqa: E402
+from entity_resolver import Company, EntityResolver, load_symbol_list  # noqa: E402
+from qna import load_questions  # noqa: E402
+
+COMPANIES_CSV = data_dir.joinpath("djia_companies_20250426.csv")
+
+LIKE_QUERY = "SELECT symbol FROM companies WHERE name LIKE '%' || :company_name || '%'"
+
+
+def timed_us(fn: Callable[[Any], Any], items: List[Any], repeat: int) -> float:
+    """Median time of `fn(item)` in microseconds."""
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(item)
+        samples.append((time.perf_counter() - start) * 1e6 / repeat)
+    return statistics.median(samples)
+
+
+def offline_resolver() -> EntityResolver:
+    with COMPANIES_CSV.open() as f:
+        companies = [Company(row["symbol"], row["name"], row["sector"]) for row in csv.DictReader(f)]
+    resolver = EntityResolver()
+    resolver.build(companies, load_symbol_list(knowledge_dir.joinpath("stock_symbols.md")))
+    # Built by hand; do not rebuild from the (absent) database
+    resolver.refresh = lambda: None
+    return resolver
+
+
+def measure(resolver: EntityResolver, repeat: int) -> Dict[str, Any]:
+    names = list(resolver.aliases)
+    questions = [q["question"] for q in load_questions()]
+    # Misspelled names (last letter changed) go through difflib; _resolve bypasses the memo
+    typos = [name[:-1] + "x" for name in names]
+    return {
+        "companies": len(resolver.companies),
+        "names": len(names),
+        "resolve_us": timed_us(resolver.resolve, names, repeat),
+        "resolve_fuzzy_us": timed_us(lambda typo: resolver._resolve(typo, typo), typos, 1),
+        "find_symbols_us": timed_us(resolver.find_symbols, questions, repeat),
+        "questions_with_company": sum(1 for q in questions if resolver.find_symbols(q)),
+        "questions": len(questions),
+    }
+
+
+def measure_db(names: List[str], repeat: int) -> Dict[str, Any]:
+    from agents import get_db_engine
+    from sqlalchemy import text
+
+    engine = get_db_engine()
+    query = text(LIKE_QUERY)
+
+    def lookup(name: str) -> None:
+        with engine.connect() as conn:
+            conn.execute(query, {"company_name": name}).all()
+
+    return {"like_query_us": timed_us(lookup, names, repeat)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", action="store_true", help="Also time the SQL lookup against the database")
+    parser.add_argument("--repeat", type=int, default=100, help="Repetitions per name or question")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    resolver = offline_resolver()
+    build_ms = (time.perf_counter() - start) * 1000
+    results = dict(measure(resolver, args.repeat), build_ms=build_ms)
+    if args.db:
+        names = [c.name.split()[0] for c in resolver.companies.values()]
+        results.update(measure_db(names, max(1, args.repeat // 10)))
+
+    print(f"Companies / names indexed:  {results['companies']} / {results['names']}")
+    print(f"Index build:                {results['build_ms']:.2f} ms")
+    print(f"resolve (exact):            {results['resolve_us']:.2f} µs")
+    print(f"resolve (fuzzy, uncached):  {results['resolve_fuzzy_us']:.0f} µs")
+    print(f"find_symbols per question:  {results['find_symbols_us']:.2f} µs")
+    print(f"Questions naming a company: {results['questions_with_company']}/{results['questions']}")
+    if "like_query_us" in results:
+        print(f"LIKE query on companies:    {results['like_query_us']:.0f} µs")
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Replayable history size over a long session, with and without compaction.
+
+Simulates a session where every turn runs one SQL query returning `--rows`
+daily price rows, and reports the size of the message history that can be
+replayed into the next prompt after each turn. No database or model needed.
+
+Usage:
+    python benchmarks/history_compaction.py --turns 20 --rows 250
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from agno.memory.agent import AgentMemory, AgentRun  # noqa: E402
+from agno.models.message import Message  # noqa: E402
+from agno.run.response import RunResponse  # noqa: E402
+from history_compaction import DEFAULT_KEEP_TURNS, compact_history, history_chars  # noqa: E402
+
+
+def fake_rows(turn: int, rows: int) -> List[Dict[str, Any]]:
+    start = date(2024, 1, 2)
+    return [
+        {"date": str(start + timedelta(days=i)), "ticker": "AAPL", "close": 180.0 + turn + i * 0.1, "volume": 5e7 + i}
+        for i in range(rows)
+    ]
+
+
+def add_turn(memory: AgentMemory, turn: int, rows: int) -> None:
+    query = f"SELECT date, ticker, close, volume FROM prices WHERE ticker = 'AAPL' LIMIT {rows} -- turn {turn}"
+    call_id = f"call_{turn}"
+    content = json.dumps(fake_rows(turn, rows))
+    messages = [
+        Message(role="user", content=f"Question {turn}"),
+        Message(
+            role="assistant",
+            tool_calls=[{"id": call_id, "type": "function", "function": {"name": "run_sql_query", "arguments": "{}"}}],
+        ),
+        Message(
+            role="tool",
+            tool_call_id=call_id,
+            tool_name="run_sql_query",
+            tool_args={"query": query},
+            content=content,
+        ),
+        Message(role="assistant", content=f"Answer {turn}: the closing price was {180 + turn:.2f}."),
+    ]
+    tools = [{"tool_call_id": call_id, "tool_name": "run_sql_query", "tool_args": {"query": query}, "content": content}]
+    memory.add_messages(messages=messages)
+    memory.add_run(AgentRun(message=messages[0], response=RunResponse(messages=messages, tools=tools)))
+
+
+def simulate(turns: int, rows: int, keep_turns: Optional[int]) -> List[int]:
+    memory = AgentMemory()
+    sizes = []
+    for turn in range(1, turns + 1):
+        # SQLAgent.run compacts before each run
+        if keep_turns is not None:
+            compact_history(memory, keep_turns=keep_turns)
+        # ~4 characters per token, as in schema_context.estimate_tokens
+        sizes.append(history_chars(memory) // 4)
+        add_turn(memory, turn, rows)
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=250, help="Rows returned by each query")
+    parser.add_argument("--keep-turns", type=int, default=DEFAULT_KEEP_TURNS)
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    args = parser.parse_args()
+
+    verbatim = simulate(args.turns, args.rows, keep_turns=None)
+    compacted = simulate(args.turns, args.rows, keep_turns=args.keep_turns)
+    print(f"{'turn':>6}{'verbatim tokens':>18}{'compacted tokens':>18}")
+    for turn, (before, after) in enumerate(zip(verbatim, compacted), start=1):
+        print(f"{turn:>6}{before:>18}{after:>18}")
+    if args.save:
+        args.save.write_text(json.dumps({"args": vars(args), "verbatim": verbatim, "compacted": compacted}, default=str))
+
+
+if __name__ == "__main__":
+    main()
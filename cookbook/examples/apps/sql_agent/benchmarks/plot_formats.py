@@ -0,0 +1,75 @@
+"""Render time and size of a plot per image format and size.
+
+Renders the closing-price chart of one ticker (`data/djia_prices_20250426.csv`,
+so no database is needed) with `plot_api.create_plot` into memory, as the
+`inline` responses do, in every format of `plot_api.IMAGE_FORMATS` at the
+default size (1200x800 px, 100 DPI) and at each preset of
+`plot_api.PRESETS`. Reports the median render time, including encoding, and
+the image size, so clients can pick the cheapest format that looks right.
+
+Usage:
+    python benchmarks/plot_formats.py --save formats.json
+    python benchmarks/plot_formats.py --compare formats.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import pandas as pd
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import plot_api  # noqa: E402
+from config import data_dir  # noqa: E402
+
+PRICES_CSV = data_dir.joinpath("djia_prices_20250426.csv")
+
+
+def render(df: pd.DataFrame, ticker: str, image_format: str, size: Dict[str, int]) -> bytes:
+    return plot_api.create_plot(df, ticker, in_memory=True, image_format=image_format, **size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticker", default="AAPL", help="Ticker whose closing prices are plotted")
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per measurement (median is reported)")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    prices = pd.read_csv(PRICES_CSV, usecols=["Date", "Close", "Ticker"])
+    prices["Date"] = pd.to_datetime(prices["Date"], utc=True)
+    df = prices[prices["Ticker"] == args.ticker][["Date", "Close"]]
+
+    default_size = {key: plot_api.DEFAULT_RENDER[key] for key in ("width", "height", "dpi")}
+    sizes = {"default": default_size, **plot_api.PRESETS}
+    baseline: Dict[str, Any] = json.loads(args.compare.read_text()) if args.compare else {}
+    results: Dict[str, Any] = {}
+    print(f"{'size':<10}{'format':>8}{'pixels':>11}{'ms':>9}{'bytes':>10}" + ("   ms before" if baseline else ""))
+    for size_name, size in sizes.items():
+        for image_format in plot_api.IMAGE_FORMATS:
+            data = render(df, args.ticker, image_format, size)  # warm up imports and fonts
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                render(df, args.ticker, image_format, size)
+                samples.append((time.perf_counter() - start) * 1000)
+            key = f"{size_name}/{image_format}"
+            results[key] = {"ms": statistics.median(samples), "bytes": len(data)}
+            pixels = f"{size['width']}x{size['height']}"
+            line = f"{size_name:<10}{image_format:>8}{pixels:>11}{results[key]['ms']:>9.1f}{len(data):>10,}"
+            if key in baseline:
+                line += f"{baseline[key]['ms']:>12.1f}"
+            print(line)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
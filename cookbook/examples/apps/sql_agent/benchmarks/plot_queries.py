@@ -0,0 +1,190 @@
+"""Plot data queries: aggregations in pandas versus in SQL.
+
+For each plot that aggregates daily prices (monthly average close, rolling
+average, daily and cumulative returns, correlation heatmap, sector market cap)
+and each date range in `--days`, runs:
+
+- "pandas": the previous implementation, which fetched the raw daily rows and
+  aggregated them with `groupby`, `rolling`, `pct_change` and `corr`,
+- "sql": `plot_api.get_stock_data`, which computes them in the database
+  (`EXTRACT`/`GROUP BY`, `LAG`, `AVG() OVER`, `FIRST_VALUE`, `corr()`).
+
+It reports the rows and bytes fetched from the database (the in-memory size of
+every `pd.read_sql` result) and the median latency. Needs the database of
+`load_data.py`.
+
+Usage:
+    python benchmarks/plot_queries.py --days 30,365,730 --save plot_queries.json
+    python benchmarks/plot_queries.py --compare plot_queries.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import plot_api  # noqa: E402
+
+CORRELATION_TICKERS = ["AAPL", "MSFT", "JPM", "BA", "KO", "WMT"]
+TICKER = "AAPL"
+ROLLING_WINDOW = 30
+
+# (rows, bytes) of every DataFrame read from the database during a measurement
+_fetched: List[int] = [0, 0]
+_read_sql = pd.read_sql
+
+
+def counting_read_sql(*args: Any, **kwargs: Any) -> pd.DataFrame:
+    df = _read_sql(*args, **kwargs)
+    _fetched[0] += len(df)
+    _fetched[1] += int(df.memory_usage(deep=True).sum())
+    return df
+
+
+def closes(ticker: str, start: str, end: str) -> pd.DataFrame:
+    query = """
+        SELECT "Date", "Close" FROM ai.prices
+        WHERE "Ticker" = %s AND "Date" BETWEEN %s AND %s ORDER BY "Date"
+    """
+    return pd.read_sql(query, plot_api.get_engine(), params=(ticker, start, end))
+
+
+# ************* Previous pandas implementations *************
+def pandas_monthly_avg_close(start: str, end: str) -> pd.DataFrame:
+    df = closes(TICKER, start, end)
+    df["Month"] = pd.to_datetime(df["Date"]).dt.strftime("%b")
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    return df.groupby("Month")["Close"].mean().reindex(months).reset_index(name="AvgClose")
+
+
+def pandas_rolling_avg(start: str, end: str) -> pd.DataFrame:
+    df = closes(TICKER, start, end)
+    df["Rolling_Avg"] = df["Close"].rolling(window=ROLLING_WINDOW).mean()
+    return df
+
+
+def pandas_daily_returns(start: str, end: str) -> pd.DataFrame:
+    df = closes(TICKER, start, end)
+    df["Daily_Return"] = df["Close"].pct_change() * 100
+    df["Month"] = pd.to_datetime(df["Date"]).dt.strftime("%B")
+    return df
+
+
+def pandas_cumulative_return(start: str, end: str) -> pd.DataFrame:
+    df = closes(TICKER, start, end)
+    df["Cumulative_Return"] = ((1 + df["Close"].pct_change()).cumprod() - 1) * 100
+    return df
+
+
+def pandas_correlation(start: str, end: str) -> pd.DataFrame:
+    query = """
+        SELECT "Ticker", "Date", "Close" FROM ai.prices
+        WHERE "Ticker" = ANY(%s) AND "Date" BETWEEN %s AND %s ORDER BY "Date", "Ticker"
+    """
+    df = pd.read_sql(query, plot_api.get_engine(), params=(CORRELATION_TICKERS, start, end))
+    returns = (df.pivot(index="Date", columns="Ticker", values="Close").pct_change() * 100).fillna(0)
+    return returns.corr()
+
+
+def pandas_sector_market_cap(start: str, end: str) -> pd.DataFrame:
+    query = """
+        SELECT p."Ticker", c.sector, p."Close", p."Volume"
+        FROM ai.prices p JOIN ai.companies c ON p."Ticker" = c.symbol WHERE p."Date" = %s
+    """
+    df = pd.read_sql(query, plot_api.get_engine(), params=(end,))
+    df["Market_Cap"] = df["Close"] * df["Volume"]
+    return df.groupby("sector")["Market_Cap"].sum().reset_index()
+
+
+# ************* Cases *************
+def sql(**params: Any) -> Callable[[str, str], pd.DataFrame]:
+    def run(start: str, end: str) -> pd.DataFrame:
+        dates = {"date": end} if params.get("data_type") == "sector_market_cap_pie" else {}
+        return plot_api.get_stock_data(start_date=start, end_date=end, **dates, **params)
+
+    return run
+
+
+CASES: Dict[str, Dict[str, Callable[[str, str], pd.DataFrame]]] = {
+    "monthly_avg_close": {
+        "pandas": pandas_monthly_avg_close,
+        "sql": sql(ticker=TICKER, plot_type="bar", data_type="monthly_avg_close"),
+    },
+    "rolling_avg": {
+        "pandas": pandas_rolling_avg,
+        "sql": sql(ticker=TICKER, plot_type="time_series", data_type="rolling_avg", rolling_window=ROLLING_WINDOW),
+    },
+    "daily_returns": {
+        "pandas": pandas_daily_returns,
+        "sql": sql(ticker=TICKER, plot_type="boxplot", data_type="daily_returns_boxplot"),
+    },
+    "cumulative_return": {
+        "pandas": pandas_cumulative_return,
+        "sql": sql(ticker=TICKER, plot_type="time_series", data_type="cumulative_return"),
+    },
+    "correlation_matrix": {
+        "pandas": pandas_correlation,
+        "sql": sql(
+            ticker="DJIA", plot_type="heatmap", data_type="correlation_matrix", tickers=CORRELATION_TICKERS
+        ),
+    },
+    "sector_market_cap": {
+        "pandas": pandas_sector_market_cap,
+        "sql": sql(ticker="DJIA", plot_type="pie", data_type="sector_market_cap_pie"),
+    },
+}
+
+
+def measure(fn: Callable[[str, str], pd.DataFrame], start: str, end: str, repeat: int) -> Dict[str, float]:
+    fn(start, end)  # warm up connections and caches
+    samples = []
+    for _ in range(repeat):
+        _fetched[0] = _fetched[1] = 0
+        t = time.perf_counter()
+        fn(start, end)
+        samples.append((time.perf_counter() - t) * 1000)
+    return {"rows": _fetched[0], "bytes": _fetched[1], "ms": statistics.median(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="30,365,730", help="Comma-separated date ranges, ending at the latest date")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement (median is reported)")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    pd.read_sql = counting_read_sql
+    latest = plot_api.get_trading_calendar().latest(1)
+    if not latest:
+        sys.exit("No prices in the database; run load_data.py first")
+    end = latest[0]
+    baseline: Optional[Dict[str, Any]] = json.loads(args.compare.read_text()) if args.compare else None
+
+    results: Dict[str, Any] = {}
+    print(f"{'plot':<20}{'days':>6}{'impl':>8}{'rows':>9}{'bytes':>12}{'ms':>9}" + ("   ms before" if baseline else ""))
+    for name, impls in CASES.items():
+        for days in [int(d) for d in args.days.split(",")]:
+            start = str(end - timedelta(days=days))
+            for impl, fn in impls.items():
+                key = f"{name}/{days}/{impl}"
+                r = results[key] = measure(fn, start, str(end), args.repeat)
+                line = f"{name:<20}{days:>6}{impl:>8}{r['rows']:>9,}{r['bytes']:>12,}{r['ms']:>9.1f}"
+                if baseline and key in baseline:
+                    line += f"{baseline[key]['ms']:>12.1f}"
+                print(line)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
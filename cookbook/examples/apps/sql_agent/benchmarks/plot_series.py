@@ -0,0 +1,95 @@
+"""Server cost of a chart: PNG rendering versus JSON series with LTTB downsampling.
+
+For a closing-price chart over each date range in `--days` (ending at the last
+date of `data/djia_prices_20250426.csv`), measures the median time and the
+response size of:
+
+- "png": `plot_api.create_plot`, the image returned by default,
+- "json": `plot_series.to_series` with `--max-points`, the `format=json`
+  response, serialized as FastAPI would.
+
+Data fetching is the same for both and is not measured, so no database is
+needed.
+
+Usage:
+    python benchmarks/plot_series.py --days 30,365,730 --max-points 500 --save series.json
+    python benchmarks/plot_series.py --compare series.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+import pandas as pd
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+import plot_api  # noqa: E402
+from config import data_dir  # noqa: E402
+from plot_series import DEFAULT_MAX_POINTS, to_series  # noqa: E402
+
+PRICES_CSV = data_dir.joinpath("djia_prices_20250426.csv")
+TICKER = "AAPL"
+
+
+def png(df: pd.DataFrame, max_points: int) -> int:
+    path = Path(plot_api.create_plot(df, TICKER))
+    size = path.stat().st_size
+    path.unlink(missing_ok=True)
+    return size
+
+
+def series(df: pd.DataFrame, max_points: int) -> int:
+    return len(json.dumps(to_series(df, "time_series", max_points)))
+
+
+def measure(
+    fn: Callable[[pd.DataFrame, int], int], df: pd.DataFrame, max_points: int, repeat: int
+) -> Tuple[float, int]:
+    size = fn(df, max_points)  # warm up imports and fonts
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df, max_points)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="30,365,730", help="Comma-separated date ranges, ending at the last date")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS, help="Point budget of the JSON series")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement (median is reported)")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    prices = pd.read_csv(PRICES_CSV, usecols=["Date", "Close", "Ticker"])
+    prices["Date"] = pd.to_datetime(prices["Date"], utc=True)
+    prices = prices[prices["Ticker"] == TICKER][["Date", "Close"]]
+    end = prices["Date"].max()
+
+    baseline: Dict[str, Any] = json.loads(args.compare.read_text()) if args.compare else {}
+    results: Dict[str, Any] = {}
+    print(f"{'days':>6}{'points':>8}{'format':>8}{'ms':>9}{'bytes':>10}" + ("   ms before" if baseline else ""))
+    for days in [int(d) for d in args.days.split(",")]:
+        df = prices[prices["Date"] >= end - pd.Timedelta(days=days)]
+        for name, fn in {"png": png, "json": series}.items():
+            ms, size = measure(fn, df, args.max_points, args.repeat)
+            key = f"{days}/{name}"
+            results[key] = {"points": len(df), "ms": ms, "bytes": size}
+            line = f"{days:>6}{len(df):>8}{name:>8}{ms:>9.1f}{size:>10,}"
+            if key in baseline:
+                line += f"{baseline[key]['ms']:>12.1f}"
+            print(line)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Plot throughput and event-loop blocking: inline rendering versus the worker pool.
+
+Renders `--plots` closing-price charts concurrently from an asyncio event loop,
+the way the `plot_api` endpoints do, first inline (the blocking call runs on
+the event loop, as before `plot_workers.py`) and then through a
+`PlotWorkerPool` of each size in `--workers`. For each run it reports the wall
+time, plots per second and the longest stall of a 10 ms heartbeat task on the
+event loop, i.e. how long any other request would have waited.
+
+Prices are read from `data/djia_prices_20250426.csv`, so no database is needed;
+only the rendering is measured.
+
+Usage:
+    python benchmarks/plot_workers.py --plots 32 --workers 1,2,4
+    python benchmarks/plot_workers.py --save plots.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from config import data_dir  # noqa: E402
+from plot_workers import PlotWorkerPool  # noqa: E402
+
+PRICES_CSV = data_dir.joinpath("djia_prices_20250426.csv")
+
+HEARTBEAT_S = 0.01
+
+_prices: Optional[Any] = None
+
+
+def render_csv(ticker: str) -> str:
+    """Closing-price chart of `ticker` from the CSV, rendered by `plot_api.create_plot`."""
+    global _prices
+    import pandas as pd
+    import plot_api
+
+    if _prices is None:
+        _prices = pd.read_csv(PRICES_CSV, usecols=["Date", "Close", "Ticker"])
+        _prices["Date"] = pd.to_datetime(_prices["Date"], utc=True)
+    df = _prices[_prices["Ticker"] == ticker]
+    path = plot_api.create_plot(df, ticker, str(df["Date"].min().date()), str(df["Date"].max().date()))
+    Path(path).unlink(missing_ok=True)
+    return path
+
+
+async def run(render: Callable[[str], Awaitable[str]], tickers: List[str]) -> Dict[str, float]:
+    """Render every ticker concurrently while a heartbeat task measures event-loop stalls."""
+    done = asyncio.Event()
+    max_lag = 0.0
+
+    async def heartbeat() -> None:
+        nonlocal max_lag
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT_S)
+            max_lag = max(max_lag, time.perf_counter() - start - HEARTBEAT_S)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*[render(ticker) for ticker in tickers])
+    wall = time.perf_counter() - start
+    done.set()
+    await beat
+    return {"wall_s": wall, "plots_per_s": len(tickers) / wall, "max_loop_lag_ms": max_lag * 1000}
+
+
+def tickers_for(plots: int) -> List[str]:
+    import pandas as pd
+
+    symbols = sorted(pd.read_csv(PRICES_CSV, usecols=["Ticker"])["Ticker"].unique())
+    return [symbols[i % len(symbols)] for i in range(plots)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plots", type=int, default=24, help="Plots rendered per run")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated pool sizes to measure")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    tickers = tickers_for(args.plots)
+    results: Dict[str, Dict[str, float]] = {}
+
+    async def inline(ticker: str) -> str:
+        return render_csv(ticker)
+
+    render_csv(tickers[0])  # import matplotlib and load the CSV outside the timing
+    results["inline"] = asyncio.run(run(inline, tickers))
+
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        pool = PlotWorkerPool(workers=workers, queue_depth=args.plots)
+        pool.warm_up()
+
+        async def pooled(ticker: str, pool: PlotWorkerPool = pool) -> str:
+            return await pool.run(render_csv, ticker)
+
+        asyncio.run(run(pooled, tickers[:workers]))  # each worker loads the CSV once
+        results[f"pool-{workers}"] = asyncio.run(run(pooled, tickers))
+        pool.shutdown()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+    header = f"{'run':<10}{'wall s':>10}{'plots/s':>10}{'max loop lag ms':>18}"
+    print(header + ("   plots/s before" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name:<10}{r['wall_s']:>10.2f}{r['plots_per_s']:>10.1f}{r['max_loop_lag_ms']:>18.1f}"
+        if name in baseline:
+            line += f"{baseline[name]['plots_per_s']:>18.1f}"
+        print(line)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Labeled questions of `test/djia_qna.json` and answer scoring, shared by the benchmarks."""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+app_dir = Path(__file__).parent.parent
+
+QNA_PATH = app_dir.joinpath("test", "djia_qna.json")
+
+# Numbers that are not part of a word ("3M", "Q4") or a list marker ("1)")
+NUMBER = re.compile(r"(?<![\w.])(\d[\d,]*(?:\.\d+)?)(?!\w)(?:\s*(billion|million|thousand)\b)?", re.IGNORECASE)
+SCALES = {"billion": 1e9, "million": 1e6, "thousand": 1e3}
+LIST_MARKER = re.compile(r"(?<!\S)\d+\)\s*")
+
+# Expected answers with these words are estimates and get the wider tolerance
+APPROXIMATE = re.compile(r"\b(about|approximately|roughly|around|near|nearly|order of|~)", re.IGNORECASE)
+
+# Label spellings used in the Q&A set
+COMPLEXITY_ALIASES = {"hard": "difficult"}
+
+
+def load_questions(path: Path = QNA_PATH) -> List[Dict[str, Any]]:
+    questions = json.loads(path.read_text())
+    for item in questions:
+        item["complexity"] = COMPLEXITY_ALIASES.get(item["complexity"], item["complexity"])
+    return questions
+
+
+def extract_numbers(text: str) -> List[float]:
+    numbers = []
+    for match in NUMBER.finditer(LIST_MARKER.sub("", text)):
+        value = float(match.group(1).replace(",", ""))
+        scale = match.group(2)
+        numbers.append(value * SCALES[scale.lower()] if scale else value)
+    return numbers
+
+
+def answer_matches(expected: str, answer: str, rel_tol: float = 0.01, approx_tol: float = 0.1) -> bool:
+    """True if every number of `expected` appears in `answer` within a relative
+    tolerance (`approx_tol` when the expected answer is an estimate), or, for
+    non-numeric answers, if every comma-separated item appears in the answer."""
+    expected_numbers = extract_numbers(expected)
+    if not expected_numbers:
+        items = [item.strip(" .$").lower() for item in LIST_MARKER.sub("", expected).split(",")]
+        return all(item in answer.lower() for item in items if item)
+    tol = approx_tol if APPROXIMATE.search(expected) else rel_tol
+    found = extract_numbers(answer)
+    return all(any(abs(f - e) <= tol * max(abs(e), 1e-9) for f in found) for e in expected_numbers)
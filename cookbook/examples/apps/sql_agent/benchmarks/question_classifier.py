@@ -0,0 +1,169 @@
+"""Latency/accuracy trade-off of the light agent profile.
+
+Offline (default): accuracy of the local question classifier against the
+labels in `test/djia_qna.json`, and how many questions it routes to the light
+profile. A hard question sent to the light profile is the costly mistake, so
+routing precision is reported separately. The patterns were written against
+`djia_qna.json`, so the same report is also run on the held-out questions of
+`test/classifier_holdout.json` (labels only, no answers).
+
+Live (`--live`): runs the routed questions through the agent twice, with the
+full profile only and with adaptive profiles, and compares latency, tool calls
+and answer accuracy. Needs the database, the knowledge base and model API keys.
+
+Usage:
+    python benchmarks/question_classifier.py
+    python benchmarks/question_classifier.py --live --limit 20 --save classifier_live.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from qna import answer_matches, load_questions  # noqa: E402
+from question_classifier import classify_question  # noqa: E402
+
+HOLDOUT_PATH = app_dir.joinpath("test", "classifier_holdout.json")
+
+
+def is_simple_label(item: Dict[str, Any]) -> bool:
+    return item["type"] in ("factual", "comparative") and item["complexity"] == "easy"
+
+
+def offline_report(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    predictions = [classify_question(q["question"]) for q in questions]
+    classify_us = (time.perf_counter() - start) * 1e6 / len(questions)
+
+    routing = Counter()
+    confusion = Counter()
+    misrouted = []
+    for item, pred in zip(questions, predictions):
+        gold = is_simple_label(item)
+        routing[("light" if pred.is_simple_lookup else "full", gold)] += 1
+        if pred.is_simple_lookup and not gold:
+            misrouted.append({"question": item["question"], "label": f"{item['type']}/{item['complexity']}"})
+        if pred.label != f"{item['type']}/{item['complexity']}":
+            confusion[(f"{item['type']}/{item['complexity']}", pred.label)] += 1
+
+    light = routing[("light", True)] + routing[("light", False)]
+    simple = routing[("light", True)] + routing[("full", True)]
+    return {
+        "questions": len(questions),
+        "classify_us": classify_us,
+        "type_accuracy": sum(p.type == q["type"] for q, p in zip(questions, predictions)) / len(questions),
+        "complexity_accuracy": sum(p.complexity == q["complexity"] for q, p in zip(questions, predictions))
+        / len(questions),
+        "routed_light": light,
+        "routing_precision": routing[("light", True)] / light if light else 0.0,
+        "routing_recall": routing[("light", True)] / simple if simple else 0.0,
+        "misrouted": misrouted,
+        "confusion": [{"label": k[0], "predicted": k[1], "count": v} for k, v in confusion.most_common()],
+    }
+
+
+def run_questions(questions: List[Dict[str, Any]], adaptive: bool, model_id: str) -> List[Dict[str, Any]]:
+    from agents import get_sql_agent
+
+    results = []
+    for item in questions:
+        # A fresh session per question so that chat history does not help
+        agent = get_sql_agent(model_id=model_id, debug_mode=False, use_answer_cache=False, adaptive_profile=adaptive)
+        start = time.perf_counter()
+        try:
+            response = agent.run(item["question"])
+            content = response.content if isinstance(response.content, str) else str(response.content)
+            error = None
+        except Exception as e:
+            content, error = "", str(e)
+        results.append(
+            {
+                "number": item["number"],
+                "profile": agent.profile.name,
+                "latency_s": time.perf_counter() - start,
+                "tool_calls": len(agent.run_response.tools or []) if agent.run_response else 0,
+                "correct": answer_matches(item["answer"], content),
+                "error": error,
+            }
+        )
+    return results
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(r["latency_s"] for r in results)
+    return {
+        "accuracy": sum(r["correct"] for r in results) / len(results),
+        "p50_s": statistics.median(latencies),
+        "mean_s": statistics.fmean(latencies),
+        "tool_calls": statistics.fmean(r["tool_calls"] for r in results),
+        "errors": sum(1 for r in results if r["error"]),
+    }
+
+
+def live_report(questions: List[Dict[str, Any]], model_id: str, limit: Optional[int]) -> Dict[str, Any]:
+    # Only questions the classifier routes to the light profile differ between the two runs
+    routed = [q for q in questions if classify_question(q["question"]).is_simple_lookup][:limit]
+    full = run_questions(routed, adaptive=False, model_id=model_id)
+    adaptive = run_questions(routed, adaptive=True, model_id=model_id)
+    return {"questions": len(routed), "full": summarize(full), "adaptive": summarize(adaptive)}
+
+
+def print_offline(title: str, offline: Dict[str, Any]) -> None:
+    print(title)
+    print(f"Questions:              {offline['questions']}")
+    print(f"Classification time:    {offline['classify_us']:.1f} µs/question")
+    print(f"Type accuracy:          {offline['type_accuracy']:.0%}")
+    print(f"Complexity accuracy:    {offline['complexity_accuracy']:.0%}")
+    print(f"Routed to light:        {offline['routed_light']}")
+    print(f"Routing precision:      {offline['routing_precision']:.0%}")
+    print(f"Routing recall:         {offline['routing_recall']:.0%}")
+    for item in offline["misrouted"]:
+        print(f"  misrouted ({item['label']}): {item['question']}")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print_offline("Tuning set (djia_qna.json):", report["offline"])
+    print_offline("\nHeld-out set (classifier_holdout.json):", report["holdout"])
+
+    live = report.get("live")
+    if live:
+        print(f"\nLive run on {live['questions']} routed questions:")
+        print(f"{'profile':<12}{'accuracy':>10}{'p50 s':>10}{'mean s':>10}{'tools':>8}{'errors':>8}")
+        for name in ("full", "adaptive"):
+            s = live[name]
+            print(
+                f"{name:<12}{s['accuracy']:>10.0%}{s['p50_s']:>10.2f}{s['mean_s']:>10.2f}"
+                f"{s['tool_calls']:>8.1f}{s['errors']:>8}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Also run the routed questions through the agent")
+    parser.add_argument("--limit", type=int, help="Maximum number of questions for the live run")
+    parser.add_argument("--model-id", default="google:gemini-2.0-flash", help="Model used for the live run")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    args = parser.parse_args()
+
+    questions = load_questions()
+    report: Dict[str, Any] = {
+        "offline": offline_report(questions),
+        "holdout": offline_report(load_questions(HOLDOUT_PATH)),
+    }
+    if args.live:
+        report["live"] = live_report(questions, args.model_id, args.limit)
+    print_report(report)
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
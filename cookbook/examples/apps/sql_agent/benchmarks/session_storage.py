@@ -0,0 +1,157 @@
+"""Session row size and load latency, with large tool results inline or in blob storage.
+
+Database mode (default) measures the sessions in `ai.sql_agent_sessions`:
+total and largest `memory` column size, `read()` latency per session and
+`get_all_sessions()` latency. Run it once, migrate with `--migrate` (rewrites
+every session through `BlobOffloadingStorage`), and run it again with
+`--compare` to see the difference.
+
+Synthetic mode (`--synthetic`) needs no database: it builds a session with
+`--turns` SQL results of `--rows` rows and compares the serialized row size
+and JSON decode time with results inline and offloaded.
+
+Usage:
+    python benchmarks/session_storage.py --save sessions_before.json
+    python benchmarks/session_storage.py --migrate
+    python benchmarks/session_storage.py --compare sessions_before.json
+    python benchmarks/session_storage.py --synthetic --turns 20 --rows 500
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import statistics
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+app_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(app_dir))
+
+from blob_storage import DEFAULT_BLOB_THRESHOLD, blob_ref, find_large_tool_results  # noqa: E402
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Median wall time of `fn()` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure_db(repeat: int) -> Dict[str, Any]:
+    from agents import get_agent_storage, get_blob_store
+    from sqlalchemy import text
+
+    storage = get_agent_storage()
+    with storage.db_engine.connect() as conn:
+        sizes = conn.execute(
+            text(f"SELECT session_id, pg_column_size(memory) FROM {storage.table.fullname} ORDER BY 2 DESC")
+        ).all()
+    session_ids = [row[0] for row in sizes]
+    read_ms = [timed(lambda sid=sid: storage.read(sid), repeat) for sid in session_ids]
+    try:
+        blobs = get_blob_store().stats()
+    except Exception:
+        blobs = {"blobs": 0, "bytes": 0, "compressed_bytes": 0}
+    return {
+        "sessions": len(session_ids),
+        "memory_bytes": sum(row[1] or 0 for row in sizes),
+        "largest_memory_bytes": sizes[0][1] if sizes else 0,
+        "read_ms_p50": statistics.median(read_ms) if read_ms else 0.0,
+        "read_ms_max": max(read_ms) if read_ms else 0.0,
+        "list_ms": timed(storage.get_all_sessions, repeat),
+        "blob_store": blobs,
+    }
+
+
+def migrate() -> int:
+    """Rewrite every session so that its large tool results move to blob storage."""
+    from agents import get_agent_storage
+
+    storage = get_agent_storage()
+    sessions = storage.get_all_sessions()
+    for session in sessions:
+        storage.upsert(session)
+    return len(sessions)
+
+
+def synthetic_memory(turns: int, rows: int) -> Dict[str, Any]:
+    runs = []
+    messages = []
+    for turn in range(turns):
+        rows_json = [{"date": f"2024-01-{i % 28 + 1:02d}", "close": 180.0 + turn + i * 0.1} for i in range(rows)]
+        content = json.dumps(rows_json)
+        tool_message = {"role": "tool", "tool_call_id": f"call_{turn}", "tool_name": "run_sql_query"}
+        tool_message["content"] = content
+        answer = {"role": "assistant", "content": f"Answer {turn}"}
+        messages += [{"role": "user", "content": f"Question {turn}"}, tool_message, answer]
+        runs.append({"response": {"messages": [tool_message, answer], "tools": [dict(tool_message)]}})
+    return {"runs": runs, "messages": copy.deepcopy(messages)}
+
+
+def measure_synthetic(turns: int, rows: int, repeat: int) -> Dict[str, Any]:
+    inline = synthetic_memory(turns, rows)
+    offloaded = copy.deepcopy(inline)
+    blobs: Dict[str, int] = {}
+    for container, key in find_large_tool_results(offloaded, DEFAULT_BLOB_THRESHOLD):
+        raw = container[key].encode()
+        digest = hashlib.sha256(raw).hexdigest()
+        blobs[digest] = len(zlib.compress(raw, 6))
+        container[key] = blob_ref(digest, len(raw))
+
+    results = {}
+    for name, memory in (("inline", inline), ("offloaded", offloaded)):
+        row = json.dumps(memory)
+        results[name] = {"row_bytes": len(row.encode()), "decode_ms": timed(lambda row=row: json.loads(row), repeat)}
+    results["offloaded"]["blobs"] = len(blobs)
+    results["offloaded"]["blob_compressed_bytes"] = sum(blobs.values())
+    return results
+
+
+def print_db_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    keys = ["sessions", "memory_bytes", "largest_memory_bytes", "read_ms_p50", "read_ms_max", "list_ms"]
+    print(f"{'metric':<24}{'now':>16}" + (f"{'before':>16}" if baseline else ""))
+    for key in keys:
+        line = f"{key:<24}{results[key]:>16,.1f}"
+        if baseline:
+            line += f"{baseline[key]:>16,.1f}"
+        print(line)
+    blobs = results["blob_store"]
+    print(f"\nBlob store: {blobs['blobs']} blobs, {blobs['bytes']:,} bytes ({blobs['compressed_bytes']:,} compressed)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="Measure a synthetic session, no database needed")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per timing (median is reported)")
+    parser.add_argument("--migrate", action="store_true", help="Move large tool results of stored sessions to blobs")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        results: Dict[str, Any] = measure_synthetic(args.turns, args.rows, args.repeat)
+        for name, r in results.items():
+            print(f"{name:<10} row {r['row_bytes']:>12,} bytes   decode {r['decode_ms']:>8.2f} ms")
+        offloaded = results["offloaded"]
+        print(f"blobs: {offloaded['blobs']}, {offloaded['blob_compressed_bytes']:,} bytes compressed")
+    else:
+        if args.migrate:
+            print(f"Migrated {migrate()} sessions")
+        results = measure_db(args.repeat)
+        baseline = json.loads(args.compare.read_text()) if args.compare else None
+        print_db_report(results, baseline)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Startup-time benchmark for the SQL Agent entry points.
+
+Imports each entry point in a fresh interpreter with `python -X importtime`
+and reports the cumulative import time, the wall time and the slowest imports.
+
+Usage:
+    python benchmarks/startup_time.py --runs 3 --save startup_after.json
+    python benchmarks/startup_time.py --compare startup_before.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+app_dir = Path(__file__).parent.parent
+
+# Entry point file -> module imported by the benchmark
+ENTRY_POINTS = {
+    "app.py": "app",
+    "playground.py": "playground",
+    "plot_api.py": "plot_api",
+    "load_data.py": "load_data",
+    "load_knowledge.py": "load_knowledge",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> Dict[str, Any]:
+    """Import `module` once in a fresh interpreter and parse the importtime report."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=app_dir,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    # importtime prints children before their parent, one indent level deeper
+    imports: List[Dict[str, Any]] = []
+    children: List[Dict[str, Any]] = []
+    direct_imports: List[Dict[str, Any]] = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entry = {"name": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+            depth = (len(indent) - 1) // 2
+            imports.append(entry)
+            if depth == 1:
+                children.append(entry)
+            elif depth == 0:
+                if name == module:
+                    direct_imports = children
+                children = []
+    top_level = [i for i in imports if i["name"] == module]
+    result: Dict[str, Any] = {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "wall_ms": wall_ms,
+        "import_ms": top_level[0]["cumulative_ms"] if top_level else 0.0,
+        "module_count": len(imports),
+        "slowest": sorted(direct_imports, key=lambda i: i["cumulative_ms"], reverse=True),
+    }
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        result["error"] = errors[-1] if errors else f"exit code {proc.returncode}"
+    return result
+
+
+def run_benchmark(runs: int, top: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for entry_point, module in ENTRY_POINTS.items():
+        samples = [measure(module) for _ in range(runs)]
+        best = min(samples, key=lambda s: s["import_ms"])
+        results[entry_point] = {
+            "ok": all(s["ok"] for s in samples),
+            "error": best.get("error"),
+            "import_ms": statistics.median(s["import_ms"] for s in samples),
+            "wall_ms": statistics.median(s["wall_ms"] for s in samples),
+            "module_count": best["module_count"],
+            "slowest": [{"name": i["name"], "cumulative_ms": i["cumulative_ms"]} for i in best["slowest"][:top]],
+        }
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    header = f"{'entry point':<20}{'import ms':>12}{'wall ms':>12}{'modules':>10}"
+    if baseline:
+        header += f"{'before ms':>12}{'saved ms':>12}"
+    print(header)
+    print("-" * len(header))
+    for entry_point, r in results.items():
+        line = f"{entry_point:<20}{r['import_ms']:>12.1f}{r['wall_ms']:>12.1f}{r['module_count']:>10}"
+        if baseline and entry_point in baseline:
+            before = baseline[entry_point]["import_ms"]
+            line += f"{before:>12.1f}{before - r['import_ms']:>12.1f}"
+        if not r["ok"]:
+            line += f"  (failed: {r['error']})"
+        print(line)
+
+    for entry_point, r in results.items():
+        print(f"\nSlowest direct imports of {entry_point}:")
+        for i in r["slowest"]:
+            print(f"  {i['cumulative_ms']:>10.1f} ms  {i['name']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per entry point (median is reported)")
+    parser.add_argument("--top", type=int, default=8, help="Number of slowest imports to list")
+    parser.add_argument("--save", type=Path, help="Save results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results (JSON) to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, args.top)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(results, baseline)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Out-of-line storage for large tool results in agent sessions.
+
+`PostgresAgentStorage` keeps every run, including full SQL results, in the
+`memory` column of the session row, so reading or listing sessions moves
+megabytes. `BlobOffloadingStorage` moves tool results above a size threshold
+to a content-addressed table (`ai.sql_agent_blobs`, zlib-compressed, keyed by
+SHA-256) and keeps only a short reference in the session row:
+
+    [blob:sha256:<hex>:<size>]
+
+Every copy of a large result is moved: the tool messages of the chat history
+and of each run, and the tool calls shown in the UI. agno reloads the session
+at the start of every run and replays the tool messages to the model, so
+`read` loads their content back. The UI copies are resolved lazily with
+`BlobStore.load` when a tool call is expanded.
+"""
+
+import hashlib
+import re
+import time
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agno.storage.postgres import PostgresStorage
+from agno.storage.session import Session
+from agno.utils.log import log_debug, logger
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import Column, MetaData, Table
+from sqlalchemy.sql.expression import select, text
+from sqlalchemy.types import BigInteger, Integer, LargeBinary, String
+
+BLOB_REF_PATTERN = re.compile(r"^\[blob:sha256:([0-9a-f]{64}):(\d+)\]$")
+
+# Tool results at least this long (characters) are stored out of line
+DEFAULT_BLOB_THRESHOLD = 4096
+
+# Decompressed blobs kept in memory for repeated expansion in the UI
+BLOB_CACHE_SIZE = 64
+
+# Digests remembered as already stored, to skip rewriting them on every session write
+STORED_DIGESTS_SIZE = 4096
+
+
+def blob_ref(digest: str, size: int) -> str:
+    return f"[blob:sha256:{digest}:{size}]"
+
+
+def parse_blob_ref(value: Any) -> Optional[Tuple[str, int]]:
+    """(digest, size) if `value` is a blob reference, else None."""
+    if not isinstance(value, str) or not value.startswith("[blob:"):
+        return None
+    match = BLOB_REF_PATTERN.match(value)
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+class BlobStore:
+    """Content-addressed, compressed blobs in a Postgres table."""
+
+    def __init__(self, db_engine: Engine, table_name: str = "sql_agent_blobs", schema: Optional[str] = "ai"):
+        self.db_engine = db_engine
+        self.schema = schema
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("digest", String, primary_key=True),
+            Column("size", Integer, nullable=False),
+            Column("compressed_size", Integer, nullable=False),
+            Column("data", LargeBinary, nullable=False),
+            Column("created_at", BigInteger, default=lambda: int(time.time())),
+            extend_existing=True,
+        )
+        self._created = False
+        self._stored: "OrderedDict[str, None]" = OrderedDict()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def create(self) -> None:
+        if self._created:
+            return
+        with self.db_engine.begin() as conn:
+            if self.schema is not None:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(conn, checkfirst=True)
+        self._created = True
+
+    def put_many(self, contents: Iterable[str]) -> Dict[str, str]:
+        """Store `contents` and return content -> reference. Existing blobs are not rewritten."""
+        refs: Dict[str, str] = {}
+        rows: List[Dict[str, Any]] = []
+        for content in contents:
+            if content in refs:
+                continue
+            raw = content.encode()
+            digest = hashlib.sha256(raw).hexdigest()
+            refs[content] = blob_ref(digest, len(raw))
+            # Sessions are rewritten after every run; skip blobs this process already stored
+            with self._lock:
+                if digest in self._stored:
+                    self._stored.move_to_end(digest)
+                    continue
+            compressed = zlib.compress(raw, 6)
+            rows.append({"digest": digest, "size": len(raw), "compressed_size": len(compressed), "data": compressed})
+        if rows:
+            self.create()
+            stmt = postgresql.insert(self.table).values(rows).on_conflict_do_nothing(index_elements=["digest"])
+            with self.db_engine.begin() as conn:
+                conn.execute(stmt)
+        with self._lock:
+            for row in rows:
+                self._stored[row["digest"]] = None
+            while len(self._stored) > STORED_DIGESTS_SIZE:
+                self._stored.popitem(last=False)
+        return refs
+
+    def load(self, ref: str) -> Optional[str]:
+        """Content of a blob reference, or None if it is unknown."""
+        parsed = parse_blob_ref(ref)
+        if parsed is None:
+            return None
+        digest = parsed[0]
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        with self.db_engine.connect() as conn:
+            data = conn.execute(select(self.table.c.data).where(self.table.c.digest == digest)).scalar()
+        if data is None:
+            return None
+        content = zlib.decompress(data).decode()
+        with self._lock:
+            self._cache[digest] = content
+            while len(self._cache) > BLOB_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return content
+
+    def stats(self) -> Dict[str, int]:
+        with self.db_engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    f"SELECT count(*), coalesce(sum(size), 0), coalesce(sum(compressed_size), 0) "
+                    f"FROM {self.table.fullname}"
+                )
+            ).one()
+        return {"blobs": row[0], "bytes": row[1], "compressed_bytes": row[2]}
+
+
+def tool_messages(memory: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Tool messages of the chat history and of every run."""
+    for message in memory.get("messages") or []:
+        if message.get("role") == "tool":
+            yield message
+    for run in memory.get("runs") or []:
+        for message in (run.get("response") or {}).get("messages") or []:
+            if message.get("role") == "tool":
+                yield message
+
+
+def find_large_tool_results(memory: Dict[str, Any], threshold: int) -> List[Tuple[Dict[str, Any], str]]:
+    """(container, key) pairs of inline tool results of at least `threshold` characters."""
+    found: List[Tuple[Dict[str, Any], str]] = []
+    for message in tool_messages(memory):
+        content = message.get("content")
+        if isinstance(content, str) and len(content) >= threshold:
+            found.append((message, "content"))
+    for run in memory.get("runs") or []:
+        response = run.get("response") or {}
+        for tool in response.get("tools") or []:
+            content = tool.get("content")
+            if isinstance(content, str) and len(content) >= threshold:
+                found.append((tool, "content"))
+    return found
+
+
+class BlobOffloadingStorage(PostgresStorage):
+    """Agent session storage that keeps large tool results in a `BlobStore`."""
+
+    def __init__(
+        self, *args: Any, blob_store: BlobStore, blob_threshold: int = DEFAULT_BLOB_THRESHOLD, **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold
+
+    def offload(self, session: Session) -> int:
+        """Replace large tool results in `session.memory` with blob references.
+
+        `session.memory` is a fresh dict built for this write, so it is changed
+        in place. Returns the number of characters moved out of the row.
+        """
+        if not session.memory:
+            return 0
+        targets = find_large_tool_results(session.memory, self.blob_threshold)
+        if not targets:
+            return 0
+        refs = self.blob_store.put_many(container[key] for container, key in targets)
+        moved = 0
+        for container, key in targets:
+            moved += len(container[key])
+            container[key] = refs[container[key]]
+        log_debug(f"Moved {len(targets)} tool results ({moved} characters) to blob storage")
+        return moved
+
+    def load_messages(self, session: Session) -> int:
+        """Replace the blob references of the tool messages in `session.memory` with their content.
+
+        The UI copies of the tool calls keep their references and are loaded on demand.
+        Returns the number of messages restored.
+        """
+        if not session.memory:
+            return 0
+        # The history and the run hold a copy of each message; load each tool call once
+        loaded: Dict[str, Optional[str]] = {}
+        restored = 0
+        for message in tool_messages(session.memory):
+            ref = message.get("content")
+            if parse_blob_ref(ref) is None:
+                continue
+            key = message.get("tool_call_id") or ref
+            if key not in loaded:
+                loaded[key] = self.blob_store.load(ref)
+            if loaded[key] is not None:
+                message["content"] = loaded[key]
+                restored += 1
+        return restored
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[Session]:
+        session = super().read(session_id, user_id=user_id)
+        if session is not None:
+            try:
+                self.load_messages(session)
+            except Exception as e:
+                logger.warning(f"Could not load tool results from blob storage: {e}")
+        return session
+
+    def upsert(self, session: Session, create_and_retry: bool = True) -> Optional[Session]:
+        try:
+            self.offload(session)
+        except Exception as e:
+            # Keep the session inline rather than losing the write
+            logger.warning(f"Could not move tool results to blob storage: {e}")
+        return super().upsert(session, create_and_retry=create_and_retry)
@@ -0,0 +1,30 @@
+"""Shared settings for the SQL Agent app.
+
+Kept free of heavy imports so that loaders and scripts can read the database
+URL and paths without pulling in the agent, provider SDKs or the vector DB.
+"""
+
+from pathlib import Path
+
+# ************* Database Connection *************
+db_url = "postgresql+psycopg://ai:ai@localhost:5532/ai"
+# *******************************
+
+# ************* Paths *************
+cwd = Path(__file__).parent
+knowledge_dir = cwd.joinpath("knowledge")
+data_dir = cwd.joinpath("data")
+output_dir = cwd.joinpath("output")
+# Generated plots and files, size-bounded by artifact_store.py
+artifacts_dir = output_dir.joinpath("artifacts")
+# Recorded model responses replayed by `replay:` model ids (see replay_model.py)
+model_fixtures_dir = cwd.joinpath("test", "fixtures", "model")
+# Marker written by load_data.py each time the database is reloaded
+data_version_path = output_dir.joinpath("data_version.json")
+# *******************************
+
+
+def get_output_dir() -> Path:
+    """Returns the output directory, creating it on first use."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
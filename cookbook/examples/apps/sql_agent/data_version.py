@@ -0,0 +1,45 @@
+"""Data version marker shared by every in-process cache.
+
+`load_data.py` bumps the version after reloading the database. Caches store
+the version they were built with and drop their entries when it changes.
+"""
+
+import json
+import time
+import uuid
+from typing import Optional, Tuple
+
+from config import data_version_path, get_output_dir
+
+# Version reported before the first reload has been recorded
+INITIAL_VERSION = "initial"
+
+# (mtime_ns, version) of the last read, so unchanged markers are not re-parsed
+_last_read: Optional[Tuple[int, str]] = None
+
+
+def get_data_version() -> str:
+    """Returns the current data version (a cheap `stat` when unchanged)."""
+    global _last_read
+    try:
+        mtime_ns = data_version_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return INITIAL_VERSION
+    if _last_read is not None and _last_read[0] == mtime_ns:
+        return _last_read[1]
+    try:
+        version = json.loads(data_version_path.read_text())["version"]
+    except (ValueError, KeyError, OSError):
+        return INITIAL_VERSION
+    _last_read = (mtime_ns, version)
+    return version
+
+
+def bump_data_version() -> str:
+    """Record that the data was reloaded and return the new version."""
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    get_output_dir()
+    tmp_path = data_version_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"version": version, "loaded_at": time.time()}))
+    tmp_path.replace(data_version_path)
+    return version
@@ -0,0 +1,272 @@
+"""In-memory company name -> stock symbol resolution.
+
+Mapping "Boeing" to `BA` used to take a model turn plus a
+`LIKE '%' || :company_name || '%'` query on `companies` (the "Get stock symbol
+from company name" templates in `knowledge/djia_queries.sql`).
+`EntityResolver` loads `companies` once per data version and resolves names
+with dictionary lookups. Only companies with rows in `companies` are indexed;
+the `- Name (TICKER)` lines of `knowledge/stock_symbols.md` only add names for
+them (the list also names stocks that are not in the data, e.g. PEP).
+Lookups go through:
+
+1. symbols ("BA", "ba"),
+2. names and aliases: the full name, the name without legal suffixes
+   ("Boeing Company (The)" -> "boeing"), the knowledge base names and a few
+   common short forms (`ALIASES`),
+3. unique prefixes ("goldman" -> GS),
+4. fuzzy matches (`difflib`), for typos such as "Catepillar".
+
+`find_symbols` finds every company named in a free-text question or plot
+command. The agent's `resolve_companies` tool (`EntityTools`) and
+`plot_api.parse_plot_command` use it.
+"""
+
+import difflib
+import json
+import re
+import threading
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.tools import Toolkit
+from agno.utils.log import log_debug, logger
+from data_version import get_data_version
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Lines like "- Boeing (BA)" in knowledge/stock_symbols.md
+SYMBOL_LINE = re.compile(r"^-\s+(.+?)\s+\(([A-Z.]+)\)\s*$")
+
+# Legal suffixes dropped to build the short form of a company name
+NAME_SUFFIXES = re.compile(
+    r"(?:,?\s+(?:inc\.?|incorporated|corporation|corp\.?|company|companies|co\.|group|plc|ltd\.?)"
+    r"|\s*\(the\)|\s+&\s+(?:co\.?|company))$"
+)
+
+# Short forms that are not derived from the names
+ALIASES = {
+    "amex": "AXP",
+    "coke": "KO",
+    "disney": "DIS",
+    "goldman": "GS",
+    "j&j": "JNJ",
+    "johnson and johnson": "JNJ",
+    "jpmorgan": "JPM",
+    "jp morgan": "JPM",
+    "p&g": "PG",
+    "procter and gamble": "PG",
+    "walgreens": "WBA",
+}
+
+# Short names that are too ambiguous to match in free text ("Dow" in "Dow Jones")
+TEXT_EXCLUDED = {"dow"}
+
+# Minimum difflib ratio for a fuzzy match
+FUZZY_CUTOFF = 0.8
+
+# Resolved queries remembered until the next rebuild
+MEMO_SIZE = 4096
+
+QUOTES = {"‘": "'", "’": "'"}
+
+
+def normalize_name(name: str) -> str:
+    for src, dst in QUOTES.items():
+        name = name.replace(src, dst)
+    return " ".join(name.lower().split())
+
+
+def short_name(name: str) -> str:
+    """Company name without its legal suffixes and leading "The"."""
+    short = normalize_name(name)
+    if short.startswith("the "):
+        short = short[4:]
+    while True:
+        stripped = NAME_SUFFIXES.sub("", short).strip()
+        if stripped == short:
+            return short
+        short = stripped
+
+
+@dataclass
+class Company:
+    symbol: str
+    name: str
+    sector: Optional[str] = None
+
+
+@dataclass
+class Resolution:
+    query: str
+    symbol: str
+    name: str
+    sector: Optional[str]
+    # How the query matched: "symbol", "alias", "prefix" or "fuzzy"
+    match: str
+    score: float = 1.0
+
+
+def load_symbol_list(path: Path) -> List[Tuple[str, str]]:
+    """(name, ticker) pairs of a `- Name (TICKER)` list."""
+    if not path.exists():
+        return []
+    pairs = []
+    for line in path.read_text().splitlines():
+        match = SYMBOL_LINE.match(line.strip())
+        if match:
+            pairs.append((match.group(1), match.group(2)))
+    return pairs
+
+
+class EntityResolver:
+    """Company names and symbols, resolved in memory."""
+
+    def __init__(self, db_engine: Optional[Engine] = None, symbols_path: Optional[Path] = None):
+        self.db_engine = db_engine
+        self.symbols_path = symbols_path
+        self.companies: Dict[str, Company] = {}
+        self.aliases: Dict[str, str] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self._memo: Dict[str, Optional[Resolution]] = {}
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    # ************* Index *************
+    def _load_companies(self) -> List[Company]:
+        if self.db_engine is None:
+            return []
+        try:
+            with self.db_engine.connect() as conn:
+                rows = conn.execute(text("SELECT symbol, name, sector FROM companies")).all()
+        except Exception as e:
+            logger.warning(f"Could not load companies for symbol resolution: {e}")
+            return []
+        return [Company(symbol=row[0], name=row[1], sector=row[2]) for row in rows]
+
+    def build(self, companies: List[Company], symbol_list: List[Tuple[str, str]]) -> None:
+        """Index `companies`; the (name, ticker) pairs of the knowledge base add names for them."""
+        index: Dict[str, Company] = {c.symbol: c for c in companies}
+
+        aliases: Dict[str, str] = {}
+
+        def add(alias: str, symbol: str) -> None:
+            alias = normalize_name(alias)
+            if alias and symbol in index:
+                aliases.setdefault(alias, symbol)
+                # "mcdonald's" -> also "mcdonalds" and "mcdonald"
+                if alias.endswith("'s"):
+                    aliases.setdefault(alias[:-2] + "s", symbol)
+                    aliases.setdefault(alias[:-2], symbol)
+
+        for company in index.values():
+            add(company.name, company.symbol)
+            add(short_name(company.name), company.symbol)
+        for name, symbol in symbol_list:
+            add(name, symbol)
+            add(short_name(name), symbol)
+        for alias, symbol in ALIASES.items():
+            add(alias, symbol)
+
+        names = sorted((a for a in aliases if a not in TEXT_EXCLUDED), key=len, reverse=True)
+        alternation = "|".join(re.escape(n) for n in names)
+        pattern = re.compile(rf"(?<![\w&])({alternation})(?![\w&])") if names else None
+        self.companies, self.aliases, self._pattern, self._memo = index, aliases, pattern, {}
+        log_debug(f"Entity resolver: {len(index)} companies, {len(aliases)} names")
+
+    def refresh(self) -> None:
+        """Rebuild the index if the data was reloaded since it was built."""
+        version = get_data_version()
+        if version == self._data_version:
+            return
+        with self._lock:
+            if version == self._data_version:
+                return
+            symbol_list = load_symbol_list(self.symbols_path) if self.symbols_path else []
+            self.build(self._load_companies(), symbol_list)
+            self._data_version = version
+
+    # ************* Lookups *************
+    def resolve(self, query: str) -> Optional[Resolution]:
+        """Best match for one company name or symbol, or None."""
+        self.refresh()
+        key = normalize_name(query).strip(" .?!")
+        if key in self._memo:
+            result = self._memo[key]
+            return replace(result, query=query.strip()) if result is not None else None
+        result = self._resolve(query.strip(), key)
+        if len(self._memo) < MEMO_SIZE:
+            self._memo[key] = result
+        return result
+
+    def _result(self, query: str, symbol: str, match: str, score: float = 1.0) -> Resolution:
+        company = self.companies[symbol]
+        return Resolution(query, company.symbol, company.name, company.sector, match, score)
+
+    def _resolve(self, query: str, key: str) -> Optional[Resolution]:
+        if not key:
+            return None
+        if key.upper() in self.companies:
+            return self._result(query, key.upper(), "symbol")
+        if key in self.aliases:
+            return self._result(query, self.aliases[key], "alias")
+        prefixed = {symbol for alias, symbol in self.aliases.items() if alias.startswith(key + " ")}
+        if len(prefixed) == 1:
+            return self._result(query, prefixed.pop(), "prefix")
+        close = difflib.get_close_matches(key, list(self.aliases), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            score = difflib.SequenceMatcher(None, key, close[0]).ratio()
+            return self._result(query, self.aliases[close[0]], "fuzzy", score)
+        return None
+
+    def candidates(self, query: str, n: int = 3) -> List[Company]:
+        """Closest companies for a query that did not resolve."""
+        self.refresh()
+        close = difflib.get_close_matches(normalize_name(query), list(self.aliases), n=n * 2, cutoff=0.5)
+        symbols = list(dict.fromkeys(self.aliases[c] for c in close))[:n]
+        return [self.companies[s] for s in symbols]
+
+    def find_symbols(self, text: str) -> List[str]:
+        """Symbols of the companies named in `text`, in order of appearance.
+
+        Upper-case tokens count as symbols; single letters ("V", "T") only in
+        parentheses, e.g. "Visa (V)".
+        """
+        self.refresh()
+        found: List[Tuple[int, str]] = []
+        if self._pattern is not None:
+            found += [(m.start(), self.aliases[m.group(1)]) for m in self._pattern.finditer(normalize_name(text))]
+        for match in re.finditer(r"\b[A-Z]{1,5}\b", text):
+            token = match.group(0)
+            in_parentheses = text[match.start() - 1 : match.end() + 1] == f"({token})"
+            if token in self.companies and (len(token) > 1 or in_parentheses):
+                found.append((match.start(), token))
+        return list(dict.fromkeys(symbol for _, symbol in sorted(found)))
+
+
+class EntityTools(Toolkit):
+    """Company symbol lookups served by an `EntityResolver`."""
+
+    def __init__(self, resolver: EntityResolver):
+        super().__init__(name="entity_tools")
+        self.resolver = resolver
+        self.register(self.resolve_companies)
+
+    def resolve_companies(self, names: str) -> str:
+        """Use this function to get the stock symbols, full names and sectors of companies.
+        It is much faster than querying the companies table.
+
+        Args:
+            names (str): Company names or symbols, separated by semicolons, e.g. "Boeing; Goldman Sachs; MSFT".
+        Returns:
+            str: JSON list with one result per name. Unresolved names have "symbol": null and "candidates".
+        """
+        results: List[Dict[str, Any]] = []
+        for name in [n.strip() for n in re.split(r"[;\n]", names) if n.strip()]:
+            resolution = self.resolver.resolve(name)
+            if resolution is not None:
+                results.append(asdict(resolution))
+            else:
+                candidates = [asdict(c) for c in self.resolver.candidates(name)]
+                results.append({"query": name, "symbol": None, "candidates": candidates})
+        return json.dumps(results)
@@ -0,0 +1,121 @@
+"""Compaction of old tool results in the agent's chat history.
+
+`UnlimitedSQLTools` returns every row of a query, and the session history
+keeps each result verbatim. Once a run is older than `keep_turns` turns, its
+large tool results are replaced by a short summary: the SQL that produced
+them, the row count, the first rows and per-column aggregates. The history
+replayed into new prompts then grows by a bounded amount per turn.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.memory.agent import AgentMemory
+
+COMPACTED_MARKER = "[compacted tool result]"
+
+# Runs kept verbatim, counted from the latest one
+DEFAULT_KEEP_TURNS = 2
+
+# Tool results shorter than this are kept as they are
+DEFAULT_MIN_CHARS = 1500
+
+# Rows shown in the summary of a compacted result
+HEAD_ROWS = 3
+
+
+def _parse_rows(content: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        rows = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(rows, list) and all(isinstance(r, dict) for r in rows):
+        return rows
+    return None
+
+
+def _aggregates(rows: List[Dict[str, Any]]) -> List[str]:
+    lines = []
+    for column in rows[0]:
+        values = [r.get(column) for r in rows if r.get(column) is not None]
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if numbers and len(numbers) == len(values):
+            lines.append(
+                f"{column}: min={min(numbers):g}, max={max(numbers):g}, mean={sum(numbers) / len(numbers):g}"
+            )
+        elif values:
+            lines.append(f"{column}: first={values[0]}, last={values[-1]}, distinct={len(set(map(str, values)))}")
+    return lines
+
+
+def summarize_tool_result(tool_name: Optional[str], tool_args: Any, content: str) -> str:
+    """Short replacement for a tool result: SQL, row count, head and aggregates."""
+    lines = [f"{COMPACTED_MARKER} {tool_name or 'tool'}, {len(content)} characters"]
+    if isinstance(tool_args, dict) and tool_args.get("query"):
+        lines.append(f"SQL: {tool_args['query']}")
+    rows = _parse_rows(content)
+    if rows is None:
+        lines.append(f"Head: {content[:300]}")
+    elif rows:
+        lines.append(f"Rows: {len(rows)}; columns: {', '.join(rows[0])}")
+        lines.append(f"Head: {json.dumps(rows[:HEAD_ROWS], default=str)}")
+        lines.extend(_aggregates(rows))
+    else:
+        lines.append("Rows: 0")
+    lines.append("Re-run the SQL to get the full result.")
+    return "\n".join(lines)
+
+
+def _should_compact(content: Any, min_chars: int) -> bool:
+    return isinstance(content, str) and len(content) >= min_chars and not content.startswith(COMPACTED_MARKER)
+
+
+def compact_history(
+    memory: Any, keep_turns: int = DEFAULT_KEEP_TURNS, min_chars: int = DEFAULT_MIN_CHARS
+) -> Tuple[int, int]:
+    """Compact large tool results of the runs older than the last `keep_turns`.
+
+    Returns:
+        (number of results compacted, characters removed)
+    """
+    if not isinstance(memory, AgentMemory) or len(memory.runs) <= keep_turns:
+        return 0, 0
+
+    compacted = 0
+    saved = 0
+    summaries: Dict[str, str] = {}
+    for run in memory.runs[: len(memory.runs) - keep_turns]:
+        response = run.response
+        if response is None:
+            continue
+        for message in response.messages or []:
+            if message.role == "tool" and _should_compact(message.content, min_chars):
+                summary = summarize_tool_result(message.tool_name, message.tool_args, message.content)
+                saved += len(message.content) - len(summary)
+                compacted += 1
+                message.content = summary
+                if message.tool_call_id:
+                    summaries[message.tool_call_id] = summary
+        # Tool calls shown in the UI
+        for tool in response.tools or []:
+            content = tool.get("content")
+            if _should_compact(content, min_chars):
+                summary = summaries.get(tool.get("tool_call_id")) or summarize_tool_result(
+                    tool.get("tool_name"), tool.get("tool_args"), content
+                )
+                tool["content"] = summary
+                if tool.get("tool_call_id"):
+                    summaries[tool["tool_call_id"]] = summary
+
+    # Chat messages are separate objects once a session is loaded from storage
+    for message in memory.messages:
+        if message.role == "tool" and message.tool_call_id in summaries and _should_compact(message.content, min_chars):
+            message.content = summaries[message.tool_call_id]
+    return compacted, saved
+
+
+def history_chars(memory: Any) -> int:
+    """Size of the message history that can be replayed into a prompt."""
+    if not isinstance(memory, AgentMemory):
+        return 0
+    return sum(len(m.get_content_string() or "") for m in memory.get_messages_from_last_n_runs())
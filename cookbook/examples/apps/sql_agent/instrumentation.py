@@ -0,0 +1,316 @@
+"""Per-run latency and token instrumentation for the SQL Agent.
+
+Each `SQLAgent.run` gets a `RunTrace`: a flat list of spans with their start
+offset, duration, tokens in/out, bytes moved and cache hits. Stages the app
+controls (answer cache, schema context, knowledge retrieval, SQL execution)
+are recorded live; LLM turns and the remaining tool calls are added from the
+run messages when the run ends, using the timers agno keeps on each message.
+
+When export is enabled (`EXPORT_RUN_TRACES=1`, or `trace_runs=True`),
+finished traces are appended to `output/traces/runs.jsonl`, which is rotated
+to `runs.1.jsonl` beyond `TRACE_LOG_MAX_MB` (default: 16), and written as a
+Chrome trace (`<run_id>.trace.json`, open in chrome://tracing or
+https://ui.perfetto.dev) to the size-bounded artifact store.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from agno.utils.log import logger
+
+if TYPE_CHECKING:
+    from artifact_store import ArtifactStore
+
+# Span categories, in the order they are shown in the breakdown
+CATEGORIES = ("cache", "prompt", "knowledge", "llm", "sql", "plot", "file", "reasoning", "tool")
+
+# runs.jsonl is rotated beyond this size; one previous file is kept
+DEFAULT_MAX_LOG_BYTES = 16 * 1024 * 1024
+
+# Tool name -> span category for tool calls read from the run messages
+TOOL_CATEGORIES = {
+    "run_sql_query": "sql",
+    "get_stock_prices": "cache",
+    "resolve_companies": "cache",
+    "snap_to_trading_day": "cache",
+    "search_knowledge_base": "knowledge",
+    "save_file": "file",
+    "read_file": "file",
+    "list_files": "file",
+    "think": "reasoning",
+    "analyze": "reasoning",
+}
+
+# Trace of the run executing in the current context, picked up by the tools
+_current_trace: ContextVar[Optional["RunTrace"]] = ContextVar("sql_agent_run_trace", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    # Offset from the start of the run and duration, in milliseconds
+    start_ms: float
+    duration_ms: float
+    tokens_in: int = 0
+    tokens_out: int = 0
+    bytes: int = 0
+    cache_hit: Optional[bool] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RunTrace:
+    question: str
+    session_id: Optional[str] = None
+    run_id: Optional[str] = None
+    profile: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    spans: List[Span] = field(default_factory=list)
+    duration_ms: Optional[float] = None
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+
+    def offset_ms(self, perf_time: float) -> float:
+        return (perf_time - self._t0) * 1000
+
+    def add_span(self, name: str, category: str, start: float, end: float, **kwargs: Any) -> Span:
+        """Record a span from two `time.perf_counter()` readings."""
+        span = Span(name, category, start_ms=self.offset_ms(start), duration_ms=(end - start) * 1000, **kwargs)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, category: str, **kwargs: Any) -> Iterator[Span]:
+        """Time the body of a `with` block; the yielded span can be updated inside it."""
+        start = time.perf_counter()
+        span = Span(name=name, category=category, start_ms=self.offset_ms(start), duration_ms=0.0, **kwargs)
+        try:
+            yield span
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        self.duration_ms = self.offset_ms(time.perf_counter())
+        self.spans.sort(key=lambda s: s.start_ms)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """Totals per category. Knowledge searches and SQL run inside tool calls,
+        so tool-call spans of those categories are not counted twice."""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            if span.attrs.get("tool_call") and span.category in ("sql", "knowledge"):
+                continue
+            row = totals.setdefault(span.category, _empty_row(span.category))
+            row["ms"] += span.duration_ms
+            row["count"] += 1
+            row["tokens_in"] += span.tokens_in
+            row["tokens_out"] += span.tokens_out
+            row["bytes"] += span.bytes
+            row["cache_hits"] += 1 if span.cache_hit else 0
+        order = {category: i for i, category in enumerate(CATEGORIES)}
+        rows = sorted(totals.values(), key=lambda r: order.get(r["category"], len(order)))
+        total_ms = self.duration_ms or sum(r["ms"] for r in rows)
+        # Agent overhead: building messages, storage writes, streaming
+        accounted = sum(r["ms"] for r in rows)
+        if total_ms > accounted:
+            rows.append(dict(_empty_row("other"), ms=total_ms - accounted))
+        for row in rows:
+            row["share"] = row["ms"] / total_ms if total_ms else 0.0
+        return rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "session_id": self.session_id,
+            "question": self.question,
+            "profile": self.profile,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "breakdown": self.breakdown(),
+            "spans": [asdict(s) for s in self.spans],
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Chrome trace event format: one complete ("X") event per span."""
+        base_us = self.started_at * 1e6
+        events = [
+            {
+                "name": "run",
+                "cat": "run",
+                "ph": "X",
+                "ts": base_us,
+                "dur": (self.duration_ms or 0.0) * 1000,
+                "pid": 1,
+                "tid": 1,
+                "args": {"question": self.question, "profile": self.profile},
+            }
+        ]
+        for span in self.spans:
+            args = {k: v for k, v in asdict(span).items() if k not in ("name", "category", "start_ms", "duration_ms")}
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": base_us + span.start_ms * 1000,
+                    "dur": span.duration_ms * 1000,
+                    "pid": 1,
+                    # Nested stages (SQL/knowledge inside a tool call) on their own row
+                    "tid": 2 if span.attrs.get("tool_call") is None and span.category in ("sql", "knowledge") else 1,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _empty_row(category: str) -> Dict[str, Any]:
+    return {"category": category, "ms": 0.0, "count": 0, "tokens_in": 0, "tokens_out": 0, "bytes": 0, "cache_hits": 0}
+
+
+def get_current_trace() -> Optional[RunTrace]:
+    return _current_trace.get()
+
+
+def set_current_trace(trace: Optional[RunTrace]) -> None:
+    _current_trace.set(trace)
+
+
+@contextmanager
+def trace_span(name: str, category: str, **kwargs: Any) -> Iterator[Optional[Span]]:
+    """Span on the current run trace; a no-op outside an instrumented run."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, category, **kwargs) as span:
+        yield span
+
+
+def _metrics_time(metrics: Any) -> Optional[float]:
+    if isinstance(metrics, dict):
+        return metrics.get("time")
+    return getattr(metrics, "time", None)
+
+
+def _tool_results(message: Any, tool_times: Deque[Optional[float]]) -> List[Tuple[str, float, str, bool]]:
+    """(tool name, duration, content, error) for each result in a tool message."""
+    # Gemini combines the results of one turn into a single tool message
+    if message.tool_name is None and isinstance(message.content, list) and message.tool_calls:
+        results = message.tool_calls
+        share = (message.metrics.time or 0.0) / len(results)
+        return [
+            (
+                result.get("tool_name") or "tool",
+                (tool_times.popleft() if tool_times else None) or share,
+                str(result.get("content") or ""),
+                False,
+            )
+            for result in results
+        ]
+    if tool_times:
+        tool_times.popleft()
+    content = message.get_content_string() or ""
+    return [(message.tool_name or "tool", message.metrics.time or 0.0, content, bool(message.tool_call_error))]
+
+
+def add_message_spans(trace: RunTrace, messages: List[Any], tools: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Add LLM turns and tool calls of the current run from its messages.
+
+    Only messages after the last user message belong to the run. Tool calls run
+    one after another once the assistant turn that requested them has ended.
+    `tools` (the run response's tool calls, in execution order) gives the time
+    of each call when a provider combines several results in one message.
+    """
+    tool_times: Deque[Optional[float]] = deque(_metrics_time(t.get("metrics")) for t in tools or [])
+    last_user = max((i for i, m in enumerate(messages) if m.role == "user"), default=-1)
+    cursor: Optional[float] = None
+    turn = 0
+    for message in messages[last_user + 1 :]:
+        metrics = message.metrics
+        if message.role == "assistant":
+            timer = getattr(metrics, "timer", None)
+            if timer is None or timer.start_time is None or timer.end_time is None:
+                continue
+            turn += 1
+            payload = len(message.get_content_string() or "") + len(json.dumps(message.tool_calls or [], default=str))
+            trace.add_span(
+                f"llm turn {turn}",
+                "llm",
+                timer.start_time,
+                timer.end_time,
+                tokens_in=metrics.input_tokens,
+                tokens_out=metrics.output_tokens,
+                bytes=payload,
+                attrs={
+                    "time_to_first_token_ms": (metrics.time_to_first_token or 0.0) * 1000,
+                    "cached_tokens": metrics.cached_tokens,
+                    "tool_calls": len(message.tool_calls or []),
+                },
+            )
+            cursor = timer.end_time
+        elif message.role == "tool" and cursor is not None:
+            for name, duration, content, error in _tool_results(message, tool_times):
+                category = TOOL_CATEGORIES.get(name, "plot" if "plot" in name else "tool")
+                trace.add_span(
+                    name,
+                    category,
+                    cursor,
+                    cursor + duration,
+                    # Tool output is sent back to the model in the next turn
+                    tokens_out=len(content) // 4,
+                    bytes=len(content.encode()),
+                    attrs={"tool_call": True, "error": error},
+                )
+                cursor += duration
+
+
+class TraceExporter:
+    """Appends finished run traces to a size-capped JSONL file and writes Chrome
+    traces to the artifact store (None: no Chrome traces)."""
+
+    def __init__(
+        self,
+        trace_dir: Path,
+        artifacts: Optional["ArtifactStore"] = None,
+        max_log_bytes: int = DEFAULT_MAX_LOG_BYTES,
+    ):
+        self.trace_dir = trace_dir
+        self.artifacts = artifacts
+        self.max_log_bytes = max_log_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, trace_dir: Path, artifacts: Optional["ArtifactStore"] = None) -> "TraceExporter":
+        return cls(
+            trace_dir,
+            artifacts=artifacts,
+            max_log_bytes=int(float(os.getenv("TRACE_LOG_MAX_MB", DEFAULT_MAX_LOG_BYTES / 2**20)) * 2**20),
+        )
+
+    def _append(self, line: str) -> None:
+        log = self.trace_dir.joinpath("runs.jsonl")
+        with self._lock:
+            if log.exists() and log.stat().st_size + len(line) > self.max_log_bytes:
+                os.replace(log, self.trace_dir.joinpath("runs.1.jsonl"))
+            with log.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+    def export(self, trace: RunTrace) -> None:
+        try:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+            self._append(json.dumps(trace.to_dict(), default=str) + "\n")
+            if self.artifacts is not None:
+                name = f"{trace.run_id or int(trace.started_at * 1000)}.trace.json"
+                data = json.dumps(trace.to_chrome_trace(), default=str).encode()
+                self.artifacts.add(self.artifacts.write(name, data))
+        except OSError as e:
+            logger.warning(f"Could not export run trace: {e}")
@@ -1,6 +1,7 @@
 import pandas as pd
 import os
-from agents import db_url
+from config import db_url
+from data_version import bump_data_version
 from agno.utils.log import logger
 from sqlalchemy import create_engine
 
@@ -34,7 +35,9 @@ def load_data():
         df.to_sql(table_name, engine, if_exists="replace", index=False)
         logger.info(f"{file_path} loaded into {table_name} table.")
     
-    logger.info("Database loaded.")
+    # Invalidate caches keyed by data version
+    version = bump_data_version()
+    logger.info(f"Database loaded (data version {version}).")
 
 if __name__ == "__main__":
     load_data() 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from agents import agent_knowledge
+from agents import get_agent_knowledge
 from agno.utils.log import logger
 import os
 from dotenv import load_dotenv
@@ -39,7 +39,7 @@ def load_knowledge(recreate: bool = True):
     logger.info("Loading SQL agent knowledge.")
     
     # Load base knowledge
-    agent_knowledge.load(recreate=False)
+    get_agent_knowledge().load(recreate=False)
     
     # Load DJIA specific knowledge
     knowledge_dir = os.path.join(os.path.dirname(__file__), 'knowledge')
@@ -0,0 +1,100 @@
+"""Metadata of the loaded market data, cached in memory.
+
+Plot commands kept asking the database for the same facts: the latest date
+(`ORDER BY "Date" DESC LIMIT 1` or `MAX("Date")` over all of `prices`), whether
+a ticker has data for a range, which sectors exist. `MarketMetadata` answers
+them from memory: dates come from a `TradingCalendar`, companies and sectors
+from one query on `companies`. Both are reloaded when the data version changes.
+"""
+
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.utils.log import log_debug, logger
+from data_version import get_data_version
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from trading_calendar import TradingCalendar
+
+
+class MarketMetadata:
+    """Latest date, per-ticker date bounds, tickers and sectors."""
+
+    def __init__(
+        self,
+        calendar: TradingCalendar,
+        db_engine: Optional[Engine] = None,
+        companies_table: str = "companies",
+    ):
+        self.calendar = calendar
+        self.db_engine = db_engine
+        self.companies_table = companies_table
+        # Sector of each company
+        self._sectors: Dict[str, Optional[str]] = {}
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def build(self, companies: List[Tuple[str, Optional[str]]]) -> None:
+        """Index (symbol, sector) rows."""
+        self._sectors = dict(companies)
+        log_debug(f"Market metadata: {len(self._sectors)} companies")
+
+    def refresh(self) -> None:
+        """Reload the companies if the data was reloaded since they were loaded."""
+        version = get_data_version()
+        if version == self._data_version or self.db_engine is None:
+            return
+        with self._lock:
+            if version == self._data_version:
+                return
+            try:
+                with self.db_engine.connect() as conn:
+                    rows = conn.execute(text(f"SELECT symbol, sector FROM {self.companies_table}")).all()
+            except Exception as e:
+                # Keep the previous companies; retried on the next lookup
+                logger.warning(f"Could not load companies: {e}")
+                return
+            self.build([(row[0], row[1]) for row in rows])
+            self._data_version = version
+
+    # ************* Dates *************
+    def latest_date(self, ticker: Optional[str] = None) -> Optional[date]:
+        """Last trading day with data (of `ticker`, or of any ticker)."""
+        bounds = self.calendar.bounds(ticker)
+        return bounds[1] if bounds else None
+
+    def bounds(self, ticker: Optional[str] = None) -> Optional[Tuple[date, date]]:
+        """First and last day with data (of `ticker`, or of any ticker)."""
+        return self.calendar.bounds(ticker)
+
+    def has_data(self, ticker: str, start: Any, end: Any) -> bool:
+        """Whether `ticker` has prices between `start` and `end` (inclusive)."""
+        return bool(self.calendar.between(start, end, ticker))
+
+    # ************* Companies *************
+    def tickers(self) -> List[str]:
+        """Tickers with prices."""
+        return self.calendar.tickers()
+
+    def sectors(self) -> List[str]:
+        self.refresh()
+        return sorted({sector for sector in self._sectors.values() if sector})
+
+    def sector_of(self, ticker: str) -> Optional[str]:
+        self.refresh()
+        return self._sectors.get(ticker)
+
+    def tickers_in(self, sector: str) -> List[str]:
+        self.refresh()
+        return sorted(symbol for symbol, s in self._sectors.items() if s == sector)
+
+    def summary(self) -> Dict[str, Any]:
+        bounds = self.bounds()
+        return {
+            "first_date": str(bounds[0]) if bounds else None,
+            "latest_date": str(bounds[1]) if bounds else None,
+            "tickers": self.tickers(),
+            "sectors": self.sectors(),
+            "data_version": get_data_version(),
+        }
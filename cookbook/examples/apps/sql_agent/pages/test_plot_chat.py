@@ -3,6 +3,7 @@ import requests
 import json
 from datetime import datetime, timedelta
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,18 +18,33 @@ st.set_page_config(
 
 # API endpoint
 API_URL = "http://localhost:8000"
+# Mỗi lần hỏi trạng thái job, server chờ tối đa bấy nhiêu giây cho đến khi job xong (long-poll)
+JOB_POLL_WAIT_S = 10
+# Bỏ cuộc nếu job chưa xong sau bấy nhiêu giây
+JOB_TIMEOUT_S = 300
 
 def call_plot_api(command: str) -> dict:
-    """Gọi API để tạo biểu đồ"""
+    """Gửi job vẽ biểu đồ rồi chờ kết quả: server trả job_id ngay, không giữ request suốt lúc vẽ"""
     try:
-        response = requests.post(
-            f"{API_URL}/plot/command",
-            json={"command": command}
-        )
-        if response.status_code == 200:
-            return response.json()
-        else:
+        response = requests.post(f"{API_URL}/plot/jobs", json={"command": command}, timeout=10)
+        if response.status_code != 202:
             return {"error": f"API error: {response.text}"}
+        job = response.json()
+        deadline = time.monotonic() + JOB_TIMEOUT_S
+        while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+            response = requests.get(
+                f"{API_URL}/plot/jobs/{job['job_id']}",
+                params={"wait": JOB_POLL_WAIT_S},
+                timeout=JOB_POLL_WAIT_S + 10
+            )
+            if response.status_code != 200:
+                return {"error": f"API error: {response.text}"}
+            job = response.json()
+        if job["status"] == "done":
+            return job["result"]
+        if job["status"] == "failed":
+            return {"error": f"API error: {job['error']['detail']}"}
+        return {"error": f"Biểu đồ chưa vẽ xong sau {JOB_TIMEOUT_S} giây"}
     except Exception as e:
         return {"error": str(e)}
 
@@ -1,5 +1,6 @@
 from agents import get_sql_agent
 from agno.playground import Playground, serve_playground_app
+from batch_api import router as batch_router
 
 sql_agent = get_sql_agent(name="SQL Agent", model_id="openai:o4-mini")
 reasoning_sql_agent = get_sql_agent(
@@ -7,6 +8,8 @@ reasoning_sql_agent = get_sql_agent(
 )
 
 app = Playground(agents=[sql_agent, reasoning_sql_agent]).get_app()
+# POST /batch: answer a list of questions in parallel, see batch.py
+app.include_router(batch_router)
 
 if __name__ == "__main__":
     serve_playground_app("playground:app", reload=True)
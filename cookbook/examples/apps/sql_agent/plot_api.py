@@ -1,40 +1,197 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel, Field
 import pandas as pd
-import matplotlib.pyplot as plt
-import psycopg2
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
+import io
+import json
 import os
-from pathlib import Path
-from typing import Optional
+import time
+from typing import Dict, List, Literal, Optional
 import re
 import numpy as np
-from sqlalchemy import create_engine
-import seaborn as sns
+from artifact_store import content_etag, get_artifact_store
+from config import db_url, knowledge_dir
+from starlette.background import BackgroundTask
+from plot_series import DEFAULT_MAX_POINTS, to_series
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Khởi động sẵn worker vẽ biểu đồ, hàng đợi job và janitor dọn ảnh cũ khi server bắt đầu,
+    dừng chúng khi server tắt"""
+    await asyncio.to_thread(get_plot_pool().warm_up)
+    get_artifact_store().start_janitor()
+    get_plot_jobs().start()
+    yield
+    await get_plot_jobs().stop()
+    get_artifact_store().stop_janitor()
+    get_plot_pool().shutdown()
 
 # Khởi tạo FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """SQLAlchemy engine, tạo khi cần lần đầu"""
+    from sqlalchemy import create_engine
+
+    return create_engine(db_url)
+
+@lru_cache(maxsize=1)
+def get_entity_resolver():
+    """Tra mã chứng khoán từ tên công ty trong bộ nhớ, xem entity_resolver.py"""
+    from entity_resolver import EntityResolver
+
+    return EntityResolver(db_engine=get_engine(), symbols_path=knowledge_dir.joinpath("stock_symbols.md"))
+
+@lru_cache(maxsize=1)
+def get_trading_calendar():
+    """Các ngày giao dịch trong bộ nhớ, thay cho truy vấn tìm ngày gần nhất, xem trading_calendar.py"""
+    from trading_calendar import TradingCalendar
+
+    return TradingCalendar(db_engine=get_engine(), table="ai.prices")
+
+@lru_cache(maxsize=1)
+def get_market_metadata():
+    """Ngày mới nhất, khoảng ngày của từng mã, danh sách mã và sector trong bộ nhớ, xem market_metadata.py"""
+    from market_metadata import MarketMetadata
+
+    return MarketMetadata(get_trading_calendar(), db_engine=get_engine(), companies_table="ai.companies")
+
+@lru_cache(maxsize=1)
+def get_plot_pool():
+    """Pool tiến trình vẽ biểu đồ, để không chặn event loop, xem plot_workers.py"""
+    from plot_workers import PlotWorkerPool
+
+    return PlotWorkerPool.from_env()
+
+@lru_cache(maxsize=1)
+def get_plot_jobs():
+    """Hàng đợi job vẽ biểu đồ bất đồng bộ, mặc định một runner cho mỗi worker, xem plot_jobs.py"""
+    from plot_jobs import PlotJobQueue
+
+    return PlotJobQueue.from_env(runners=get_plot_pool().workers)
+
+@lru_cache(maxsize=1)
+def get_plot_cache():
+    """Cache ảnh đã vẽ theo nội dung yêu cầu và phiên bản dữ liệu, xem plot_cache.py"""
+    from plot_cache import PlotRenderCache
+
+    return PlotRenderCache(get_artifact_store())
+
+# Các biểu thức dưới đây dùng cửa sổ w do truy vấn khai báo: WINDOW w AS (ORDER BY "Date") cho một mã,
+# WINDOW w AS (PARTITION BY "Ticker" ORDER BY "Date") cho nhiều mã cùng lúc
+# Daily return (%) so với ngày giao dịch trước, như pct_change() * 100 (ngày đầu để trống)
+DAILY_RETURN_SQL = '("Close" / NULLIF(LAG("Close") OVER w, 0) - 1) * 100'
+# Cumulative return (%) = giá đóng cửa / giá ngày đầu - 1 (như tích (1 + daily return), ngày đầu để trống)
+CUMULATIVE_RETURN_SQL = """CASE WHEN ROW_NUMBER() OVER w > 1
+                            THEN ("Close" / NULLIF(FIRST_VALUE("Close") OVER w, 0) - 1) * 100
+                       END"""
+# Tên tháng đầy đủ ("January"), như strftime('%B')
+MONTH_NAME_SQL = """to_char("Date", 'FMMonth')"""
+
+def rolling_avg_sql(window: int) -> str:
+    """Trung bình giá đóng cửa của window ngày gần nhất; chưa đủ số ngày của cửa sổ thì để trống"""
+    return f"""CASE WHEN ROW_NUMBER() OVER w >= {window}
+                            THEN AVG("Close") OVER (w ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)
+                       END"""
 
-# Cấu hình
-db_url = "postgresql+psycopg://ai:ai@localhost:5532/ai"
-engine = create_engine(db_url)
-output_dir = Path(__file__).parent.joinpath("output")
-output_dir.mkdir(parents=True, exist_ok=True)
+# Ảnh của cache không bao giờ đổi nội dung: tên file gồm hash của yêu cầu và phiên bản dữ liệu
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# File khác (vd. do agent ghi) có thể bị ghi đè: trình duyệt phải hỏi lại, server trả 304 nếu không đổi
+REVALIDATE_CACHE_CONTROL = "no-cache"
 
-class PlotRequest(BaseModel):
+# Định dạng ảnh và content type của chúng; format="json" trả dữ liệu thay vì ảnh
+IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+# Tham số encoder cho savefig: WebP lossless nét như PNG nhưng nhỏ hơn một nửa, method 2 nhanh như PNG
+ENCODER_OPTIONS = {"png": {}, "webp": {"pil_kwargs": {"lossless": True, "method": 2}}, "svg": {}}
+# Kích thước (pixel) và DPI mặc định, như figsize=(12, 8) trước đây
+DEFAULT_RENDER = {"width": 1200, "height": 800, "dpi": 100, "format": "png"}
+# Ảnh nhỏ cho danh sách, lịch sử chat trên giao diện Streamlit
+PRESETS = {"thumbnail": {"width": 480, "height": 320, "dpi": 60}}
+
+# Biểu đồ vẽ từ giá hằng ngày của một mã, theo (plot_type, data_type), và các cột của chúng:
+# /plot/batch lấy chung dữ liệu của các biểu đồ này bằng một truy vấn cho mỗi khoảng thời gian
+PRICE_SERIES_COLUMNS = {
+    ("boxplot", "daily_returns_boxplot"): ["Date", "Daily_Return", "Month"],
+    ("histogram", "high_low_range"): ["Date", "High", "Low", "High_Low_Range", "Range_Percent"],
+    ("time_series", "cumulative_return"): ["Date", "Cumulative_Return"],
+    ("time_series", "rolling_avg"): ["Date", "Close", "Rolling_Avg"],
+    ("volume", "daily_volume"): ["Date", "Volume"],
+    ("time_series", None): ["Date", "Close", "Daily_Return", "Month"],
+    (None, None): ["Date", "Close", "Daily_Return", "Month"],
+}
+# Biểu thức SQL của từng cột (Rolling_Avg theo cửa sổ của từng biểu đồ, xem rolling_avg_sql)
+PRICE_COLUMN_SQL = {
+    "Close": '"Close"',
+    "High": '"High"',
+    "Low": '"Low"',
+    "Volume": '"Volume"',
+    "High_Low_Range": '"High" - "Low"',
+    "Range_Percent": '("High" - "Low") / NULLIF("Low", 0) * 100',
+    "Daily_Return": DAILY_RETURN_SQL,
+    "Month": MONTH_NAME_SQL,
+    "Cumulative_Return": CUMULATIVE_RETURN_SQL,
+}
+
+class PlotOutput(BaseModel):
+    """Tùy chọn đầu ra chung của /plot và /plot/command"""
+    # "png", "webp", "svg": ảnh vẽ trên server; "json": dữ liệu của biểu đồ để client tự vẽ, xem plot_series.py
+    format: Literal["png", "webp", "svg", "json"] = "png"
+    # Số điểm tối đa của mỗi series khi format="json" (giảm mẫu bằng LTTB)
+    max_points: int = Field(DEFAULT_MAX_POINTS, ge=3, le=100_000)
+    # Trả ảnh ngay trong response (vẽ trong bộ nhớ) thay vì URL cần thêm một request
+    inline: bool = False
+    # Kích thước ảnh (pixel) và độ phân giải; preset thay cho cả ba
+    width: int = Field(DEFAULT_RENDER["width"], ge=100, le=4000)
+    height: int = Field(DEFAULT_RENDER["height"], ge=100, le=4000)
+    dpi: int = Field(DEFAULT_RENDER["dpi"], ge=30, le=300)
+    preset: Optional[Literal["thumbnail"]] = None
+
+    def render_options(self) -> dict:
+        """Tùy chọn vẽ khác mặc định, thêm vào params (nên cũng vào key của cache ảnh)"""
+        options = {"width": self.width, "height": self.height, "dpi": self.dpi, "format": self.format}
+        options.update(PRESETS.get(self.preset, {}))
+        return {key: value for key, value in options.items() if value != DEFAULT_RENDER[key]}
+
+class PlotRequest(PlotOutput):
     ticker: str
     start_date: str
     end_date: str
 
-class PlotCommand(BaseModel):
+class PlotCommand(PlotOutput):
     command: str
 
+# Số biểu đồ tối đa của một request /plot/batch
+MAX_BATCH_PLOTS = 24
+
+class PlotSpec(PlotOutput):
+    """Một biểu đồ của /plot/batch: câu lệnh như /plot/command, hoặc mã và khoảng thời gian như /plot"""
+    command: Optional[str] = None
+    ticker: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+class PlotBatch(BaseModel):
+    plots: List[PlotSpec] = Field(min_length=1, max_length=MAX_BATCH_PLOTS)
+
 def parse_plot_command(command: str) -> dict:
     """Phân tích câu lệnh plot để lấy thông tin"""
     # Tìm mã chứng khoán hoặc nhóm chứng khoán
     ticker_pattern = r'\(([A-Z]+)\)'
     ticker_match = re.search(ticker_pattern, command)
+    # Mã của các tên công ty trong câu lệnh, chỉ tìm khi cần (tra bảng companies lần đầu)
+    symbols = None
+    if ticker_match:
+        ticker = ticker_match.group(1)
+    else:
+        # Không có mã trong ngoặc: tìm tên công ty (vd. "Boeing"); nếu không có, mặc định là DJIA
+        symbols = get_entity_resolver().find_symbols(command)
+        ticker = symbols[0] if len(symbols) == 1 else "DJIA"
     
     # Xác định loại biểu đồ
     plot_type = "time_series"  # mặc định
@@ -103,6 +260,18 @@ def parse_plot_command(command: str) -> dict:
             tickers = [t.strip() for t in for_match.group(1).split(',')]
             # Loại bỏ các từ khóa không phải mã chứng khoán
             tickers = [t for t in tickers if t not in ['PLOT', 'HEATMAP', 'CORRELATION', 'MATRIX']]
+            # Bỏ các từ viết hoa không phải mã đã biết (vd. "A" trong "Apple")
+            resolver = get_entity_resolver()
+            # Chưa chạy find_symbols nếu lệnh có "(TICKER)"; nạp lại sau khi dữ liệu thay đổi
+            resolver.refresh()
+            known = resolver.companies
+            tickers = [t for t in tickers if not known or t in known]
+        if not tickers:
+            # Tên công ty thay vì mã, vd. "for Apple, Microsoft and Boeing"
+            if symbols is None:
+                symbols = get_entity_resolver().find_symbols(command)
+            if len(symbols) > 1:
+                tickers = symbols
     
     # Tìm tháng và năm
     month_year_pattern = r'for\s+(\w+)\s+(\d{4})'
@@ -122,8 +291,6 @@ def parse_plot_command(command: str) -> dict:
                 end_date = f"{year}-{month_num+1:02d}-01"
                 end_date = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
             
-            # Nếu không có mã cụ thể, mặc định là DJIA
-            ticker = ticker_match.group(1) if ticker_match else "DJIA"
             return {
                 "ticker": ticker,
                 "start_date": start_date,
@@ -141,8 +308,6 @@ def parse_plot_command(command: str) -> dict:
     date_match = re.search(date_pattern, command)
     if date_match:
         date = datetime.strptime(date_match.group(1), "%B %d, %Y").strftime("%Y-%m-%d")
-        # Nếu không có mã cụ thể, mặc định là DJIA
-        ticker = ticker_match.group(1) if ticker_match else "DJIA"
         return {
             "ticker": ticker,
             "date": date,
@@ -171,8 +336,6 @@ def parse_plot_command(command: str) -> dict:
                 year = year_match.group(1)
                 start_date = f"{year}-01-01"
                 end_date = f"{year}-12-31"
-                # Nếu không có mã cụ thể, mặc định là DJIA
-                ticker = ticker_match.group(1) if ticker_match else "DJIA"
                 return {
                     "ticker": ticker,
                     "start_date": start_date,
@@ -185,17 +348,9 @@ def parse_plot_command(command: str) -> dict:
         
         # Nếu không tìm thấy ngày cụ thể, lấy ngày gần nhất có dữ liệu
         try:
-            query = """
-                SELECT "Date" 
-                FROM ai.prices 
-                ORDER BY "Date" DESC 
-                LIMIT 1
-            """
-            latest_date = pd.read_sql(query, engine)
-            if not latest_date.empty:
-                date = latest_date['Date'].iloc[0].strftime('%Y-%m-%d')
-                # Nếu không có mã cụ thể, mặc định là DJIA
-                ticker = ticker_match.group(1) if ticker_match else "DJIA"
+            latest_date = get_market_metadata().latest_date()
+            if latest_date is not None:
+                date = latest_date.strftime('%Y-%m-%d')
                 return {
                     "ticker": ticker,
                     "date": date,
@@ -212,8 +367,6 @@ def parse_plot_command(command: str) -> dict:
         # Chuyển đổi định dạng ngày
         start_date = datetime.strptime(date_match.group(1), "%B %d, %Y").strftime("%Y-%m-%d")
         end_date = datetime.strptime(date_match.group(2), "%B %d, %Y").strftime("%Y-%m-%d")
-        # Nếu không có mã cụ thể, mặc định là DJIA
-        ticker = ticker_match.group(1) if ticker_match else "DJIA"
 
     return {
         "ticker": ticker,
@@ -225,11 +378,30 @@ def parse_plot_command(command: str) -> dict:
         "rolling_window": rolling_window
     }
 
+def check_ticker_range(ticker: str, start_date: str = None, end_date: str = None) -> None:
+    """Báo 404 nếu mã có trong database nhưng không có dữ liệu từ start_date đến end_date"""
+    bounds = get_market_metadata().bounds(ticker) if ticker and start_date and end_date else None
+    if bounds is None:
+        # Mã không có giá (ví dụ "DJIA") hoặc không có khoảng thời gian: để truy vấn xử lý
+        return
+    try:
+        outside = pd.Timestamp(end_date).date() < bounds[0] or pd.Timestamp(start_date).date() > bounds[1]
+    except ValueError:
+        return
+    if outside:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Không tìm thấy dữ liệu cho {ticker} từ {start_date} đến {end_date}. "
+                   f"Dữ liệu có từ {bounds[0]} đến {bounds[1]}"
+        )
+
 def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, date: str = None, 
                   plot_type: str = None, data_type: str = None, tickers: list = None,
                   rolling_window: int = None) -> pd.DataFrame:
     """Lấy dữ liệu chứng khoán từ database"""
     try:
+        # Mã không có dữ liệu trong khoảng thời gian yêu cầu: trả 404 ngay, không truy vấn database
+        check_ticker_range(ticker, start_date, end_date)
         # Nếu là bar chart dividends per share
         if plot_type == "bar" and data_type == "dividends_per_share":
             # Lấy dữ liệu cổ tức cho tất cả công ty trong DJIA
@@ -243,7 +415,7 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 GROUP BY p."Ticker", c.sector
                 ORDER BY total_dividends DESC
             """
-            df = pd.read_sql(query, engine, params=(start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -255,14 +427,16 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
             
         # Nếu là boxplot daily returns
         if plot_type == "boxplot" and data_type == "daily_returns_boxplot":
-            query = """
-                SELECT "Date", "Close"
+            # Daily returns (%) và tên tháng để phân nhóm được tính trong SQL
+            query = f"""
+                SELECT "Date", {DAILY_RETURN_SQL} AS "Daily_Return", {MONTH_NAME_SQL} AS "Month"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
+                WINDOW w AS (ORDER BY "Date")
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -270,24 +444,21 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                     detail=f"Không tìm thấy dữ liệu cho {ticker} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
             
-            # Tính daily returns
-            df['Daily_Return'] = df['Close'].pct_change() * 100  # Chuyển sang phần trăm
-            
-            # Thêm cột tháng để phân nhóm
-            df['Month'] = pd.to_datetime(df['Date']).dt.strftime('%B')
-            
             return df
             
         # Nếu là histogram high-low range
         if plot_type == "histogram" and data_type == "high_low_range":
+            # High-low range và phần trăm range so với giá thấp nhất được tính trong SQL
             query = """
-                SELECT "Date", "High", "Low"
+                SELECT "Date", "High", "Low",
+                       "High" - "Low" AS "High_Low_Range",
+                       ("High" - "Low") / NULLIF("Low", 0) * 100 AS "Range_Percent"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -295,24 +466,20 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                     detail=f"Không tìm thấy dữ liệu cho {ticker} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
             
-            # Tính high-low range
-            df['High_Low_Range'] = df['High'] - df['Low']
-            
-            # Tính phần trăm range so với giá thấp nhất
-            df['Range_Percent'] = (df['High_Low_Range'] / df['Low']) * 100
-            
             return df
             
         # Nếu là biểu đồ cumulative return
         if plot_type == "time_series" and data_type == "cumulative_return":
-            query = """
-                SELECT "Date", "Close"
+            # Cumulative return (%) tính trong SQL
+            query = f"""
+                SELECT "Date", {CUMULATIVE_RETURN_SQL} AS "Cumulative_Return"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
+                WINDOW w AS (ORDER BY "Date")
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -320,15 +487,6 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                     detail=f"Không tìm thấy dữ liệu cho {ticker} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
             
-            # Tính daily returns
-            df['Daily_Return'] = df['Close'].pct_change()
-            
-            # Tính cumulative returns
-            df['Cumulative_Return'] = (1 + df['Daily_Return']).cumprod() - 1
-            
-            # Chuyển đổi sang phần trăm
-            df['Cumulative_Return'] = df['Cumulative_Return'] * 100
-            
             return df
             
         # Nếu là scatter plot volume vs price
@@ -345,7 +503,7 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 GROUP BY p."Ticker", c.sector
                 ORDER BY avg_volume DESC
             """
-            df = pd.read_sql(query, engine, params=(start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -358,15 +516,9 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
         # Nếu là histogram market cap theo sector
         if plot_type == "histogram" and data_type == "sector_market_cap":
             # Lấy ngày gần nhất có dữ liệu
-            query = """
-                SELECT "Date" 
-                FROM ai.prices 
-                ORDER BY "Date" DESC 
-                LIMIT 1
-            """
-            latest_date = pd.read_sql(query, engine)
-            if not latest_date.empty:
-                date = latest_date['Date'].iloc[0].strftime('%Y-%m-%d')
+            latest_date = get_market_metadata().latest_date()
+            if latest_date is not None:
+                date = latest_date.strftime('%Y-%m-%d')
             
             # Lấy dữ liệu market cap cho các công ty trong sector
             query = """
@@ -376,7 +528,7 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 WHERE p."Date" = %s
                 AND c.sector = %s
             """
-            df = pd.read_sql(query, engine, params=(date, "Technology"))
+            df = pd.read_sql(query, get_engine(), params=(date, "Technology"))
             
             if df.empty:
                 raise HTTPException(
@@ -390,14 +542,17 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
             
         # Nếu là biểu đồ rolling average
         if plot_type == "time_series" and data_type == "rolling_avg":
-            query = """
-                SELECT "Date", "Close"
+            # Rolling average tính bằng window function; chưa đủ số ngày của cửa sổ thì để trống
+            window = int(rolling_window or 30)
+            query = f"""
+                SELECT "Date", "Close", {rolling_avg_sql(window)} AS "Rolling_Avg"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
+                WINDOW w AS (ORDER BY "Date")
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -405,29 +560,27 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                     detail=f"Không tìm thấy dữ liệu cho {ticker} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
             
-            # Tính rolling average
-            df['Rolling_Avg'] = df['Close'].rolling(window=rolling_window).mean()
             return df
             
         # Nếu là bar chart trung bình giá đóng cửa theo tháng
         if plot_type == "bar" and data_type == "monthly_avg_close":
+            # Trung bình giá đóng cửa theo tháng trong năm (gộp các năm), tính trong SQL: chỉ 12 dòng
             query = """
-                SELECT "Date", "Close"
+                SELECT EXTRACT(MONTH FROM "Date")::int AS month, AVG("Close") AS "AvgClose"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
-                ORDER BY "Date"
+                GROUP BY 1
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             if df.empty:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"Không tìm thấy dữ liệu giá đóng cửa cho {ticker} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
-            df['Month'] = pd.to_datetime(df['Date']).dt.strftime('%b')
-            monthly_avg = df.groupby('Month')['Close'].mean().reindex([
-                'Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
-            return monthly_avg.reset_index(name='AvgClose')
+            monthly_avg = df.set_index('month')['AvgClose'].reindex(range(1, 13))
+            months = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
+            return pd.DataFrame({'Month': months, 'AvgClose': monthly_avg.values})
         
         # Nếu là biểu đồ khối lượng giao dịch
         if plot_type == "volume" and data_type == "daily_volume":
@@ -438,7 +591,7 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 AND "Date" BETWEEN %s AND %s
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
             if df.empty:
                 raise HTTPException(
@@ -450,68 +603,44 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
             
         # Nếu là biểu đồ heatmap
         if plot_type == "heatmap" and data_type == "correlation_matrix" and tickers:
-            # Kiểm tra xem có dữ liệu cho các mã được chỉ định không
-            check_query = """
-                SELECT DISTINCT "Ticker"
-                FROM ai.prices
-                WHERE "Ticker" = ANY(%s)
-                AND "Date" BETWEEN %s AND %s
-            """
-            available_tickers = pd.read_sql(check_query, engine, params=(tickers, start_date, end_date))
-            
-            if available_tickers.empty:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"Không tìm thấy dữ liệu cho các mã: {', '.join(tickers)} trong khoảng thời gian từ {start_date} đến {end_date}"
-                )
-            
-            # Lấy dữ liệu cho các mã có sẵn
+            # Ma trận tương quan daily returns tính hoàn toàn trong SQL: daily returns bằng LAG
+            # (ngày đầu tính là 0), rồi corr() cho từng cặp mã; chỉ k x k giá trị được trả về
             query = """
-                SELECT "Ticker", "Date", "Close"
-                FROM ai.prices
-                WHERE "Ticker" = ANY(%s)
-                AND "Date" BETWEEN %s AND %s
-                ORDER BY "Date", "Ticker"
+                WITH returns AS (
+                    SELECT "Ticker", "Date",
+                           COALESCE(("Close" / NULLIF(LAG("Close") OVER w, 0) - 1) * 100, 0) AS daily_return
+                    FROM ai.prices
+                    WHERE "Ticker" = ANY(%s)
+                    AND "Date" BETWEEN %s AND %s
+                    WINDOW w AS (PARTITION BY "Ticker" ORDER BY "Date")
+                )
+                SELECT a."Ticker" AS ticker_a, b."Ticker" AS ticker_b, corr(a.daily_return, b.daily_return) AS corr
+                FROM returns a
+                JOIN returns b ON a."Date" = b."Date"
+                GROUP BY a."Ticker", b."Ticker"
             """
-            df = pd.read_sql(query, engine, params=(available_tickers['Ticker'].tolist(), start_date, end_date))
+            pairs = pd.read_sql(query, get_engine(), params=(tickers, start_date, end_date))
             
-            if df.empty:
+            if pairs.empty:
                 raise HTTPException(
                     status_code=404, 
-                    detail=f"Không tìm thấy dữ liệu giá cho các mã: {', '.join(tickers)}"
-                )
-            
-            # Tính toán daily returns
-            df = df.pivot(index='Date', columns='Ticker', values='Close')
-            # Tính daily returns và điền giá trị 0 cho ngày đầu tiên
-            returns = df.pct_change() * 100
-            returns = returns.fillna(0)  # Điền 0 cho ngày đầu tiên
-            
-            # Kiểm tra xem có đủ dữ liệu không
-            if returns.isnull().sum().sum() > 0:
-                missing_data = returns.isnull().sum()
-                missing_tickers = missing_data[missing_data > 0].index.tolist()
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Thiếu dữ liệu daily returns cho các mã: {', '.join(missing_tickers)}"
+                    detail=f"Không tìm thấy dữ liệu cho các mã: {', '.join(tickers)} trong khoảng thời gian từ {start_date} đến {end_date}"
                 )
             
-            return returns
+            # Giữ thứ tự mã như trong câu lệnh
+            order = [t for t in tickers if t in set(pairs['ticker_a'])]
+            corr_matrix = pairs.pivot(index='ticker_a', columns='ticker_b', values='corr')
+            corr_matrix = corr_matrix.reindex(index=order, columns=order)
+            corr_matrix.index.name = corr_matrix.columns.name = 'Ticker'
+            return corr_matrix
             
         # Nếu là biểu đồ top market cap hoặc scatter plot
         elif plot_type in ["bar", "scatter"] and data_type in ["top_market_cap", "market_cap_pe"]:
             # Kiểm tra và lấy ngày gần nhất có dữ liệu
             if date:
-                check_query = """
-                    SELECT "Date" 
-                    FROM ai.prices 
-                    WHERE "Date" <= %s
-                    ORDER BY "Date" DESC 
-                    LIMIT 1
-                """
-                available_date = pd.read_sql(check_query, engine, params=(date,))
-                if not available_date.empty:
-                    date = available_date['Date'].iloc[0].strftime('%Y-%m-%d')
+                available_date = get_trading_calendar().previous(date)
+                if available_date is not None:
+                    date = available_date.strftime('%Y-%m-%d')
             
             # Lấy dữ liệu cho tất cả công ty trong DJIA
             query = """
@@ -519,19 +648,13 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 FROM ai.prices
                 WHERE "Date" = %s
             """
-            df = pd.read_sql(query, engine, params=(date,))
+            df = pd.read_sql(query, get_engine(), params=(date,))
             
             if df.empty:
                 # Kiểm tra xem có dữ liệu cho ngày nào không
-                check_query = """
-                    SELECT DISTINCT "Date" 
-                    FROM ai.prices 
-                    ORDER BY "Date" DESC 
-                    LIMIT 5
-                """
-                available_dates = pd.read_sql(check_query, engine)
-                if not available_dates.empty:
-                    dates_str = ", ".join(available_dates['Date'].dt.strftime('%Y-%m-%d').tolist())
+                available_dates = get_trading_calendar().latest(5)
+                if available_dates:
+                    dates_str = ", ".join(d.strftime('%Y-%m-%d') for d in available_dates)
                     raise HTTPException(
                         status_code=404, 
                         detail=f"Không tìm thấy dữ liệu cho ngày {date}. Các ngày có sẵn: {dates_str}"
@@ -550,16 +673,9 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
         elif plot_type == "pie" and data_type == "sector_distribution":
             # Kiểm tra và lấy ngày gần nhất có dữ liệu
             if date:
-                check_query = """
-                    SELECT "Date" 
-                    FROM ai.prices 
-                    WHERE "Date" <= %s
-                    ORDER BY "Date" DESC 
-                    LIMIT 1
-                """
-                available_date = pd.read_sql(check_query, engine, params=(date,))
-                if not available_date.empty:
-                    date = available_date['Date'].iloc[0].strftime('%Y-%m-%d')
+                available_date = get_trading_calendar().previous(date)
+                if available_date is not None:
+                    date = available_date.strftime('%Y-%m-%d')
             
             # Lấy dữ liệu cho tất cả công ty trong DJIA
             query = """
@@ -568,19 +684,13 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
                 JOIN ai.companies c ON p."Ticker" = c.symbol
                 WHERE p."Date" = %s
             """
-            df = pd.read_sql(query, engine, params=(date,))
+            df = pd.read_sql(query, get_engine(), params=(date,))
             
             if df.empty:
                 # Kiểm tra xem có dữ liệu cho ngày nào không
-                check_query = """
-                    SELECT DISTINCT "Date" 
-                    FROM ai.prices 
-                    ORDER BY "Date" DESC 
-                    LIMIT 5
-                """
-                available_dates = pd.read_sql(check_query, engine)
-                if not available_dates.empty:
-                    dates_str = ", ".join(available_dates['Date'].dt.strftime('%Y-%m-%d').tolist())
+                available_dates = get_trading_calendar().latest(5)
+                if available_dates:
+                    dates_str = ", ".join(d.strftime('%Y-%m-%d') for d in available_dates)
                     raise HTTPException(
                         status_code=404, 
                         detail=f"Không tìm thấy dữ liệu cho ngày {date}. Các ngày có sẵn: {dates_str}"
@@ -594,51 +704,41 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
         elif plot_type == "pie" and data_type == "sector_market_cap_pie":
             # Lấy ngày gần nhất có dữ liệu nếu ngày truyền vào không có
             if date:
-                check_query = """
-                    SELECT "Date"
-                    FROM ai.prices
-                    WHERE "Date" <= %s
-                    ORDER BY "Date" DESC
-                    LIMIT 1
-                """
-                available_date = pd.read_sql(check_query, engine, params=(date,))
-                if not available_date.empty:
-                    date = available_date['Date'].iloc[0].strftime('%Y-%m-%d')
+                available_date = get_trading_calendar().previous(date)
+                if available_date is not None:
+                    date = available_date.strftime('%Y-%m-%d')
             else:
                 # Nếu không truyền ngày, lấy ngày mới nhất
-                query = "SELECT MAX(\"Date\") as max_date FROM ai.prices"
-                date_df = pd.read_sql(query, engine)
-                date = date_df['max_date'].iloc[0].strftime('%Y-%m-%d')
+                latest_date = get_market_metadata().latest_date()
+                if latest_date is None:
+                    raise HTTPException(status_code=404, detail="Không tìm thấy dữ liệu nào trong database")
+                date = latest_date.strftime('%Y-%m-%d')
             # Lấy market cap từng công ty tại ngày đó
+            # Tổng market cap (Close * Volume) theo sector, tính trong SQL
             query = """
-                SELECT p."Ticker", c.sector, p."Close", p."Volume"
+                SELECT c.sector, SUM(p."Close" * p."Volume") AS "Market_Cap"
                 FROM ai.prices p
                 JOIN ai.companies c ON p."Ticker" = c.symbol
                 WHERE p."Date" = %s
+                GROUP BY c.sector
+                ORDER BY c.sector
             """
-            df = pd.read_sql(query, engine, params=(date,))
-            if df.empty:
+            sector_df = pd.read_sql(query, get_engine(), params=(date,))
+            if sector_df.empty:
                 raise HTTPException(status_code=404, detail=f"Không tìm thấy dữ liệu market cap cho ngày {date}")
-            # Tính market cap từng công ty
-            df['Market_Cap'] = df['Close'] * df['Volume']
-            # Tổng market cap theo sector
-            sector_df = df.groupby('sector')['Market_Cap'].sum().reset_index()
             sector_df['Date'] = date
             return sector_df
         else:
             # Lấy dữ liệu cho một mã cụ thể
-            query = """
-                SELECT "Date", "Close"
+            query = f"""
+                SELECT "Date", "Close", {DAILY_RETURN_SQL} AS "Daily_Return", {MONTH_NAME_SQL} AS "Month"
                 FROM ai.prices
                 WHERE "Ticker" = %s
                 AND "Date" BETWEEN %s AND %s
+                WINDOW w AS (ORDER BY "Date")
                 ORDER BY "Date"
             """
-            df = pd.read_sql(query, engine, params=(ticker, start_date, end_date))
-            
-            if not df.empty:
-                df['Daily_Return'] = df['Close'].pct_change() * 100
-                df['Month'] = pd.to_datetime(df['Date']).dt.strftime('%B')
+            df = pd.read_sql(query, get_engine(), params=(ticker, start_date, end_date))
             
         return df
     except Exception as e:
@@ -648,12 +748,20 @@ def get_stock_data(ticker: str, start_date: str = None, end_date: str = None, da
 
 def create_plot(df: pd.DataFrame, ticker: str, start_date: str = None, end_date: str = None, 
                 plot_type: str = "time_series", data_type: str = None, tickers: list = None,
-                rolling_window: int = None) -> str:
-    """Tạo biểu đồ và trả về đường dẫn file"""
+                rolling_window: int = None, filename: str = None, in_memory: bool = False,
+                width: int = DEFAULT_RENDER["width"], height: int = DEFAULT_RENDER["height"],
+                dpi: int = DEFAULT_RENDER["dpi"], image_format: str = DEFAULT_RENDER["format"]):
+    """Tạo biểu đồ và trả về đường dẫn file (hoặc nội dung ảnh nếu in_memory, không ghi ra đĩa)"""
+    # matplotlib chỉ được import khi vẽ biểu đồ lần đầu
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     if df.empty:
         raise HTTPException(status_code=404, detail=f"No data found for {ticker}")
 
-    fig, ax = plt.subplots(figsize=(12, 8))
+    fig, ax = plt.subplots(figsize=(width / dpi, height / dpi), dpi=dpi)
     
     if plot_type == "bar" and data_type == "dividends_per_share":
         # Tạo màu sắc theo sector
@@ -859,10 +967,12 @@ def create_plot(df: pd.DataFrame, ticker: str, start_date: str = None, end_date:
         plt.xticks(rotation=45)
         plt.tight_layout()
     elif plot_type == "heatmap" and data_type == "correlation_matrix":
-        # Tính toán ma trận tương quan
-        corr_matrix = df.corr()
+        # get_stock_data đã tính ma trận tương quan trong SQL
+        corr_matrix = df
         
         # Vẽ heatmap
+        import seaborn as sns
+
         sns.heatmap(corr_matrix, 
                    annot=True,  # Hiển thị giá trị
                    cmap='coolwarm',  # Màu sắc
@@ -1023,37 +1133,202 @@ def create_plot(df: pd.DataFrame, ticker: str, start_date: str = None, end_date:
         ax.grid(True)
         ax.legend()
     
-    # Lưu biểu đồ
-    output_file = output_dir / f"{ticker}_{plot_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    plt.savefig(output_file)
+    save_options = {"format": image_format, "dpi": dpi, **ENCODER_OPTIONS[image_format]}
+    if in_memory:
+        buffer = io.BytesIO()
+        plt.savefig(buffer, **save_options)
+        plt.close()
+        return buffer.getvalue()
+
+    # Lưu biểu đồ vào artifact store (filename do cache đặt theo nội dung yêu cầu, nếu có)
+    output_file = get_artifact_store().path_for(
+        filename or f"{ticker}_{plot_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{image_format}"
+    )
+    # Ghi ra file tạm rồi đổi tên, để không request nào đọc phải ảnh đang ghi dở
+    tmp_file = output_file.with_name(f".{output_file.stem}.{os.getpid()}{output_file.suffix}")
+    plt.savefig(tmp_file, **save_options)
     plt.close()
+    os.replace(tmp_file, output_file)
     
     return str(output_file)
 
+def fetch_plot_data(params: dict) -> pd.DataFrame:
+    """Lấy dữ liệu của biểu đồ theo params"""
+    return get_stock_data(
+        ticker=params["ticker"],
+        start_date=params.get("start_date"),
+        end_date=params.get("end_date"),
+        date=params.get("date"),
+        plot_type=params.get("plot_type"),
+        data_type=params.get("data_type"),
+        tickers=params.get("tickers"),
+        rolling_window=params.get("rolling_window")
+    )
+
+def render_plot(params: dict, filename: str = None, in_memory: bool = False, df: pd.DataFrame = None):
+    """Lấy dữ liệu (nếu chưa có df) và vẽ biểu đồ theo params, trả về đường dẫn file
+    (hoặc nội dung ảnh nếu in_memory) (chạy trong worker)"""
+    if df is None:
+        df = fetch_plot_data(params)
+    return create_plot(
+        df=df,
+        ticker=params["ticker"],
+        start_date=params.get("start_date"),
+        end_date=params.get("end_date"),
+        plot_type=params.get("plot_type", "time_series"),
+        data_type=params.get("data_type"),
+        tickers=params.get("tickers"),
+        rolling_window=params.get("rolling_window"),
+        filename=filename,
+        in_memory=in_memory,
+        width=params.get("width", DEFAULT_RENDER["width"]),
+        height=params.get("height", DEFAULT_RENDER["height"]),
+        dpi=params.get("dpi", DEFAULT_RENDER["dpi"]),
+        image_format=params.get("format", DEFAULT_RENDER["format"])
+    )
+
+def plot_series(params: dict, max_points: int = DEFAULT_MAX_POINTS, df: pd.DataFrame = None) -> dict:
+    """Lấy dữ liệu theo params (nếu chưa có df) và trả các series của biểu đồ thay vì vẽ ảnh (chạy trong worker)"""
+    if df is None:
+        df = fetch_plot_data(params)
+    if df.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for {params['ticker']}")
+    return to_series(df, params.get("plot_type"), max_points)
+
+def price_series_key(params: dict) -> Optional[tuple]:
+    """(ticker, start_date, end_date) của biểu đồ nếu dữ liệu của nó lấy chung được với
+    các biểu đồ khác trong /plot/batch (giá hằng ngày của một mã), nếu không thì None"""
+    kind = (params.get("plot_type"), params.get("data_type"))
+    if kind not in PRICE_SERIES_COLUMNS or not params.get("start_date") or not params.get("end_date"):
+        return None
+    return params["ticker"], params["start_date"], params["end_date"]
+
+def price_series_columns(params: dict) -> Dict[str, str]:
+    """Cột trong kết quả của fetch_price_series -> cột của biểu đồ"""
+    columns = {c: c for c in PRICE_SERIES_COLUMNS[(params.get("plot_type"), params.get("data_type"))]}
+    if "Rolling_Avg" in columns:
+        del columns["Rolling_Avg"]
+        columns[f"Rolling_Avg_{int(params.get('rolling_window') or 30)}"] = "Rolling_Avg"
+    return columns
+
+def fetch_price_series(ranges: list, columns: list) -> pd.DataFrame:
+    """Các cột giá hằng ngày của nhiều (ticker, start_date, end_date) trong một truy vấn trên ai.prices.
+    Window function tính riêng cho từng khoảng (cột "Range" = vị trí trong ranges), nên kết quả của
+    mỗi khoảng giống như khi lấy riêng, kể cả khi các khoảng chồng lên nhau (chạy trong worker)"""
+    select = []
+    for column in columns:
+        if column.startswith("Rolling_Avg_"):
+            expression = rolling_avg_sql(int(column.rsplit("_", 1)[1]))
+        else:
+            expression = PRICE_COLUMN_SQL[column]
+        select.append(f'{expression} AS "{column}"')
+    values = ", ".join(["(%s, %s, CAST(%s AS date), CAST(%s AS date))"] * len(ranges))
+    query = f"""
+        SELECT r.range_id AS "Range", "Ticker", "Date", {", ".join(select)}
+        FROM ai.prices
+        JOIN (VALUES {values}) AS r(range_id, ticker, start_date, end_date)
+          ON "Ticker" = r.ticker AND "Date" BETWEEN r.start_date AND r.end_date
+        WINDOW w AS (PARTITION BY r.range_id ORDER BY "Date")
+        ORDER BY r.range_id, "Date"
+    """
+    params = tuple(value for i, (ticker, start, end) in enumerate(ranges) for value in (i, ticker, start, end))
+    return pd.read_sql(query, get_engine(), params=params)
+
+async def run_in_pool(fn, *args):
+    """Chạy fn(*args) trong pool worker; trả 503 khi hàng đợi đầy, 504 khi quá thời gian"""
+    from plot_workers import PlotError, PoolBusy
+
+    pool = get_plot_pool()
+    try:
+        return await pool.run(fn, *args)
+    except PlotError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except PoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Plot took longer than {pool.timeout_s:.0f}s")
+
+async def run_plot(params: dict) -> str:
+    """Trả ảnh đã vẽ nếu có trong cache, nếu không chạy render_plot trong pool worker
+    (các request giống hệt nhau đang chạy cùng lúc chỉ vẽ một lần)"""
+
+    async def render(filename: str) -> str:
+        return await run_in_pool(render_plot, params, filename)
+
+    return str(await get_plot_cache().get_or_render(params, render))
+
+async def run_plot_series(params: dict, max_points: int = DEFAULT_MAX_POINTS, df: pd.DataFrame = None) -> dict:
+    """Các series của biểu đồ (format="json"): đọc từ cache nếu có, nếu không tính trong pool worker
+    (các request giống hệt nhau đang chạy cùng lúc chỉ tính một lần) và lưu vào cache như ảnh"""
+    key = {**params, "format": "json", "max_points": max_points}
+
+    async def render(filename: str) -> str:
+        series = await run_in_pool(plot_series, params, max_points, df)
+        data = json.dumps(series, default=str).encode()
+        return str(await asyncio.to_thread(get_artifact_store().write, filename, data))
+
+    path = await get_plot_cache().get_or_render(key, render)
+    try:
+        return json.loads(await asyncio.to_thread(path.read_bytes))
+    except OSError:
+        # Vừa bị janitor xóa: tính lại
+        return await run_in_pool(plot_series, params, max_points, df)
+
+def save_plot(filename: str, data: bytes) -> None:
+    """Ghi ảnh đã trả inline vào artifact store để các request sau lấy từ cache"""
+    get_plot_cache().put(get_artifact_store().write(filename, data))
+
+async def run_plot_image(params: dict) -> Response:
+    """Trả ảnh trong chính response: đọc từ cache nếu có, nếu không vẽ trong bộ nhớ của worker
+    (các request giống hệt nhau đang chạy cùng lúc chỉ vẽ một lần), trả ngay, rồi mới ghi vào cache
+    sau khi đã gửi response"""
+    cache = get_plot_cache()
+    filename = cache.filename(params)
+
+    async def render() -> bytes:
+        return await run_in_pool(render_plot, params, None, True)
+
+    data, rendered = await cache.get_or_render_data(params, render)
+    background = BackgroundTask(save_plot, filename, data) if rendered else None
+    headers = {"ETag": content_etag(data), "Content-Location": f"/plots/{filename}"}
+    media_type = IMAGE_FORMATS[params.get("format", DEFAULT_RENDER["format"])]
+    return Response(data, media_type=media_type, headers=headers, background=background)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match có chứa etag không (so sánh yếu, như HTTP quy định cho If-None-Match)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
 @app.post("/plot")
 async def create_stock_plot(request: PlotRequest):
     """API endpoint để tạo biểu đồ chứng khoán"""
     try:
-        # Lấy dữ liệu
-        df = get_stock_data(
-            ticker=request.ticker,
-            start_date=request.start_date,
-            end_date=request.end_date
-        )
-        
-        # Tạo biểu đồ
-        plot_path = create_plot(
-            df=df,
-            ticker=request.ticker,
-            start_date=request.start_date,
-            end_date=request.end_date
-        )
+        params = {
+            "ticker": request.ticker,
+            "start_date": request.start_date,
+            "end_date": request.end_date
+        }
+        if request.format == "json":
+            # Chỉ lấy dữ liệu (từ cache, hoặc trong worker), client tự vẽ
+            series = await run_plot_series(params, request.max_points)
+            return {"message": f"Data for {request.ticker} from {request.start_date} to {request.end_date}", **series}
+
+        params.update(request.render_options())
+        if request.inline:
+            return await run_plot_image(params)
+
+        # Lấy dữ liệu và tạo biểu đồ trong worker
+        plot_path = await run_plot(params)
         
         # Trả về kết quả
         return {
             "message": f"Plot created for {request.ticker} from {request.start_date} to {request.end_date}",
             "plot_url": f"http://localhost:8000/plots/{os.path.basename(plot_path)}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1061,48 +1336,230 @@ async def create_stock_plot(request: PlotRequest):
 async def process_plot_command(request: PlotCommand):
     """API endpoint để xử lý câu lệnh plot"""
     try:
-        # Phân tích câu lệnh
-        params = parse_plot_command(request.command)
-        
-        # Lấy dữ liệu
-        df = get_stock_data(
-            ticker=params["ticker"],
-            start_date=params.get("start_date"),
-            end_date=params.get("end_date"),
-            date=params.get("date"),
-            plot_type=params["plot_type"],
-            data_type=params.get("data_type"),
-            tickers=params.get("tickers"),
-            rolling_window=params.get("rolling_window")
-        )
+        # Phân tích câu lệnh (có thể truy vấn ngày mới nhất nên chạy ngoài event loop)
+        params = await asyncio.to_thread(parse_plot_command, request.command)
         
-        # Tạo biểu đồ
-        plot_path = create_plot(
-            df=df,
-            ticker=params["ticker"],
-            start_date=params.get("start_date"),
-            end_date=params.get("end_date"),
-            plot_type=params["plot_type"],
-            data_type=params.get("data_type"),
-            tickers=params.get("tickers"),
-            rolling_window=params.get("rolling_window")
-        )
+        if request.format == "json":
+            # Chỉ lấy dữ liệu (từ cache, hoặc trong worker), client tự vẽ
+            series = await run_plot_series(params, request.max_points)
+            return {"message": f"Data for {params['ticker']}", "params": params, **series}
+
+        params.update(request.render_options())
+        if request.inline:
+            return await run_plot_image(params)
+
+        # Lấy dữ liệu và tạo biểu đồ trong worker
+        plot_path = await run_plot(params)
         
         # Trả về kết quả
         return {
             "message": f"Plot created for {params['ticker']}",
             "plot_url": f"http://localhost:8000/plots/{os.path.basename(plot_path)}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def batch_params(spec: PlotSpec) -> dict:
+    """params của một biểu đồ trong /plot/batch (có thể truy vấn database nên chạy ngoài event loop)"""
+    if spec.command:
+        params = parse_plot_command(spec.command)
+    elif spec.ticker and spec.start_date and spec.end_date:
+        params = {"ticker": spec.ticker, "start_date": spec.start_date, "end_date": spec.end_date}
+    else:
+        raise HTTPException(status_code=400, detail="Cần command, hoặc ticker, start_date và end_date")
+    check_ticker_range(params["ticker"], params.get("start_date"), params.get("end_date"))
+    if spec.format != "json":
+        params.update(spec.render_options())
+    return params
+
+@app.post("/plot/batch")
+async def create_plot_batch(request: PlotBatch):
+    """API endpoint để vẽ nhiều biểu đồ (vd. một dashboard) trong một request: giá hằng ngày của các biểu đồ
+    được lấy bằng một truy vấn, các biểu đồ được vẽ song song trong pool worker.
+    Mỗi biểu đồ có kết quả (hoặc lỗi) và thời gian riêng; inline không dùng được trong batch"""
+    started = time.perf_counter()
+    specs = request.plots
+    results: List[dict] = [{"index": i} for i in range(len(specs))]
+
+    def fail(i: int, error: BaseException) -> None:
+        status_code = error.status_code if isinstance(error, HTTPException) else 500
+        detail = error.detail if isinstance(error, HTTPException) else str(error)
+        results[i].update(status_code=status_code, error=detail)
+
+    # Phân tích các câu lệnh song song
+    parsed = await asyncio.gather(*[asyncio.to_thread(batch_params, spec) for spec in specs], return_exceptions=True)
+    cache = get_plot_cache()
+    todo: List[int] = []
+    for i, params in enumerate(parsed):
+        if isinstance(params, BaseException):
+            fail(i, params)
+            continue
+        results[i]["params"] = params
+        todo.append(i)
+
+    def find_cached() -> set:
+        # Tìm ảnh đã có trong cache (stat file trên đĩa) cho mọi biểu đồ trong một thread
+        store = get_artifact_store()
+        images = [i for i in todo if specs[i].format != "json"]
+        return {i for i in images if store.find(cache.filename(parsed[i])) is not None}
+
+    cached = await asyncio.to_thread(find_cached)
+
+    # Biểu đồ chưa có trong cache vẽ từ giá hằng ngày: một truy vấn cho mọi mã và khoảng thời gian
+    members = [i for i in todo if i not in cached and price_series_key(parsed[i]) is not None]
+    ranges = sorted({price_series_key(parsed[i]) for i in members})
+    frames: Dict[int, pd.DataFrame] = {}
+    fetch_ms: Dict[int, float] = {}
+
+    async def fetch() -> None:
+        columns = sorted({c for i in members for c in price_series_columns(parsed[i]) if c != "Date"})
+        fetch_started = time.perf_counter()
+        try:
+            df = await run_in_pool(fetch_price_series, ranges, columns)
+        except HTTPException:
+            # Các biểu đồ tự lấy dữ liệu khi vẽ, và báo lỗi riêng nếu có
+            return
+        elapsed = round((time.perf_counter() - fetch_started) * 1000, 1)
+        for i in members:
+            mapping = price_series_columns(parsed[i])
+            frame = df[df["Range"] == ranges.index(price_series_key(parsed[i]))]
+            frames[i] = frame[list(mapping)].rename(columns=mapping).reset_index(drop=True)
+            fetch_ms[i] = elapsed
+
+    if ranges:
+        await fetch()
+
+    # Vẽ song song, tối đa số worker cùng lúc để batch không chiếm hết hàng đợi của pool
+    semaphore = asyncio.Semaphore(get_plot_pool().workers)
+
+    async def render_one(i: int) -> None:
+        params, spec, df = parsed[i], specs[i], frames.get(i)
+        render_started = time.perf_counter()
+        try:
+            async with semaphore:
+                if spec.format == "json":
+                    results[i].update(await run_plot_series(params, spec.max_points, df))
+                else:
+                    async def render(filename: str) -> str:
+                        return await run_in_pool(render_plot, params, filename, False, df)
+
+                    plot_path = await cache.get_or_render(params, render)
+                    results[i]["plot_url"] = f"http://localhost:8000/plots/{os.path.basename(plot_path)}"
+                    results[i]["cached"] = i in cached
+        except Exception as e:
+            fail(i, e)
+        results[i]["ms"] = round((time.perf_counter() - render_started) * 1000, 1)
+        if i in fetch_ms:
+            results[i]["fetch_ms"] = fetch_ms[i]
+
+    await asyncio.gather(*[render_one(i) for i in todo])
+
+    created = sum("error" not in result for result in results)
+    return {
+        "message": f"{created}/{len(specs)} plots created",
+        "plots": results,
+        "queries": 1 if ranges else 0,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+# Thời gian tối đa một request GET /plot/jobs/{job_id} chờ job xong (long-poll)
+MAX_JOB_WAIT_S = 30.0
+
+# Thời gian tối đa một job chờ pool worker hết đầy; quá hạn thì job thất bại với 503
+MAX_JOB_BUSY_S = 10 * MAX_JOB_WAIT_S
+
+async def run_plot_job(spec: PlotSpec) -> dict:
+    """Phần việc của một job: như /plot/command (hoặc /plot), nhưng chờ khi pool worker đang đầy thay vì trả 503
+    (tối đa MAX_JOB_BUSY_S giây)"""
+    params = await asyncio.to_thread(batch_params, spec)
+    deadline = time.monotonic() + MAX_JOB_BUSY_S
+    while True:
+        try:
+            if spec.format == "json":
+                series = await run_plot_series(params, spec.max_points)
+                return {"message": f"Data for {params['ticker']}", "params": params, **series}
+            plot_path = await run_plot(params)
+            return {
+                "message": f"Plot created for {params['ticker']}",
+                "params": params,
+                "plot_url": f"http://localhost:8000/plots/{os.path.basename(plot_path)}"
+            }
+        except HTTPException as e:
+            remaining = deadline - time.monotonic()
+            if e.status_code != 503 or remaining <= 0:
+                raise
+            await asyncio.sleep(min(int((e.headers or {}).get("Retry-After", 1)), remaining))
+
+@app.post("/plot/jobs", status_code=202)
+async def submit_plot_job(request: PlotSpec):
+    """API endpoint để gửi một job vẽ biểu đồ: trả job_id ngay, biểu đồ được vẽ sau;
+    lấy kết quả bằng GET /plot/jobs/{job_id}; trả 503 khi hàng đợi đầy"""
+    from plot_jobs import QueueFull
+
+    if not request.command and not (request.ticker and request.start_date and request.end_date):
+        raise HTTPException(status_code=400, detail="Cần command, hoặc ticker, start_date và end_date")
+    description = request.model_dump(exclude_none=True, exclude_defaults=True)
+    try:
+        job = get_plot_jobs().submit(lambda: run_plot_job(request), description)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
+    return {**job.to_dict(), "status_url": f"http://localhost:8000/plot/jobs/{job.id}"}
+
+@app.get("/plot/jobs")
+async def get_plot_job_stats():
+    """API endpoint để xem độ dài hàng đợi job, số job và thời gian chờ, thời gian vẽ (p50, p95)"""
+    return get_plot_jobs().stats()
+
+@app.get("/plot/jobs/{job_id}")
+async def get_plot_job(job_id: str, wait: float = 0):
+    """API endpoint để xem trạng thái và kết quả của job; wait > 0: chờ tối đa wait giây
+    (không quá MAX_JOB_WAIT_S) cho đến khi job xong rồi mới trả lời"""
+    jobs = get_plot_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = await jobs.wait(job, min(max(wait, 0), MAX_JOB_WAIT_S))
+    return job.to_dict()
+
+@app.get("/plot/metadata")
+async def get_plot_metadata():
+    """API endpoint để xem khoảng ngày có dữ liệu, danh sách mã và sector"""
+    return await asyncio.to_thread(get_market_metadata().summary)
+
+@app.get("/plot/workers")
+async def get_plot_workers():
+    """API endpoint để xem trạng thái pool worker vẽ biểu đồ"""
+    return get_plot_pool().stats()
+
+@app.get("/plot/cache")
+async def get_plot_cache_stats():
+    """API endpoint để xem thống kê cache ảnh đã vẽ"""
+    return get_plot_cache().stats()
+
+@app.get("/plot/artifacts")
+async def get_artifact_stats():
+    """API endpoint để xem số lượng, dung lượng và số ảnh đã bị xóa của artifact store"""
+    return get_artifact_store().stats()
+
 @app.get("/plots/{filename}")
-async def get_plot(filename: str):
-    """API endpoint để lấy file biểu đồ"""
-    file_path = output_dir / filename
-    if file_path.exists():
-        return FileResponse(file_path)
-    raise HTTPException(status_code=404, detail="Plot not found")
+async def get_plot(filename: str, request: Request):
+    """API endpoint để lấy file biểu đồ, với ETag và Cache-Control; trả 304 nếu client đã có bản này"""
+    from plot_cache import is_cache_filename
+
+    store = get_artifact_store()
+    file_path = store.find(filename)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Plot not found")
+    store.touch(filename)
+    headers = {
+        "ETag": await asyncio.to_thread(store.etag, file_path),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_cache_filename(filename) else REVALIDATE_CACHE_CONTROL,
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(file_path, media_type=IMAGE_FORMATS.get(file_path.suffix[1:]), headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,199 @@
+"""Content-addressed cache of rendered plots.
+
+`plot_api` used to write a new `{ticker}_{plot_type}_{timestamp}.png` for every
+request, even when the same plot of the same data had already been drawn.
+`PlotRenderCache` names each image after a hash of the canonical plot request
+(the dict returned by `parse_plot_command`, or the fields of `/plot`) and of the
+data version. A repeat request finds the image on disk and is answered without
+touching the database or matplotlib, including after a server restart.
+
+When the data is reloaded the key of every request changes; the images rendered
+for the previous version by this process are deleted at the first lookup, and
+older ones expire in the `ArtifactStore` that holds them.
+
+`get_or_render` and `get_or_render_data` (for images returned in the response)
+also coalesce identical requests that arrive while their plot is being rendered
+(e.g. a dashboard loading in many browsers at once): they wait for the one
+render in progress instead of starting their own.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from agno.utils.log import log_debug, logger
+from artifact_store import ArtifactStore
+from data_version import get_data_version
+
+# Hex digits of the request hash kept in file names
+KEY_LENGTH = 20
+
+UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+# End of the names given by `PlotRenderCache.filename` ("{ticker}_{plot_type}_{key}.{format}")
+CACHE_FILENAME = re.compile(rf"_[0-9a-f]{{{KEY_LENGTH}}}\.[a-z]+$")
+
+
+def plot_key(params: Dict[str, Any], data_version: str) -> str:
+    """Hash of a plot request: same parameters and data, same key."""
+    canonical = json.dumps({"params": params, "data_version": data_version}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:KEY_LENGTH]
+
+
+def is_cache_filename(name: str) -> bool:
+    """Whether `name` is a cached plot, whose content never changes (a new request or data gets a new name)."""
+    return CACHE_FILENAME.search(name) is not None
+
+
+class PlotRenderCache:
+    """Rendered plot files, found by request hash."""
+
+    def __init__(self, store: ArtifactStore):
+        # Where the images live; it may also evict them under its byte budget or TTL
+        self.store = store
+        # Files rendered by this process for the current data version, deleted on reload
+        self._rendered: Dict[str, Path] = {}
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+        # Renders in progress, by file name; awaited by identical requests (event loop only)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _check_version(self) -> str:
+        version = get_data_version()
+        if version != self._data_version:
+            with self._lock:
+                if version != self._data_version:
+                    stale, self._rendered = self._rendered, {}
+                    self._data_version = version
+                    for path in stale.values():
+                        try:
+                            path.unlink(missing_ok=True)
+                        except OSError as e:
+                            logger.warning(f"Could not delete stale plot {path}: {e}")
+                    self.evictions += len(stale)
+                    if stale:
+                        log_debug(f"Data reloaded, deleted {len(stale)} cached plots")
+        return version
+
+    def filename(self, params: Dict[str, Any]) -> str:
+        """File name of the plot for `params` and the current data."""
+        key = plot_key(params, self._check_version())
+        ticker = UNSAFE_CHARS.sub("", str(params.get("ticker") or ""))[:16] or "plot"
+        plot_type = UNSAFE_CHARS.sub("", str(params.get("plot_type") or "time_series"))[:16]
+        suffix = re.sub(r"[^a-z0-9]", "", str(params.get("format") or "png"))[:8] or "png"
+        return f"{ticker}_{plot_type}_{key}.{suffix}"
+
+    def _find(self, name: str) -> Optional[Path]:
+        path = self.store.find(name)
+        if path is not None:
+            self.store.touch(name)
+            with self._lock:
+                self.hits += 1
+        return path
+
+    def get(self, params: Dict[str, Any]) -> Optional[Path]:
+        """Path of the already rendered plot for `params`, or None."""
+        path = self._find(self.filename(params))
+        if path is None:
+            with self._lock:
+                self.misses += 1
+        return path
+
+    async def _single_flight(self, name: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result of `compute()`, True), or (result of the call already running for `name`, False)."""
+        in_flight = self._in_flight.get(name)
+        if in_flight is not None:
+            with self._lock:
+                self.coalesced += 1
+            # shield: a waiter that goes away does not cancel the render of the others
+            return await asyncio.shield(in_flight), False
+        with self._lock:
+            self.misses += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._in_flight[name] = future
+        try:
+            result = await compute()
+            future.set_result(result)
+            return result, True
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the error as retrieved when no request was waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[name]
+
+    async def get_or_render(self, params: Dict[str, Any], render: Callable[[str], Awaitable[str]]) -> Path:
+        """Cached plot for `params`, or the result of `render(filename)`.
+
+        Concurrent calls for the same plot share one render: the first one runs
+        it and the others wait for its result (or its error).
+        """
+        name = self.filename(params)
+        path = self._find(name)
+        if path is not None:
+            return path
+
+        async def render_file() -> Path:
+            path = Path(await render(name))
+            self.put(path)
+            return path
+
+        result, _ = await self._single_flight(name, render_file)
+        if isinstance(result, bytes):
+            # Coalesced with an in-memory render (see get_or_render_data), not saved yet
+            result = await asyncio.to_thread(self.store.write, name, result)
+            self.put(result)
+        return result
+
+    async def get_or_render_data(
+        self, params: Dict[str, Any], render: Callable[[], Awaitable[bytes]]
+    ) -> Tuple[bytes, bool]:
+        """Content of the cached plot for `params`, or the result of an in-memory `render()`.
+
+        Shares renders with `get_or_render`. Returns (data, rendered): `rendered` is True
+        only for the call that ran the render, which should `put` the image in the cache.
+        """
+        name = self.filename(params)
+        path = self._find(name)
+        if path is not None:
+            try:
+                return await asyncio.to_thread(path.read_bytes), False
+            except OSError:
+                # Just deleted by the artifact janitor: render again
+                pass
+        result, rendered = await self._single_flight(name, render)
+        if isinstance(result, Path):
+            return await asyncio.to_thread(result.read_bytes), False
+        return result, rendered
+
+    def put(self, path: Path) -> None:
+        """Record a newly rendered plot, so that it is deleted when the data is reloaded."""
+        with self._lock:
+            self._rendered[path.name] = path
+        self.store.add(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._rendered),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+                "evictions": self.evictions,
+                "data_version": self._data_version,
+            }
@@ -0,0 +1,207 @@
+"""In-process queue of asynchronous plot jobs.
+
+`/plot/command` answers only once the plot is rendered, so a client such as
+`pages/test_plot_chat.py` is blocked for the whole render, and long date
+ranges or heatmaps can outlast HTTP timeouts. With `/plot/jobs` the server
+instead returns a job id at once and renders in the background; the client
+polls the job, or long-polls it (`wait`), until it is done.
+
+`PlotJobQueue` holds at most `max_queued` jobs waiting to start; beyond that
+`submit` raises `QueueFull`. `runners` tasks on the event loop take jobs in
+submission order and await them; the actual work still runs in the plot
+worker pool, so there is no point in more runners than workers. Finished
+jobs are kept for `ttl_s`, then forgotten.
+
+Settings (environment variables): `PLOT_JOB_QUEUE_DEPTH` (default: 64),
+`PLOT_JOB_RUNNERS` (default: one per plot worker) and `PLOT_JOB_TTL_S`
+(default: 900).
+"""
+
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from agno.utils.log import log_debug, logger
+
+DEFAULT_QUEUE_DEPTH = 64
+DEFAULT_TTL_S = 900.0
+
+# Recent jobs whose queue wait and run times are summarized in `stats`
+RECENT_JOBS = 200
+
+
+class QueueFull(Exception):
+    """Too many jobs are waiting to start."""
+
+    def __init__(self, queued: int, retry_after_s: int):
+        super().__init__(f"Plot job queue full: {queued} jobs waiting, retry in {retry_after_s}s")
+        self.queued = queued
+        self.retry_after_s = retry_after_s
+
+
+@dataclass
+class PlotJob:
+    id: str
+    run: Callable[[], Awaitable[Dict[str, Any]]]
+    # Description of the job returned with its status (e.g. the plot command)
+    request: Dict[str, Any]
+    status: str = "queued"
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        job: Dict[str, Any] = {"job_id": self.id, "status": self.status, "request": self.request}
+        job["wait_ms"] = round(((self.started or time.time()) - self.submitted) * 1000, 1)
+        if self.started is not None and self.finished is not None:
+            job["run_ms"] = round((self.finished - self.started) * 1000, 1)
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class PlotJobQueue:
+    """Bounded FIFO of plot jobs, run by a fixed number of tasks on the event loop."""
+
+    def __init__(self, runners: int = 1, max_queued: int = DEFAULT_QUEUE_DEPTH, ttl_s: float = DEFAULT_TTL_S):
+        self.runners = max(1, runners)
+        self.max_queued = max(1, max_queued)
+        self.ttl_s = ttl_s
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Every job not yet forgotten, oldest first
+        self._jobs: "OrderedDict[str, PlotJob]" = OrderedDict()
+        self._running = 0
+        self._wait_s: Deque[float] = deque(maxlen=RECENT_JOBS)
+        self._run_s: Deque[float] = deque(maxlen=RECENT_JOBS)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, runners: int = 1) -> "PlotJobQueue":
+        return cls(
+            runners=int(os.getenv("PLOT_JOB_RUNNERS", "0")) or runners,
+            max_queued=int(os.getenv("PLOT_JOB_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH)),
+            ttl_s=float(os.getenv("PLOT_JOB_TTL_S", DEFAULT_TTL_S)),
+        )
+
+    # ************* Runners *************
+    def start(self) -> None:
+        """Start the runner tasks on the running event loop (once)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._run(), name=f"plot-job-runner-{i}") for i in range(self.runners)]
+        log_debug(f"Started {self.runners} plot job runners")
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            self._running += 1
+            self._wait_s.append(job.started - job.submitted)
+            try:
+                job.result = await job.run()
+                job.status = "done"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = {"status_code": 503, "detail": "Server shutting down"}
+                raise
+            except Exception as e:
+                # HTTPException and PlotError carry the HTTP status of the error
+                job.status = "failed"
+                job.error = {"status_code": getattr(e, "status_code", 500), "detail": getattr(e, "detail", str(e))}
+                self.failed += 1
+                if job.error["status_code"] >= 500:
+                    logger.warning(f"Plot job {job.id} failed: {job.error['detail']}")
+            finally:
+                job.finished = time.time()
+                self._run_s.append(job.finished - job.started)
+                self._running -= 1
+                job.done.set()
+                self._queue.task_done()
+
+    # ************* Jobs *************
+    def _forget_expired(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.ttl_s:
+                del self._jobs[job_id]
+
+    def retry_after_s(self) -> int:
+        """Seconds until a place in the queue is likely to be free."""
+        run_s = statistics.mean(self._run_s) if self._run_s else 1.0
+        return max(1, round(run_s * self.max_queued / self.runners))
+
+    def submit(self, run: Callable[[], Awaitable[Dict[str, Any]]], request: Dict[str, Any]) -> PlotJob:
+        """Queue `run()`; returns the job at once."""
+        if self._queue is None:
+            raise RuntimeError("PlotJobQueue.start() was not called")
+        self._forget_expired()
+        job = PlotJob(id=uuid.uuid4().hex, run=run, request=request)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(self._queue.qsize(), self.retry_after_s()) from None
+        self._jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[PlotJob]:
+        self._forget_expired()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: PlotJob, timeout_s: float) -> PlotJob:
+        """`job` once it is finished, or after `timeout_s`, whichever comes first."""
+        if timeout_s > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout_s)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(samples: Deque[float], q: float) -> Optional[float]:
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+        now = time.time()
+        waiting = [job for job in self._jobs.values() if job.status == "queued"]
+        return {
+            "runners": self.runners,
+            "max_queued": self.max_queued,
+            "queued": len(waiting),
+            "running": self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "oldest_queued_ms": round((now - min(job.submitted for job in waiting)) * 1000, 1) if waiting else None,
+            "wait_p50_ms": ms(self._wait_s, 0.5),
+            "wait_p95_ms": ms(self._wait_s, 0.95),
+            "run_p50_ms": ms(self._run_s, 0.5),
+            "run_p95_ms": ms(self._run_s, 0.95),
+        }
@@ -0,0 +1,146 @@
+"""Plot data as JSON series, for clients that draw their own charts.
+
+`plot_api` renders every plot to a PNG with matplotlib. With `format=json` it
+returns the data the chart would be drawn from instead, shaped by what it is:
+
+- "series": one row per date (prices, rolling average, returns, volume). Each
+  numeric column becomes a series of (date, value) points, downsampled with
+  Largest-Triangle-Three-Buckets (LTTB) to at most `max_points` points. LTTB
+  keeps the points that shape the line (peaks, troughs, turns), so a
+  multi-year range drawn from 1,000 points looks like the full one.
+- "box": daily returns grouped by month, as the five numbers a box plot needs.
+- "matrix": the correlation heatmap.
+- "table": anything else (per-company bars, pies, scatters), as records; rows
+  beyond `max_points` are sampled at a regular stride.
+
+Values are plain floats and dates ISO strings, so the result can be returned
+as is from a FastAPI endpoint.
+"""
+
+import math
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 1000
+
+# LTTB needs the first point, the last one and at least one bucket between them
+MIN_POINTS = 3
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    `x` must be increasing. The first and last points are always kept; the
+    others are split into `max_points - 2` buckets, and each bucket keeps the
+    point forming the largest triangle with the point kept in the previous
+    bucket and the average of the next bucket.
+    """
+    n = len(x)
+    if max_points >= n or max_points < MIN_POINTS:
+        return np.arange(n)
+    every = (n - 2) / (max_points - 2)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Twice the area of the triangle (a, candidate, next average), for every candidate of the bucket
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def _values(values: pd.Series) -> List[Optional[float]]:
+    return [None if pd.isna(v) else float(v) for v in values]
+
+
+def _scalar(value: Any) -> Any:
+    """JSON value of a DataFrame cell."""
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, np.generic):
+        return _scalar(value.item())
+    return value
+
+
+def _series(df: pd.DataFrame, max_points: int) -> Dict[str, Any]:
+    df = df.sort_values("Date")
+    dates = pd.to_datetime(df["Date"])
+    columns = [c for c in df.columns if c != "Date" and pd.api.types.is_numeric_dtype(df[c])]
+    series = []
+    for column in columns:
+        values = df[column].astype(float)
+        # Leading values of windows (first daily return, first days of a rolling average) are empty
+        present = values.notna().to_numpy()
+        x = dates[present]
+        y = values[present].to_numpy()
+        seconds = (x - x.iloc[0]).dt.total_seconds().to_numpy() if len(x) else np.empty(0)
+        kept = lttb(seconds, y, max_points)
+        series.append(
+            {
+                "name": column,
+                "x": [d.strftime("%Y-%m-%d") for d in x.iloc[kept]],
+                "y": [float(v) for v in y[kept]],
+            }
+        )
+    return {"kind": "series", "points": len(df), "series": series}
+
+
+def _box(df: pd.DataFrame, group: str, value: str) -> Dict[str, Any]:
+    groups = []
+    # Groups in the order they first appear (months in date order)
+    for name, values in df.dropna(subset=[value]).groupby(group, sort=False)[value]:
+        q1, median, q3 = values.quantile([0.25, 0.5, 0.75])
+        groups.append(
+            {
+                "name": name,
+                "min": float(values.min()),
+                "q1": float(q1),
+                "median": float(median),
+                "q3": float(q3),
+                "max": float(values.max()),
+                "count": int(values.count()),
+            }
+        )
+    return {"kind": "box", "value": value, "groups": groups}
+
+
+def _matrix(df: pd.DataFrame) -> Dict[str, Any]:
+    return {
+        "kind": "matrix",
+        "index": [str(i) for i in df.index],
+        "columns": [str(c) for c in df.columns],
+        "values": [_values(df.loc[i]) for i in df.index],
+    }
+
+
+def _table(df: pd.DataFrame, max_points: int) -> Dict[str, Any]:
+    rows = len(df)
+    if rows > max_points:
+        df = df.iloc[:: math.ceil(rows / max_points)]
+    records = [{str(k): _scalar(v) for k, v in row.items()} for row in df.to_dict(orient="records")]
+    return {"kind": "table", "points": rows, "columns": [str(c) for c in df.columns], "rows": records}
+
+
+def to_series(
+    df: pd.DataFrame, plot_type: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS
+) -> Dict[str, Any]:
+    """JSON-ready data of a plot, from the DataFrame returned by `plot_api.get_stock_data`."""
+    max_points = max(MIN_POINTS, max_points)
+    if plot_type == "boxplot" and {"Month", "Daily_Return"} <= set(df.columns):
+        return _box(df, "Month", "Daily_Return")
+    if plot_type == "heatmap":
+        return _matrix(df)
+    if "Date" in df.columns and df["Date"].is_unique and len(df) > 1:
+        return _series(df, max_points)
+    return _table(df, max_points)
@@ -1,9 +1,11 @@
 import matplotlib.pyplot as plt
 import pandas as pd
-from typing import List, Dict
+from pathlib import Path
+from typing import List, Dict, Optional
+from uuid import uuid4
 from agno.tools import Toolkit
 from agno.utils.log import log_info, logger
-import time
+from artifact_store import get_artifact_store
 class PlotTools:
     def plot_time_series(
         self,
@@ -13,7 +15,7 @@ class PlotTools:
         title: str = "Time Series Plot",
         xlabel: str = "Date",
         ylabel: str = "Close ($)",
-        output_path: str = f"plot_{int(time.time())}.png"
+        output_path: Optional[str] = None
     ) -> str:
         """
         Vẽ biểu đồ time series từ dữ liệu.
@@ -22,7 +24,7 @@ class PlotTools:
             x: tên cột trục X (ví dụ: 'date')
             y: tên cột trục Y (ví dụ: 'close')
             title, xlabel, ylabel: tiêu đề và nhãn trục
-            output_path: đường dẫn lưu file ảnh
+            output_path: tên file ảnh, lưu trong artifact store (mặc định plot_<id>.png)
         Returns:
             Đường dẫn file ảnh đã lưu
         """
@@ -36,9 +38,13 @@ class PlotTools:
         plt.xlabel(xlabel)
         plt.ylabel(ylabel)
         plt.tight_layout()
-        plt.savefig(output_path)
+        # Chỉ giữ tên file: ảnh luôn nằm trong artifact store, có giới hạn dung lượng
+        store = get_artifact_store()
+        output_file = store.path_for(Path(output_path).name if output_path else f"plot_{uuid4().hex[:12]}.png")
+        plt.savefig(output_file)
         plt.close()
-        return output_path
+        store.add(output_file)
+        return str(output_file)
 
 class PlotTool(Toolkit):
     """Tool để vẽ biểu đồ time series từ dữ liệu."""
@@ -56,7 +62,7 @@ class PlotTool(Toolkit):
         title: str = "Time Series Plot",
         xlabel: str = "Date",
         ylabel: str = "Close ($)",
-        output_path: str = "output/plot.png"
+        output_path: Optional[str] = None
     ) -> str:
         """
         Vẽ biểu đồ time series từ dữ liệu.
@@ -65,7 +71,7 @@ class PlotTool(Toolkit):
             x: tên cột trục X (ví dụ: 'date')
             y: tên cột trục Y (ví dụ: 'close')
             title, xlabel, ylabel: tiêu đề và nhãn trục
-            output_path: đường dẫn lưu file ảnh
+            output_path: tên file ảnh, lưu trong artifact store (mặc định plot_<id>.png)
         Returns:
             Đường dẫn file ảnh đã lưu
         """
@@ -0,0 +1,210 @@
+"""Process pool for the blocking part of plot requests.
+
+The plot endpoints of `plot_api` are `async`, but fetching the data
+(`pd.read_sql`) and drawing it (matplotlib) are blocking: run on the event loop,
+one slow plot held up every other request of the server. `PlotWorkerPool` runs
+them in worker processes instead, so renders use every core and the event loop
+only awaits the result.
+
+Workers are started with `spawn` (they do not inherit the server's threads,
+sockets or database connections) and import pandas, matplotlib with the Agg
+backend, seaborn and `plot_api` once, when they start. `warm_up` starts all of
+them ahead of the first request.
+
+At most `workers + queue_depth` plots are admitted at a time, counting renders
+that are still running after their request timed out. Beyond that,
+`run` raises `PoolBusy` without queueing, and `plot_api` answers 503 with a
+`Retry-After` estimated from recent render times.
+
+Settings (environment variables): `PLOT_WORKERS` (default: number of CPUs),
+`PLOT_QUEUE_DEPTH` (plots waiting for a worker, default: 2 per worker) and
+`PLOT_TIMEOUT_S` (default: 60).
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agno.utils.log import log_debug, logger
+
+DEFAULT_TIMEOUT_S = 60.0
+
+# Weight of the latest render in the moving average used for Retry-After
+RENDER_TIME_ALPHA = 0.2
+
+
+def _warm_up_worker() -> None:
+    """Worker initializer: pay the import cost once per process, not per plot."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import plot_api  # noqa: F401
+    import seaborn  # noqa: F401
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, Any]:
+    """(seconds spent in the worker, result of `fn(*args)`)."""
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        # HTTPException keeps no args and cannot be unpickled in the server process
+        raise PlotError(getattr(e, "status_code", 500), str(getattr(e, "detail", e))) from None
+    return time.perf_counter() - start, result
+
+
+class PlotError(Exception):
+    """Error raised by a plot in a worker, with the HTTP status it maps to."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class PoolBusy(Exception):
+    """Every worker is busy and the queue is full."""
+
+    def __init__(self, pending: int, retry_after_s: int):
+        super().__init__(f"Plot server busy: {pending} plots in progress or queued, retry in {retry_after_s}s")
+        self.pending = pending
+        self.retry_after_s = retry_after_s
+
+
+class PlotWorkerPool:
+    """Bounded pool of pre-warmed plot worker processes."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_depth: Optional[int] = None,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+    ):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_depth = 2 * self.workers if queue_depth is None else max(0, queue_depth)
+        self.timeout_s = timeout_s
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._render_s: Optional[float] = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls) -> "PlotWorkerPool":
+        return cls(
+            workers=int(os.getenv("PLOT_WORKERS", "0")) or None,
+            queue_depth=int(os.environ["PLOT_QUEUE_DEPTH"]) if os.getenv("PLOT_QUEUE_DEPTH") else None,
+            timeout_s=float(os.getenv("PLOT_TIMEOUT_S", DEFAULT_TIMEOUT_S)),
+        )
+
+    @property
+    def max_pending(self) -> int:
+        return self.workers + self.queue_depth
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up_worker,
+                )
+            return self._executor
+
+    def warm_up(self) -> List[int]:
+        """Start every worker now rather than on the first plots; returns their pids."""
+        start = time.perf_counter()
+        executor = self._get_executor()
+        pids = sorted({f.result() for f in [executor.submit(_worker_pid) for _ in range(self.workers)]})
+        log_debug(f"Started {len(pids)} plot workers in {time.perf_counter() - start:.2f}s")
+        return pids
+
+    def retry_after_s(self) -> int:
+        """Seconds until a queue slot is likely to be free."""
+        render_s = self._render_s if self._render_s is not None else 1.0
+        return max(1, math.ceil(render_s * max(1, self._pending - self.queue_depth) / self.workers))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` in a worker; `fn` and its arguments must be picklable."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy(self._pending, self.retry_after_s())
+            self._pending += 1
+        executor: Optional[ProcessPoolExecutor] = None
+        submitted = False
+        try:
+            executor = self._get_executor()
+            future = executor.submit(_timed_call, fn, args)
+            # The slot is freed when the worker is done with the plot, not when the caller stops
+            # waiting: after a timeout the render keeps its worker and must still count
+            future.add_done_callback(self._release)
+            submitted = True
+            elapsed, result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_s)
+        except asyncio.TimeoutError:
+            # A render that already started keeps its worker until it ends
+            with self._lock:
+                self.timed_out += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a new pool for the next plots
+            logger.warning("Plot worker pool broken, restarting it")
+            with self._lock:
+                self.failed += 1
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+                self._render_s = (
+                    elapsed
+                    if self._render_s is None
+                    else RENDER_TIME_ALPHA * elapsed + (1 - RENDER_TIME_ALPHA) * self._render_s
+                )
+            return result
+        finally:
+            if not submitted:
+                self._release()
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_render_ms": round(self._render_s * 1000, 1) if self._render_s is not None else None,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,256 @@
+"""Speculative prefetch of daily prices named in a question.
+
+Most questions name a company and a date ("closing price of Boeing on August
+1, 2023"). `extract_entities` finds them as soon as the question arrives
+(companies with the `EntityResolver`, dates with a few regexes), and `PriceSliceCache.prefetch` loads the matching price
+rows in the background, one slice per ticker and calendar year, while the
+model is still reading the knowledge base and reasoning. The agent's
+`get_stock_prices` tool (`PriceTools`) then answers from memory instead of a
+SQL round-trip; slices that were not prefetched are loaded on demand.
+
+Slices are keyed by data version: reloading the data drops them.
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from agno.tools import Toolkit
+from agno.utils.log import log_debug, logger
+from data_version import get_data_version
+from entity_resolver import EntityResolver
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from trading_calendar import TradingCalendar, as_date
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+)
+MONTH_NAMES = "|".join(MONTHS + tuple(m[:3] for m in MONTHS) + ("sept",))
+
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+DAY_DATE = re.compile(rf"\b({MONTH_NAMES})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.IGNORECASE)
+MONTH_SPAN = re.compile(
+    rf"\b({MONTH_NAMES})\.?\s+(?:through|to|until|-)\s+({MONTH_NAMES})\.?\s+(\d{{4}})\b", re.IGNORECASE
+)
+MONTH_DATE = re.compile(rf"\b({MONTH_NAMES})\.?\s+(\d{{4}})\b", re.IGNORECASE)
+QUARTER = re.compile(r"\bQ([1-4])\s+(\d{4})\b", re.IGNORECASE)
+YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Background loads running at the same time
+PREFETCH_WORKERS = 2
+
+# Seconds `get_stock_prices` waits for a slice that is being prefetched
+DEFAULT_WAIT_S = 10.0
+
+PRICE_COLUMNS = '"Date", "Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits", "Ticker"'
+
+
+def price_query(ticker: str, start: date, end: date) -> str:
+    """SQL equivalent of a `get_stock_prices` call, shown to the user like an executed query."""
+    return (
+        f"SELECT {PRICE_COLUMNS} FROM prices WHERE \"Ticker\" = '{ticker}' "
+        f"AND \"Date\" BETWEEN '{start}' AND '{end}' ORDER BY \"Date\""
+    )
+
+
+def _month(name: str) -> int:
+    name = name.lower()[:3]
+    return [m[:3] for m in MONTHS].index(name) + 1
+
+
+@dataclass
+class QuestionEntities:
+    tickers: List[str] = field(default_factory=list)
+    # Inclusive date ranges named in the question
+    ranges: List[Tuple[date, date]] = field(default_factory=list)
+
+    @property
+    def years(self) -> Set[int]:
+        return {year for start, end in self.ranges for year in range(start.year, end.year + 1)}
+
+
+def extract_entities(question: str, resolver: Optional[EntityResolver]) -> QuestionEntities:
+    """Tickers and date ranges named in `question`."""
+    entities = QuestionEntities(tickers=resolver.find_symbols(question) if resolver is not None else [])
+    for match in ISO_DATE.finditer(question):
+        day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        entities.ranges.append((day, day))
+    for match in DAY_DATE.finditer(question):
+        day = date(int(match.group(3)), _month(match.group(1)), int(match.group(2)))
+        entities.ranges.append((day, day))
+    rest = DAY_DATE.sub(" ", ISO_DATE.sub(" ", question))
+    for match in MONTH_SPAN.finditer(rest):
+        year, first, last = int(match.group(3)), _month(match.group(1)), _month(match.group(2))
+        end = date(year + (last == 12), last % 12 + 1, 1) - timedelta(days=1)
+        entities.ranges.append((date(year, first, 1), end))
+    rest = MONTH_SPAN.sub(" ", rest)
+    for match in MONTH_DATE.finditer(rest):
+        year, month = int(match.group(2)), _month(match.group(1))
+        end = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+        entities.ranges.append((date(year, month, 1), end))
+    for match in QUARTER.finditer(rest):
+        year, quarter = int(match.group(2)), int(match.group(1))
+        end = date(year + (quarter == 4), (quarter * 3) % 12 + 1, 1) - timedelta(days=1)
+        entities.ranges.append((date(year, quarter * 3 - 2, 1), end))
+    rest = QUARTER.sub(" ", MONTH_DATE.sub(" ", rest))
+    for match in YEAR.finditer(rest):
+        year = int(match.group(1))
+        entities.ranges.append((date(year, 1, 1), date(year, 12, 31)))
+    return entities
+
+
+@dataclass
+class PrefetchJob:
+    """Background loads started for one question."""
+
+    entities: QuestionEntities
+    futures: List[Future]
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+    def rows(self) -> int:
+        return sum(len(f.result()) for f in self.futures if f.done() and not f.exception())
+
+
+class PriceSliceCache:
+    """Daily price rows per (ticker, year), loaded once per data version."""
+
+    def __init__(self, db_engine: Engine, resolver: Optional[EntityResolver] = None):
+        self.db_engine = db_engine
+        # Finds the companies named in a question
+        self.resolver = resolver
+        self._slices: Dict[Tuple[str, int], Future] = {}
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="price-prefetch")
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, ticker: str, year: int) -> List[Dict[str, Any]]:
+        query = text(
+            f'SELECT {PRICE_COLUMNS} FROM prices WHERE "Ticker" = :ticker '
+            f'AND "Date" >= :start AND "Date" < :end ORDER BY "Date"'
+        )
+        with self.db_engine.connect() as conn:
+            result = conn.execute(query, {"ticker": ticker, "start": date(year, 1, 1), "end": date(year + 1, 1, 1)})
+            rows = [row._asdict() for row in result]
+        log_debug(f"Loaded {len(rows)} {ticker} prices for {year}")
+        return rows
+
+    def _slice(self, ticker: str, year: int, background: bool) -> Tuple[Future, bool]:
+        """(future of the slice, whether it was already cached or loading)."""
+        key = (ticker, year)
+        with self._lock:
+            version = get_data_version()
+            if version != self._data_version:
+                self._slices.clear()
+                self._data_version = version
+            future = self._slices.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                return future, True
+            if background:
+                future = self._pool.submit(self._load, ticker, year)
+            else:
+                future = Future()
+            self._slices[key] = future
+        if not background:
+            try:
+                future.set_result(self._load(ticker, year))
+            except Exception as e:
+                future.set_exception(e)
+        return future, False
+
+    def prefetch(self, question: str) -> Optional[PrefetchJob]:
+        """Start loading the prices named in `question`; returns None if there are none."""
+        entities = extract_entities(question, self.resolver)
+        if not entities.tickers or not entities.ranges:
+            return None
+        futures = [
+            self._slice(ticker, year, background=True)[0] for ticker in entities.tickers for year in entities.years
+        ]
+        job = PrefetchJob(entities=entities, futures=futures)
+
+        def finished(_: Future) -> None:
+            if job.finished is None and job.done():
+                job.finished = time.perf_counter()
+
+        for future in futures:
+            future.add_done_callback(finished)
+        log_debug(f"Prefetching prices of {entities.tickers} for {sorted(entities.years)}")
+        return job
+
+    def rows(self, ticker: str, start: date, end: date, wait_s: float = DEFAULT_WAIT_S) -> List[Dict[str, Any]]:
+        """Price rows of `ticker` between `start` and `end` (inclusive)."""
+        rows: List[Dict[str, Any]] = []
+        for year in range(start.year, end.year + 1):
+            future, cached = self._slice(ticker, year, background=False)
+            with self._lock:
+                if cached:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            rows.extend(future.result(timeout=wait_s))
+        return [row for row in rows if start <= as_date(row["Date"]) <= end]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = [f.result() for f in self._slices.values() if f.done() and not f.exception()]
+        total = self.hits + self.misses
+        return {
+            "slices": len(loaded),
+            "rows": sum(len(rows) for rows in loaded),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "data_version": self._data_version,
+        }
+
+
+class PriceTools(Toolkit):
+    """Daily prices served from the `PriceSliceCache`."""
+
+    def __init__(self, price_slices: PriceSliceCache, calendar: Optional[TradingCalendar] = None):
+        super().__init__(name="price_tools")
+        self.price_slices = price_slices
+        # Suggests the previous trading day when a date has no data
+        self.calendar = calendar
+        self.register(self.get_stock_prices)
+
+    def get_stock_prices(self, ticker: str, start_date: str, end_date: Optional[str] = None) -> str:
+        """Use this function to get the daily prices (Open, High, Low, Close, Volume, Dividends, Stock Splits)
+        of one stock between two dates. It is faster than a SQL query for simple price lookups.
+
+        Args:
+            ticker (str): Stock symbol, e.g. "AAPL".
+            start_date (str): First date, YYYY-MM-DD.
+            end_date (str, optional): Last date, YYYY-MM-DD. Defaults to start_date.
+        Returns:
+            str: JSON object with the price rows ordered by date ("rows") and a SQL query that would return
+                them ("equivalent_sql"; it was not executed). If there are no rows, "previous_trading_day"
+                is the latest earlier date with data.
+        """
+        try:
+            ticker = ticker.strip().upper()
+            if not re.fullmatch(r"[A-Z.]{1,6}", ticker):
+                return f"Error getting prices: invalid ticker {ticker!r}"
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date) if end_date else start
+            rows = self.price_slices.rows(ticker, start, end)
+            result: Dict[str, Any] = {"equivalent_sql": price_query(ticker, start, end), "rows": rows}
+            if not rows and self.calendar is not None:
+                previous = self.calendar.previous(start, ticker)
+                result["previous_trading_day"] = str(previous) if previous else None
+            return json.dumps(result, default=str)
+        except Exception as e:
+            logger.error(f"Error getting prices: {e}")
+            return f"Error getting prices: {e}"
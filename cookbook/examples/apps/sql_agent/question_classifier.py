@@ -0,0 +1,141 @@
+"""Local, LLM-free question classifier.
+
+Labels questions with the categories used in `test/djia_qna.json`
+(type: factual / comparative / analytical, complexity: easy / medium /
+difficult) plus a `plot` type for chart requests. The SQL Agent uses the
+label to run simple lookups with a lighter configuration. Any question with a
+period or comparison word goes to the full configuration.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+PLOT_WORDS = ("plot", "chart", "graph", "visualize", "visualise", "histogram", "heatmap", "boxplot", "scatter", "pie")
+
+# Metrics computed over many rows
+ANALYTICAL_PATTERNS = (
+    r"\baverage\b", r"\bmean\b", r"\bmedian\b", r"\bpercentage\b", r"\bpercent\b", r"%", r"\breturns?\b",
+    r"\bcumulative\b", r"\bcagr\b", r"\bgrowth rate\b", r"\bvolatility\b", r"\bstandard deviation\b",
+    r"\bbeta\b", r"\bsharpe\b", r"\bcorrelation\b", r"\bmoving average\b", r"\bdrawdown\b",
+    r"\btotal\b", r"\bhow many trading days\b", r"\bweekly\b", r"\bchange\b", r"\bby how much\b",
+    r"\bperform(ed|ance)?\b", r"\btrend\b",
+)
+
+COMPARATIVE_PATTERNS = (
+    r"\bwhich (company|stock|one)\b", r"\bwho closed\b", r"\bhigher\b", r"\blower\b", r"\blargest\b",
+    r"\bsmallest\b", r"\brank\b", r"\bcompare\b", r"\bversus\b", r"\bvs\.?\b", r"\btop \w+\b", r"\bbottom \w+\b",
+    r"\bwhich (had|was)\b",
+)
+
+# Only found in multi-step calculations
+DIFFICULT_PATTERNS = (
+    r"\bbeta\b", r"\bsharpe\b", r"\bcorrelation\b", r"\bvolatility\b", r"\bstandard deviation\b",
+    r"\bdrawdown\b", r"\bcagr\b", r"\brank\b", r"\bpercentage of trading days\b", r"\bhow many trading days\b",
+    r"\bon how many trading days\b", r"\btotal return\b", r"\bequal weight", r"\bpercentage (increase|decline|drop|gain)\b",
+    r"\blargest (absolute|percentage)\b", r"\bchange (from|between)\b", r"\bby how many\b",
+)
+
+# Single values read straight from one row
+LOOKUP_METRICS = (
+    r"\bclos(ing|ed)\b", r"\bopening\b", r"\bhighest price\b", r"\blowest price\b", r"\bhigh\b", r"\blow\b",
+    r"\btrading volume\b", r"\bvolume\b", r"\btraded at\b", r"\bstock price\b",
+)
+
+# Direct attribute lookups on `companies`
+ATTRIBUTE_PATTERNS = (r"\bwhich sector\b", r"\bwhat sector\b", r"\bticker symbol\b", r"\bstock symbol\b")
+
+# Period words: the question spans more than one trading day
+PERIOD_PATTERNS = (
+    r"\bin \d{4}\b", r"\bduring\b", r"\bfrom\b.*\bto\b", r"\bbetween\b", r"\bthrough\b", r"\bq[1-4]\b",
+    r"\bquarter\b", r"\bhalf\b", r"\b(in|for) (january|february|march|april|may|june|july|august|september|october|november|december) \d{4}\b",
+    r"\bsince\b", r"\buntil\b", r"\bbefore\b", r"\bafter\b", r"\bover the\b", r"\bytd\b", r"\byear[- ]to[- ]date\b",
+    r"\b(past|last|previous) (\d+ )?(days?|weeks?|months?|years?|quarters?|sessions?)\b", r"\b52[- ]week\b",
+)
+
+# Comparison words: besides COMPARATIVE_PATTERNS, also in questions labeled factual
+COMPARISON_PATTERNS = COMPARATIVE_PATTERNS + (
+    r"\bthan\b", r"\bmore\b", r"\bless\b", r"\bbetter\b", r"\bworse\b", r"\boutperform", r"\bunderperform",
+    r"\babove\b", r"\bbelow\b", r"\bcompared?\b", r"\bdifference\b",
+)
+
+DATE_PATTERN = (
+    r"\b(january|february|march|april|may|june|july|august|september|october|november|december)"
+    r"\s+\d{1,2},?\s+\d{4}\b|\b\d{4}-\d{2}-\d{2}\b"
+)
+
+
+@dataclass
+class QuestionClass:
+    type: str
+    complexity: str
+    reasons: List[str] = field(default_factory=list)
+    # The question names a period or compares values; never routed to the light profile
+    period: bool = False
+    comparison: bool = False
+
+    @property
+    def is_simple_lookup(self) -> bool:
+        """A single-row lookup that needs no reasoning step."""
+        if self.period or self.comparison:
+            return False
+        return self.type in ("factual", "comparative") and self.complexity == "easy"
+
+    @property
+    def label(self) -> str:
+        return f"{self.type}/{self.complexity}"
+
+
+def _matches(patterns, text: str) -> List[str]:
+    return [p for p in patterns if re.search(p, text)]
+
+
+def classify_question(question: str) -> QuestionClass:
+    """Classify a question with keyword rules (microseconds, no model call)."""
+    text = question.lower().replace("’", "'")
+    reasons: List[str] = []
+
+    if any(re.search(rf"\b{w}", text) for w in PLOT_WORDS):
+        return QuestionClass("plot", "medium", ["plot keyword"])
+
+    analytical = _matches(ANALYTICAL_PATTERNS, text)
+    comparative = _matches(COMPARATIVE_PATTERNS, text)
+    difficult = _matches(DIFFICULT_PATTERNS, text)
+    dates = re.findall(DATE_PATTERN, text)
+    period = _matches(PERIOD_PATTERNS, text)
+    lookup_metric = _matches(LOOKUP_METRICS, text)
+    attribute = _matches(ATTRIBUTE_PATTERNS, text)
+
+    # Type
+    if analytical and not (comparative and not difficult and len(dates) == 1):
+        question_type = "analytical"
+        reasons.append(f"analytical: {analytical[0]}")
+    elif comparative:
+        question_type = "comparative"
+        reasons.append(f"comparative: {comparative[0]}")
+    else:
+        question_type = "factual"
+
+    # Complexity
+    if difficult:
+        complexity = "difficult"
+        reasons.append(f"difficult: {difficult[0]}")
+    elif attribute and not period:
+        complexity = "easy"
+        reasons.append("attribute lookup")
+    elif len(dates) >= 1 and not period and (lookup_metric or question_type == "comparative"):
+        # One trading day; comparisons across every company need a full scan
+        across_all = question_type == "comparative" and not re.search(r"\b(or|and|vs\.?|versus)\b", text)
+        complexity = "medium" if across_all or question_type == "analytical" else "easy"
+        reasons.append("single date lookup" if complexity == "easy" else "single date, many rows")
+    elif question_type == "analytical" and period and not comparative and re.search(r"\baverage\b", text):
+        complexity = "easy"
+        reasons.append("simple aggregate over a period")
+    else:
+        complexity = "medium"
+    comparison = _matches(COMPARISON_PATTERNS, text)
+    if period:
+        reasons.append(f"period: {period[0]}")
+    if comparison:
+        reasons.append(f"comparison: {comparison[0]}")
+    return QuestionClass(question_type, complexity, reasons, period=bool(period), comparison=bool(comparison))
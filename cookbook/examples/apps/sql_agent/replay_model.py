@@ -0,0 +1,274 @@
+"""Record/replay model provider for offline, deterministic runs.
+
+`ReplayModel` wraps a real model. Each model request (messages, tool
+definitions and model id) is hashed; in `record` mode the real model is
+called and its parsed responses are saved to `<fixture_dir>/<hash>.json`, in
+`replay` mode the saved responses are returned without any network access,
+and `auto` replays when a fixture exists and records otherwise.
+
+Everything around the model (knowledge retrieval, SQL, tools and the agent's
+own overhead) still runs for real, so full pipeline timings can be
+benchmarked offline. Use it through the model id, e.g.
+`get_sql_agent(model_id="replay:google:gemini-2.0-flash")`.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from agno.utils.log import log_debug
+
+REPLAY_MODES = ("record", "replay", "auto")
+
+# Bump when the request key changes, so that stale fixtures are not replayed
+FIXTURE_VERSION = 1
+
+# Tool call ids are generated by the provider and differ on every call
+VOLATILE_KEYS = ("id", "tool_call_id")
+
+
+class FixtureNotFoundError(LookupError):
+    pass
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if k not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def request_key(model_id: str, messages: List[Message], tools: Optional[List[Dict[str, Any]]]) -> str:
+    """Stable hash of a model request."""
+    payload = {
+        "version": FIXTURE_VERSION,
+        "model": model_id,
+        "tools": sorted(_normalize(tools or []), key=lambda t: json.dumps(t, sort_keys=True)),
+        "messages": [
+            _normalize(
+                {
+                    "role": m.role,
+                    "content": m.content,
+                    "tool_calls": m.tool_calls,
+                    "tool_name": m.tool_name,
+                    "tool_args": m.tool_args,
+                }
+            )
+            for m in messages
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _usage_to_dict(usage: Any) -> Optional[Dict[str, Any]]:
+    if usage is None or isinstance(usage, dict):
+        return usage
+    keys = ("input_tokens", "output_tokens", "prompt_tokens", "completion_tokens", "total_tokens")
+    return {k: getattr(usage, k) for k in keys if getattr(usage, k, None) is not None}
+
+
+def response_to_dict(response: ModelResponse) -> Dict[str, Any]:
+    return {
+        "role": response.role,
+        "content": response.content,
+        "tool_calls": response.tool_calls,
+        "event": response.event,
+        "thinking": response.thinking,
+        "redacted_thinking": response.redacted_thinking,
+        "reasoning_content": response.reasoning_content,
+        "provider_data": response.provider_data,
+        "response_usage": _usage_to_dict(response.response_usage),
+        "extra": response.extra,
+    }
+
+
+def response_from_dict(data: Dict[str, Any]) -> ModelResponse:
+    return ModelResponse(**{k: v for k, v in data.items() if v is not None})
+
+
+@dataclass
+class ReplayModel(Model):
+    id: str = "replay"
+    name: str = "ReplayModel"
+    provider: str = "Replay"
+
+    # Real model used in record mode; also formats tool results like the provider does
+    inner: Optional[Model] = None
+    mode: str = "auto"
+    fixture_dir: Path = field(default_factory=lambda: Path("fixtures"))
+    # Sleep for the recorded latency when replaying
+    simulate_latency: bool = False
+
+    hits: int = 0
+    recorded: int = 0
+
+    def __post_init__(self):
+        if self.mode not in REPLAY_MODES:
+            raise ValueError(f"Unsupported replay mode: {self.mode}")
+        if self.inner is not None:
+            self.id = self.inner.id
+            self.supports_native_structured_outputs = self.inner.supports_native_structured_outputs
+            self.supports_json_schema_outputs = self.inner.supports_json_schema_outputs
+
+    def get_provider(self) -> str:
+        return f"Replay({self.inner.get_provider() if self.inner else 'none'})"
+
+    # ************* Fixtures *************
+    def _key(self, messages: List[Message]) -> str:
+        return request_key(self.id, messages, self._tools)
+
+    def _fixture_path(self, key: str) -> Path:
+        return self.fixture_dir.joinpath(f"{key}.json")
+
+    def _load(self, key: str, kind: str) -> Optional[Dict[str, Any]]:
+        if self.mode == "record":
+            return None
+        path = self._fixture_path(key)
+        fixture = json.loads(path.read_text()).get(kind) if path.exists() else None
+        if fixture is None and self.mode == "replay":
+            raise FixtureNotFoundError(f"No recorded {kind} response for request {key} in {self.fixture_dir}")
+        return fixture
+
+    def _save(self, key: str, kind: str, messages: List[Message], fixture: Dict[str, Any]) -> None:
+        path = self._fixture_path(key)
+        data = json.loads(path.read_text()) if path.exists() else {}
+        last = messages[-1] if messages else None
+        data["request"] = {
+            "model": self.id,
+            "messages": len(messages),
+            "last_message": (last.get_content_string() or "")[:200] if last else None,
+        }
+        data[kind] = fixture
+        self.fixture_dir.mkdir(parents=True, exist_ok=True)
+        # Atomic write: concurrent runs may record the same request
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, default=str))
+        os.replace(tmp_path, path)
+        self.recorded += 1
+        log_debug(f"Recorded model {kind} response {key}")
+
+    def _replayed(self, key: str, fixture: Dict[str, Any]) -> None:
+        self.hits += 1
+        log_debug(f"Replaying model response {key}")
+        if self.simulate_latency:
+            time.sleep(fixture.get("latency_s", 0.0))
+
+    def _prepare_inner(self) -> Model:
+        if self.inner is None:
+            raise FixtureNotFoundError("ReplayModel has no model to record with")
+        # Tools are set on this model by the agent
+        self.inner._tools = self._tools
+        self.inner._functions = self._functions
+        self.inner.tool_choice = self.tool_choice
+        self.inner.response_format = self.response_format
+        return self.inner
+
+    def _record_delta(
+        self, inner: Model, delta: Any, deltas: List[Dict[str, Any]], raw_tool_calls: List[Any]
+    ) -> Dict[str, Any]:
+        data = response_to_dict(inner.parse_provider_response_delta(delta))
+        # Streamed tool calls may be partial provider objects; they are saved merged, see _save_stream
+        if data["tool_calls"]:
+            raw_tool_calls.extend(data["tool_calls"])
+        deltas.append(dict(data, tool_calls=[]))
+        return data
+
+    def _save_stream(
+        self,
+        key: str,
+        messages: List[Message],
+        inner: Model,
+        deltas: List[Dict[str, Any]],
+        raw_tool_calls: List[Any],
+        latency_s: float,
+    ) -> None:
+        if raw_tool_calls:
+            deltas.append(response_to_dict(ModelResponse(tool_calls=inner.parse_tool_calls(raw_tool_calls))))
+        self._save(key, "stream", messages, {"latency_s": latency_s, "deltas": deltas})
+
+    # ************* Model API *************
+    def invoke(self, messages: List[Message]) -> Dict[str, Any]:
+        key = self._key(messages)
+        fixture = self._load(key, "invoke")
+        if fixture is not None:
+            self._replayed(key, fixture)
+            return fixture["response"]
+        inner = self._prepare_inner()
+        start = time.perf_counter()
+        response = inner.parse_provider_response(inner.invoke(messages=messages))
+        fixture = {"latency_s": time.perf_counter() - start, "response": response_to_dict(response)}
+        self._save(key, "invoke", messages, fixture)
+        return fixture["response"]
+
+    def invoke_stream(self, messages: List[Message]) -> Iterator[Dict[str, Any]]:
+        key = self._key(messages)
+        fixture = self._load(key, "stream")
+        if fixture is not None:
+            self._replayed(key, fixture)
+            yield from fixture["deltas"]
+            return
+        inner = self._prepare_inner()
+        start = time.perf_counter()
+        deltas: List[Dict[str, Any]] = []
+        raw_tool_calls: List[Any] = []
+        for delta in inner.invoke_stream(messages=messages):
+            yield self._record_delta(inner, delta, deltas, raw_tool_calls)
+        self._save_stream(key, messages, inner, deltas, raw_tool_calls, time.perf_counter() - start)
+
+    async def ainvoke(self, messages: List[Message]) -> Dict[str, Any]:
+        key = self._key(messages)
+        fixture = self._load(key, "invoke")
+        if fixture is not None:
+            self._replayed(key, fixture)
+            return fixture["response"]
+        inner = self._prepare_inner()
+        start = time.perf_counter()
+        response = inner.parse_provider_response(await inner.ainvoke(messages=messages))
+        fixture = {"latency_s": time.perf_counter() - start, "response": response_to_dict(response)}
+        self._save(key, "invoke", messages, fixture)
+        return fixture["response"]
+
+    async def ainvoke_stream(self, messages: List[Message]) -> AsyncIterator[Dict[str, Any]]:
+        key = self._key(messages)
+        fixture = self._load(key, "stream")
+        if fixture is not None:
+            self._replayed(key, fixture)
+            for data in fixture["deltas"]:
+                yield data
+            return
+        inner = self._prepare_inner()
+        start = time.perf_counter()
+        deltas: List[Dict[str, Any]] = []
+        raw_tool_calls: List[Any] = []
+        async for delta in inner.ainvoke_stream(messages=messages):
+            yield self._record_delta(inner, delta, deltas, raw_tool_calls)
+        self._save_stream(key, messages, inner, deltas, raw_tool_calls, time.perf_counter() - start)
+
+    def parse_provider_response(self, response: Dict[str, Any]) -> ModelResponse:
+        return response_from_dict(response)
+
+    def parse_provider_response_delta(self, response: Dict[str, Any]) -> ModelResponse:
+        return response_from_dict(response)
+
+    def parse_tool_calls(self, tool_calls_data: List[Any]) -> List[Dict[str, Any]]:
+        # Replayed tool calls are already merged; recorded ones are merged by the provider
+        if self.inner is not None and any(not isinstance(t, dict) for t in tool_calls_data):
+            return self.inner.parse_tool_calls(tool_calls_data)
+        return tool_calls_data
+
+    def format_function_call_results(
+        self, messages: List[Message], function_call_results: List[Message], **kwargs: Any
+    ) -> None:
+        # Keep the provider's message layout so that recorded requests match
+        if self.inner is not None:
+            self.inner.format_function_call_results(messages, function_call_results, **kwargs)
+        else:
+            super().format_function_call_results(messages, function_call_results, **kwargs)
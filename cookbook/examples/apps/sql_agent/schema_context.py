@@ -0,0 +1,284 @@
+"""Schema context selector for the SQL Agent.
+
+The agent used to inject `knowledge/semantic_model.json` (table names,
+descriptions and use cases) into every prompt. For each question, the tables
+relevant to it are selected, and column metadata from `knowledge/companies.json`
+and `knowledge/prices.json` is added only while the context stays below the
+size of that semantic model. When nothing matches, or nothing more fits, the
+semantic model is used as it was.
+"""
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+knowledge_dir = Path(__file__).parent.joinpath("knowledge")
+
+# Files holding per-table metadata (description, columns, relationships, examples)
+TABLE_METADATA_FILES = ["companies.json", "prices.json"]
+
+# Default token budget for the schema context (capped at the size of the semantic model)
+DEFAULT_TOKEN_BUDGET = 600
+
+# Columns always kept for a selected table (join keys and identifiers)
+KEY_COLUMNS = {
+    "companies": ["symbol", "name"],
+    "prices": ["Date", "Ticker"],
+}
+
+# Domain words that point at a table even when no column name is mentioned
+TABLE_HINTS = {
+    "companies": {
+        "company", "companies", "sector", "sectors", "industry", "country", "website",
+        "market", "cap", "capitalization", "pe", "p/e", "earnings", "yield", "symbol",
+        "ticker", "belong", "52-week",
+    },
+    "prices": {
+        "price", "prices", "close", "closing", "closed", "open", "opening", "high", "highest",
+        "low", "lowest", "volume", "traded", "trading", "dividend", "dividends", "split",
+        "return", "returns", "average", "moving", "volatility", "beta", "drawdown",
+        "daily", "date", "day", "days", "performance", "trend", "plot", "chart",
+    },
+}
+
+# Questions about the schema itself get the semantic model
+SCHEMA_QUESTION_WORDS = {"table", "tables", "schema", "columns"}
+
+STOPWORDS = {
+    "a", "an", "the", "of", "on", "in", "for", "to", "and", "or", "by", "with", "from",
+    "what", "which", "who", "how", "many", "much", "was", "is", "are", "were", "did",
+    "do", "does", "me", "show", "that", "this", "it", "its", "as", "at", "be",
+}
+
+# Words too generic to match a column through its description
+GENERIC_WORDS = {"company", "companies", "stock", "price", "prices", "djia", "data", "day"}
+
+# Table used to resolve company names mentioned in a question
+COMPANY_NAME_TABLE = "companies"
+
+MONTHS = {
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december", "q1", "q2", "q3", "q4",
+}
+
+SEMANTIC_MODEL_PROMPT = """
+The `semantic_model` contains information about the tables relevant to this question and the relationships between them.
+If the users asks about the tables you have access to, simply share the table names from `available_tables`.
+<semantic_model>
+{semantic_model}
+</semantic_model>"""
+
+# Prompt used with the whole semantic model
+FULL_SEMANTIC_MODEL_PROMPT = """
+The `semantic_model` contains information about tables and the relationships between them.
+If the users asks about the tables you have access to, simply share the table names from the `semantic_model`.
+<semantic_model>
+{semantic_model}
+</semantic_model>"""
+
+
+@dataclass
+class PromptStats:
+    """Prompt-size statistics for a single run (tokens are estimates)."""
+
+    tables: List[str] = field(default_factory=list)
+    columns: int = 0
+    schema_tokens: int = 0
+    # Tokens of the whole semantic model, injected before per-question selection
+    baseline_schema_tokens: int = 0
+    instructions_tokens: int = 0
+    description_tokens: int = 0
+    token_budget: int = DEFAULT_TOKEN_BUDGET
+
+    @property
+    def static_tokens(self) -> int:
+        return self.schema_tokens + self.instructions_tokens + self.description_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.baseline_schema_tokens - self.schema_tokens, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = asdict(self)
+        stats["static_tokens"] = self.static_tokens
+        stats["saved_tokens"] = self.saved_tokens
+        return stats
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z0-9/\-]+", text.lower()) if w not in STOPWORDS]
+
+
+@lru_cache(maxsize=1)
+def load_semantic_model() -> Dict[str, Any]:
+    """Load `semantic_model.json` (cached)."""
+    with open(knowledge_dir / "semantic_model.json", "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def load_table_metadata() -> Dict[str, Dict[str, Any]]:
+    """Load per-table metadata from the knowledge JSON files, merged with the semantic model."""
+    tables: Dict[str, Dict[str, Any]] = {}
+    for table in load_semantic_model().get("tables", []):
+        tables[table["table_name"]] = {
+            "description": table.get("table_description", ""),
+            "use_case": table.get("Use Case", ""),
+            "columns": {},
+            "relationships": {},
+            "example_queries": [],
+        }
+    for file_name in TABLE_METADATA_FILES:
+        file_path = knowledge_dir / file_name
+        if not file_path.exists():
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        for table_name, table in metadata.get("tables", {}).items():
+            entry = tables.setdefault(
+                table_name,
+                {"description": "", "use_case": "", "columns": {}, "relationships": {}, "example_queries": []},
+            )
+            entry["description"] = entry["description"] or table.get("description", "")
+            entry["columns"].update(table.get("columns", {}))
+            entry["relationships"].update(table.get("relationships", {}))
+            entry["example_queries"].extend(table.get("example_queries", []))
+    return tables
+
+
+@lru_cache(maxsize=1)
+def baseline_semantic_model() -> str:
+    """The whole semantic model, as injected into every prompt before per-question selection."""
+    return json.dumps(load_semantic_model(), indent=2)
+
+
+def baseline_schema_tokens() -> int:
+    return estimate_tokens(baseline_semantic_model())
+
+
+def _mentions_company_name(question: str) -> bool:
+    """Whether the question names a company (a capitalized word that is not a month)."""
+    tokens = re.findall(r"[A-Za-z&.']+", question)
+    return any(t[0].isupper() and t.lower() not in MONTHS for t in tokens[1:])
+
+
+def _score_table(table_name: str, table: Dict[str, Any], words: List[str]) -> Tuple[int, List[str]]:
+    """Score a table against the question words and return its matched columns."""
+    score = 0
+    matched_columns: List[str] = []
+    singular = table_name.rstrip("s")
+    for word in words:
+        if word in (table_name, singular) or word in TABLE_HINTS.get(table_name, set()):
+            score += 1
+    for column, description in table["columns"].items():
+        column_words = set(_words(column.replace("_", " ")))
+        description_words = set(_words(description)) - GENERIC_WORDS
+        if column_words & set(words):
+            score += 2
+            matched_columns.append(column)
+        elif description_words & set(words):
+            score += 1
+            matched_columns.append(column)
+    return score, matched_columns
+
+
+def _render(tables: List[Dict[str, Any]], available_tables: List[str]) -> str:
+    return json.dumps({"available_tables": available_tables, "tables": tables}, indent=2)
+
+
+def select_schema_context(
+    question: str,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> Tuple[str, PromptStats]:
+    """Build the `additional_context` for a question.
+
+    Args:
+        question: The user question
+        token_budget: Maximum (estimated) tokens for the semantic model section; the
+            selected context is also kept below the size of the whole semantic model
+
+    Returns:
+        The context string and its prompt statistics
+    """
+    metadata = load_table_metadata()
+    available_tables = list(metadata.keys())
+    words = _words(question or "")
+
+    scored = []
+    for table_name, table in metadata.items():
+        score, matched_columns = _score_table(table_name, table, words)
+        if table_name == COMPANY_NAME_TABLE and _mentions_company_name(question or ""):
+            if score == 0:
+                # Only needed to resolve the company name
+                matched_columns = list(KEY_COLUMNS.get(table_name, []))
+            score += 1
+        scored.append((score, table_name, matched_columns))
+    scored.sort(key=lambda s: s[0], reverse=True)
+
+    schema_question = bool(SCHEMA_QUESTION_WORDS & set(words))
+    selected = [s for s in scored if s[0] > 0]
+    baseline_tokens = baseline_schema_tokens()
+    if not selected or schema_question:
+        # Nothing matched (or the question is about the schema): use the semantic model
+        return _baseline_context(token_budget)
+    selected_names = {name for _, name, _ in selected}
+
+    def build(with_examples: bool, with_descriptions: bool) -> List[Dict[str, Any]]:
+        entries = []
+        for _, table_name, matched_columns in selected:
+            table = metadata[table_name]
+            entry: Dict[str, Any] = {"table_name": table_name, "table_description": table["description"]}
+            if table["use_case"]:
+                entry["Use Case"] = table["use_case"]
+            keep = KEY_COLUMNS.get(table_name, []) + matched_columns
+            if not matched_columns:
+                # No column mentioned explicitly: keep the full column list
+                keep = list(table["columns"].keys())
+            columns = {c: table["columns"][c] for c in table["columns"] if c in keep}
+            entry["columns"] = columns if with_descriptions else list(columns.keys())
+            relationships = {t: r for t, r in table["relationships"].items() if t in selected_names}
+            if relationships:
+                entry["relationships"] = relationships
+            if with_examples and table["example_queries"]:
+                entry["example_queries"] = table["example_queries"][:2]
+            entries.append(entry)
+        return entries
+
+    # Shrink the context step by step until it fits the budget and stays below the semantic model
+    budget = min(token_budget, baseline_tokens)
+    for attempt in [(True, True), (False, True), (False, False)]:
+        tables = build(*attempt)
+        semantic_model = _render(tables, available_tables)
+        schema_tokens = estimate_tokens(semantic_model)
+        if schema_tokens < budget:
+            stats = PromptStats(
+                tables=[t["table_name"] for t in tables],
+                columns=sum(len(t["columns"]) for t in tables),
+                schema_tokens=schema_tokens,
+                baseline_schema_tokens=baseline_tokens,
+                token_budget=token_budget,
+            )
+            return SEMANTIC_MODEL_PROMPT.format(semantic_model=semantic_model), stats
+    # Column metadata does not fit
+    return _baseline_context(token_budget)
+
+
+def _baseline_context(token_budget: int) -> Tuple[str, PromptStats]:
+    semantic_model = baseline_semantic_model()
+    stats = PromptStats(
+        tables=[t["table_name"] for t in load_semantic_model().get("tables", [])],
+        schema_tokens=estimate_tokens(semantic_model),
+        baseline_schema_tokens=baseline_schema_tokens(),
+        token_budget=token_budget,
+    )
+    return FULL_SEMANTIC_MODEL_PROMPT.format(semantic_model=semantic_model), stats
@@ -0,0 +1,171 @@
+"""In-memory trading calendar built from `prices`.
+
+Questions and plot commands often name a weekend, a holiday or a date past the
+end of the data. Instead of asking the database for the nearest past date
+(`WHERE "Date" <= :date ORDER BY "Date" DESC LIMIT 1`) or listing the latest
+dates, `TradingCalendar` keeps the sorted trading days of every ticker (and of
+the market as a whole) and answers with `bisect`. It is rebuilt when the data
+version changes.
+
+The agent uses it through the `snap_to_trading_day` tool (`CalendarTools`),
+`plot_api` through `get_trading_calendar()`.
+"""
+
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.tools import Toolkit
+from agno.utils.log import log_debug, logger
+from data_version import get_data_version
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+DIRECTIONS = ("previous", "next", "nearest")
+
+
+def as_date(value: Any) -> date:
+    """`date` from a date, datetime, pandas Timestamp or ISO string."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class TradingCalendar:
+    """Sorted trading days per ticker, with bisect lookups."""
+
+    def __init__(self, db_engine: Optional[Engine] = None, table: str = "prices"):
+        self.db_engine = db_engine
+        self.table = table
+        # Trading days of each ticker, and of any ticker (key None)
+        self._days: Dict[Optional[str], List[date]] = {}
+        self._data_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def build(self, rows: List[Tuple[str, Any]]) -> None:
+        """Index (ticker, date) rows."""
+        days: Dict[Optional[str], set] = {None: set()}
+        for ticker, day in rows:
+            day = as_date(day)
+            days.setdefault(ticker, set()).add(day)
+            days[None].add(day)
+        self._days = {ticker: sorted(values) for ticker, values in days.items()}
+        log_debug(f"Trading calendar: {len(self._days[None])} days, {len(self._days) - 1} tickers")
+
+    def refresh(self) -> None:
+        """Rebuild the index if the data was reloaded since it was built."""
+        version = get_data_version()
+        if version == self._data_version or self.db_engine is None:
+            return
+        with self._lock:
+            if version == self._data_version:
+                return
+            try:
+                with self.db_engine.connect() as conn:
+                    rows = conn.execute(text(f'SELECT DISTINCT "Ticker", "Date" FROM {self.table}')).all()
+            except Exception as e:
+                # Keep the previous index; retried on the next lookup
+                logger.warning(f"Could not load the trading calendar: {e}")
+                return
+            self.build([(row[0], row[1]) for row in rows])
+            self._data_version = version
+
+    def days(self, ticker: Optional[str] = None) -> List[date]:
+        """Sorted trading days of `ticker` (of any ticker if None)."""
+        self.refresh()
+        return self._days.get(ticker, [])
+
+    def is_trading_day(self, day: Any, ticker: Optional[str] = None) -> bool:
+        days = self.days(ticker)
+        day = as_date(day)
+        i = bisect_left(days, day)
+        return i < len(days) and days[i] == day
+
+    def previous(self, day: Any, ticker: Optional[str] = None) -> Optional[date]:
+        """Latest trading day on or before `day`."""
+        days = self.days(ticker)
+        i = bisect_right(days, as_date(day))
+        return days[i - 1] if i else None
+
+    def next(self, day: Any, ticker: Optional[str] = None) -> Optional[date]:
+        """Earliest trading day on or after `day`."""
+        days = self.days(ticker)
+        i = bisect_left(days, as_date(day))
+        return days[i] if i < len(days) else None
+
+    def snap(self, day: Any, ticker: Optional[str] = None, direction: str = "previous") -> Optional[date]:
+        """Trading day for `day`: itself if it is one, else the previous, next or nearest one."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        if direction == "previous":
+            return self.previous(day, ticker)
+        if direction == "next":
+            return self.next(day, ticker)
+        day = as_date(day)
+        before, after = self.previous(day, ticker), self.next(day, ticker)
+        if before is None or after is None:
+            return before or after
+        return before if (day - before) <= (after - day) else after
+
+    def between(self, start: Any, end: Any, ticker: Optional[str] = None) -> List[date]:
+        """Trading days from `start` to `end`, inclusive."""
+        days = self.days(ticker)
+        return days[bisect_left(days, as_date(start)) : bisect_right(days, as_date(end))]
+
+    def latest(self, n: int = 1, ticker: Optional[str] = None) -> List[date]:
+        """The last `n` trading days, most recent first."""
+        return self.days(ticker)[-n:][::-1] if n > 0 else []
+
+    def tickers(self) -> List[str]:
+        """Tickers with at least one trading day."""
+        self.refresh()
+        return sorted(t for t in self._days if t is not None)
+
+    def bounds(self, ticker: Optional[str] = None) -> Optional[Tuple[date, date]]:
+        days = self.days(ticker)
+        return (days[0], days[-1]) if days else None
+
+
+class CalendarTools(Toolkit):
+    """Trading-day lookups served by a `TradingCalendar`."""
+
+    def __init__(self, calendar: TradingCalendar):
+        super().__init__(name="calendar_tools")
+        self.calendar = calendar
+        self.register(self.snap_to_trading_day)
+
+    def snap_to_trading_day(self, date: str, ticker: Optional[str] = None, direction: str = "previous") -> str:
+        """Use this function to check whether a date is a trading day and to find the nearest trading day
+        with data, without querying the database. Use it before querying prices for a date that may be a
+        weekend, a holiday or outside the data.
+
+        Args:
+            date (str): Date in YYYY-MM-DD format.
+            ticker (str, optional): Stock symbol; if omitted, any stock's trading days are used.
+            direction (str): "previous" (default, latest trading day on or before the date), "next" or "nearest".
+        Returns:
+            str: JSON with "trading_day" (or null), "is_trading_day", and the data's "first_day" and "last_day".
+        """
+        try:
+            ticker = ticker.strip().upper() if ticker else None
+            bounds = self.calendar.bounds(ticker)
+            if bounds is None:
+                return json.dumps({"date": date, "ticker": ticker, "trading_day": None, "error": "no data"})
+            trading_day = self.calendar.snap(date, ticker, direction)
+            return json.dumps(
+                {
+                    "date": date,
+                    "ticker": ticker,
+                    "trading_day": str(trading_day) if trading_day else None,
+                    "is_trading_day": self.calendar.is_trading_day(date, ticker),
+                    "first_day": str(bounds[0]),
+                    "last_day": str(bounds[1]),
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error finding trading day: {e}")
+            return f"Error finding trading day: {e}"
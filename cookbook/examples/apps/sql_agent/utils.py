@@ -3,9 +3,11 @@ from dataclasses import asdict
 from typing import Any, Dict, List, Optional
 
 import streamlit as st
-from agents import get_sql_agent
+from agents import get_blob_store, get_sql_agent
 from agno.agent.agent import Agent
 from agno.utils.log import logger
+from blob_storage import parse_blob_ref
+from history_compaction import COMPACTED_MARKER
 import pandas as pd
 
 
@@ -104,7 +106,18 @@ def display_tool_calls(tool_calls_container, tools):
                         st.markdown("**Arguments:**")
                         st.json(tool_args)
 
-                    if content is not None:
+                    # Large results of stored sessions are loaded on demand, see blob_storage.py
+                    blob = parse_blob_ref(content)
+                    if blob is not None:
+                        st.caption(f"Result stored out of line ({blob[1]:,} bytes)")
+                        load_key = f"load_blob_{tool_call.get('tool_call_id') or blob[0]}"
+                        content = get_blob_store().load(content) if st.toggle("Load result", key=load_key) else None
+
+                    # Old results are replaced by a summary, see history_compaction.py
+                    if isinstance(content, str) and content.startswith(COMPACTED_MARKER):
+                        st.markdown("**Results (compacted):**")
+                        st.text(content)
+                    elif content is not None:
                         try:
                             if is_json(content):
                                 st.markdown("**Results:**")
@@ -123,6 +136,38 @@ def display_tool_calls(tool_calls_container, tools):
         tool_calls_container.error("Failed to display tool results")
 
 
+def run_breakdown_widget(run_trace) -> None:
+    """Display where the wall time and tokens of the last run went.
+
+    Args:
+        run_trace: RunTrace recorded by SQLAgent.run
+    """
+    if run_trace is None or run_trace.duration_ms is None:
+        return
+    with st.expander(f"⏱️ Run breakdown ({run_trace.duration_ms / 1000:.2f}s, {run_trace.profile} profile)"):
+        breakdown = pd.DataFrame(run_trace.breakdown())
+        breakdown["share"] = (breakdown["share"] * 100).round(1)
+        breakdown["ms"] = breakdown["ms"].round(1)
+        st.bar_chart(breakdown.set_index("category")["ms"], horizontal=True)
+        st.dataframe(breakdown, use_container_width=True, hide_index=True)
+        spans = pd.DataFrame(
+            [
+                {
+                    "span": span.name,
+                    "category": span.category,
+                    "start ms": round(span.start_ms, 1),
+                    "ms": round(span.duration_ms, 1),
+                    "tokens in": span.tokens_in,
+                    "tokens out": span.tokens_out,
+                    "bytes": span.bytes,
+                    "cache hit": span.cache_hit,
+                }
+                for span in run_trace.spans
+            ]
+        )
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+
+
 def sidebar_widget() -> None:
     """Display the sidebar widget with sample queries."""
     st.sidebar.markdown("## 🏆 Sample Queries")
@@ -185,6 +230,7 @@ def session_selector_widget(agent: Agent, model_id: str) -> None:
                 logger.info(
                     f"---*--- Loading {model_id} run: {selected_session_id} ---*---"
                 )
+                # Cheap: model client, DB engine and knowledge are shared per model id
                 st.session_state["sql_agent"] = get_sql_agent(
                     model_id=model_id,
                     session_id=selected_session_id,